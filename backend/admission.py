@@ -0,0 +1,291 @@
+"""
+PDSA数字分身智能体 - 准入控制
+
+功能说明:
+1. 并发池: 限制同时进行的百炼调用数,超出的请求进入有界等待队列
+2. 公平排队: 每个客户端一个队列,空出的名额在客户端之间轮转分配;单个客户端的排队请求数有上限,无法占满队列
+3. 快速拒绝: 队列已满或预计等待时间超过上限时立即拒绝(返回429 + Retry-After),不做无效等待
+4. 按客户端的令牌桶限流
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class AdmissionRejected(Exception):
+    """
+    请求未被准入
+
+    参数:
+        message (str): 错误信息
+        retry_after (float): 建议的重试等待时间(秒)
+        reason (str): 拒绝原因 rate_limited/queue_full/client_queue_full/wait_timeout
+    """
+
+    def __init__(self, message, retry_after, reason):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBucketLimiter:
+    """
+    按客户端的令牌桶限流
+
+    参数:
+        rate (float): 每秒补充的令牌数,0表示不限流
+        burst (int): 令牌桶容量(允许的突发请求数)
+        max_clients (int): 最多跟踪的客户端数,超出时淘汰最久未访问的客户端
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._limited = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def acquire(self, client):
+        """
+        消耗一个令牌
+
+        参数:
+            client (str): 客户端标识
+
+        异常:
+            AdmissionRejected: 令牌不足
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                allowed = True
+            else:
+                self._buckets[client] = (tokens, now)
+                self._limited += 1
+                allowed = False
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        if not allowed:
+            raise AdmissionRejected("请求过于频繁,请稍后再试", (1 - tokens) / self.rate, 'rate_limited')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'ratePerMinute': round(self.rate * 60, 2),
+                'burst': self.burst,
+                'clients': len(self._buckets),
+                'limited': self._limited
+            }
+
+
+class Slot:
+    """
+    并发池中的一个名额(可作为上下文管理器使用,重复释放无副作用)
+
+    说明:
+        调用方超时返回后上游请求可能仍在执行,用hold()登记该请求,
+        release()会推迟到所有登记的请求结束后才真正归还名额
+    """
+
+    __slots__ = ('pool', 'client', 'enqueued', 'granted', 'waited', 'acquired', 'released', 'event',
+                 'holds', 'release_requested')
+
+    def __init__(self, pool, client):
+        self.pool = pool
+        self.client = client
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.waited = 0.0
+        self.acquired = None
+        self.released = False
+        self.event = None
+        self.holds = 0
+        self.release_requested = False
+
+    def hold(self, future):
+        """
+        名额在future结束前不归还
+
+        参数:
+            future (Future): 仍在执行的上游调用
+        """
+        with self.pool._lock:
+            self.holds += 1
+        future.add_done_callback(self._unhold)
+
+    def release(self):
+        with self.pool._lock:
+            if self.holds:
+                self.release_requested = True
+                return
+        self.pool.release(self)
+
+    def _unhold(self, future):
+        with self.pool._lock:
+            self.holds -= 1
+            ready = not self.holds and self.release_requested
+        if ready:
+            self.pool.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class AdmissionPool:
+    """
+    有界并发池 + 按客户端公平排队
+
+    参数:
+        name (str): 名称(用于错误信息和统计)
+        limit (int): 最大并发数
+        max_queue (int|None): 等待队列上限,None表示不限(后台任务使用)
+        max_wait (float|None): 最长等待时间(秒),None表示一直等待
+        max_queue_per_client (int|None): 单个客户端在队列中的请求数上限,None表示不限
+
+    说明:
+        预计等待时间 = 排在前面的请求数 / 并发数 × 平均占用时长,
+        超过max_wait时直接拒绝,避免请求排队到超时后才失败
+    """
+
+    def __init__(self, name, limit, max_queue=None, max_wait=None, max_queue_per_client=None):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.max_queue_per_client = max_queue_per_client
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._queues = OrderedDict()
+        self._hold = None
+        self._waits = deque(maxlen=200)
+        self._admitted = 0
+        self._rejected = {'queue_full': 0, 'client_queue_full': 0, 'wait_timeout': 0}
+
+    def acquire(self, client=None):
+        """
+        获取一个名额,必要时排队等待
+
+        参数:
+            client (str): 客户端标识,用于公平排队
+
+        返回:
+            Slot: 名额,使用完毕后调用release()或用with语句自动释放
+
+        异常:
+            AdmissionRejected: 队列已满、该客户端排队数达到上限或等待超时
+        """
+        slot = Slot(self, client)
+        with self._lock:
+            if self._active < self.limit and not self._queued:
+                self._active += 1
+                self._grant(slot)
+                return slot
+            if self.max_queue is not None and self._queued >= self.max_queue:
+                self._rejected['queue_full'] += 1
+                raise self._reject('queue_full', self._estimate_wait(self._queued))
+            if (self.max_queue_per_client is not None
+                    and len(self._queues.get(client, ())) >= self.max_queue_per_client):
+                # 单个客户端排队的请求数有上限,不能占满整个队列
+                self._rejected['client_queue_full'] += 1
+                raise self._reject('client_queue_full', self._estimate_wait(self._queued))
+            estimate = self._estimate_wait(self._queued + 1)
+            if self.max_wait is not None and estimate is not None and estimate > self.max_wait:
+                self._rejected['wait_timeout'] += 1
+                raise self._reject('wait_timeout', estimate)
+            slot.event = threading.Event()
+            self._queues.setdefault(client, deque()).append(slot)
+            self._queued += 1
+
+        slot.event.wait(self.max_wait)
+        with self._lock:
+            if slot.granted:
+                return slot
+            # 等待超时: 退出队列
+            queue = self._queues.get(client)
+            if queue is not None and slot in queue:
+                queue.remove(slot)
+                if not queue:
+                    del self._queues[client]
+                self._queued -= 1
+            self._rejected['wait_timeout'] += 1
+            raise self._reject('wait_timeout', self._estimate_wait(self._queued))
+
+    def release(self, slot):
+        """
+        释放名额,交给下一个客户端队列的队首请求
+        """
+        with self._lock:
+            if slot.released or not slot.granted:
+                return
+            slot.released = True
+            held = time.monotonic() - slot.acquired
+            self._hold = held if self._hold is None else self._hold * 0.9 + held * 0.1
+            if not self._queues:
+                self._active -= 1
+                return
+            # 按客户端轮转: 取最前面的客户端,其队列还有请求时移到末尾
+            client, queue = self._queues.popitem(last=False)
+            waiter = queue.popleft()
+            if queue:
+                self._queues[client] = queue
+            self._queued -= 1
+            self._grant(waiter)
+            waiter.event.set()
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                'name': self.name,
+                'limit': self.limit,
+                'active': self._active,
+                'queued': self._queued,
+                'maxQueue': self.max_queue,
+                'maxWaitSeconds': self.max_wait,
+                'waitingClients': len(self._queues),
+                'admitted': self._admitted,
+                'rejected': dict(self._rejected),
+                'avgHoldSeconds': round(self._hold, 3) if self._hold is not None else None,
+                'avgWaitSeconds': round(sum(waits) / len(waits), 3) if waits else None,
+                'p95WaitSeconds': round(waits[min(len(waits) - 1, int(0.95 * len(waits)))], 3) if waits else None
+            }
+
+    def _grant(self, slot):
+        now = time.monotonic()
+        slot.granted = True
+        slot.acquired = now
+        slot.waited = now - slot.enqueued
+        self._waits.append(slot.waited)
+        self._admitted += 1
+
+    def _estimate_wait(self, position):
+        """
+        排在第position位时的预计等待时间(还没有占用时长样本时返回None)
+        """
+        if self._hold is None:
+            return None
+        return position / self.limit * self._hold
+
+    def _reject(self, reason, estimate):
+        retry_after = estimate if estimate is not None else (self.max_wait or 1.0)
+        return AdmissionRejected(f"{self.name}繁忙,请稍后再试", max(1.0, retry_after), reason)
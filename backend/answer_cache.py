@@ -0,0 +1,196 @@
+"""
+PDSA数字分身智能体 - 问答缓存模块
+
+功能说明:
+1. 对用户问题做归一化处理(全半角、大小写、空白、标点)
+2. 基于LRU + TTL的有界内存缓存,缓存百炼应用的成功回复
+3. 按条目数和内存预算双重限制缓存容量
+4. 统计命中/未命中/淘汰次数,供管理接口展示
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# 每个缓存条目的固定开销估算(字节),用于内存预算计算
+ENTRY_OVERHEAD_BYTES = 256
+
+
+def normalize_question(text):
+    """
+    归一化用户问题,使措辞相同但格式不同的问题得到相同结果
+
+    处理规则:
+        1. NFKC归一化(全角转半角、兼容字符统一)
+        2. 大小写折叠
+        3. 移除所有空白字符和标点符号
+
+    参数:
+        text (str): 原始问题文本
+
+    返回:
+        str: 归一化后的文本
+
+    示例:
+        "Qoder 的价格是多少？" -> "qoder的价格是多少"
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return ''.join(
+        ch for ch in text
+        if not ch.isspace() and not unicodedata.category(ch).startswith('P')
+    )
+
+
+def build_cache_key(user_message, chat_history=None, history_turns=0):
+    """
+    生成缓存键
+
+    参数:
+        user_message (str): 用户当前问题
+        chat_history (list): 历史对话列表,格式: [{"user": "...", "bot": "..."}]
+        history_turns (int): 参与计算缓存键的最近历史轮数,0表示忽略历史
+
+    返回:
+        str: 缓存键(SHA1十六进制串)
+    """
+    parts = [normalize_question(user_message)]
+    if history_turns > 0 and chat_history:
+        for turn in chat_history[-history_turns:]:
+            if isinstance(turn, dict):
+                parts.append(normalize_question(turn.get('user', '')))
+                parts.append(normalize_question(turn.get('bot', '')))
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """
+    线程安全的LRU + TTL问答缓存
+
+    参数:
+        max_entries (int): 最大缓存条目数
+        max_bytes (int): 缓存内存预算(字节,按UTF-8编码长度估算)
+        ttl (float): 条目有效期(秒)
+
+    说明:
+        - 读取命中时将条目移动到队尾(最近使用)
+        - 写入超出条目数或内存预算时从队首(最久未使用)开始淘汰
+        - 过期条目在读取时惰性删除
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=16 * 1024 * 1024, ttl=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (answer, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        """
+        读取缓存
+
+        参数:
+            key (str): 缓存键
+
+        返回:
+            str|None: 命中时返回缓存的回复,否则返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            answer, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                # 已过期,惰性删除
+                del self._entries[key]
+                self._bytes -= size
+                self._expirations += 1
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return answer
+
+    def set(self, key, answer, ttl=None):
+        """
+        写入缓存
+
+        参数:
+            key (str): 缓存键
+            answer (str): AI回复内容
+            ttl (float): 自定义有效期(秒),缺省使用全局配置
+
+        返回:
+            bool: 是否写入成功(单条超出内存预算时不缓存)
+        """
+        size = len(key) + len(answer.encode('utf-8')) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes or self.max_entries <= 0:
+            return False
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+            self._entries[key] = (answer, expires_at, size)
+            self._bytes += size
+
+            # 超出容量时淘汰最久未使用的条目
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+        return True
+
+    def clear(self):
+        """
+        清空缓存(知识库文档更新时调用)
+
+        返回:
+            int: 被清除的条目数
+        """
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self._invalidations += 1
+        return count
+
+    def stats(self):
+        """
+        获取缓存统计信息
+
+        返回:
+            dict: 统计信息
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxEntries': self.max_entries,
+                'maxBytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hitRate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations
+            }
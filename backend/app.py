@@ -16,15 +16,40 @@ import json
 import re
 import time
 from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 from http import HTTPStatus
 from dashscope import Application
 import requests
-from bs4 import BeautifulSoup
 import threading
+import atexit
+import logging
 import schedule
+from answer_cache import AnswerCache, build_cache_key
+from single_flight import SingleFlight
+from doc_jobs import DocJobQueue, JobQueueFullError
+from doc_batch import BatchIngestor, parse_sitemap
+from site_crawler import CrawlerBusyError, SiteCrawler
+from kb_sync import KnowledgeBaseSync, create_uploader
+from web_fetcher import WebFetcher
+import html_extract
+from doc_chunking import split_content, map_chunks, SectionMerger
+from doc_index import DocIndex, content_key
+from doc_search import DocSearchIndex
+from log_writer import AsyncLogWriter
+from log_store import LogStore, available_codecs
+from log_search import LogSearchIndex, SearchQueryError, parse_time_bound
+from log_export import EXPORT_FORMATS, iter_export, gzip_stream
+from chat_analytics import ChatAnalytics
+from chat_sessions import SessionStore, build_messages, trim_history
+from log_config import setup_logging
+import metrics
+from request_profiler import RequestProfiler
+from leader import LeaderElection
+from admission import AdmissionPool, AdmissionRejected, TokenBucketLimiter
+from resilience import (CircuitBreaker, CircuitOpenError, ResilientCaller, RetryBudget,
+                        UpstreamError, create_executor)
 
 # ========================================
 # 配置加载区域
@@ -36,6 +61,17 @@ import schedule
 # 加载.env文件
 load_dotenv()
 
+# ========================================
+# 运行日志配置
+# ========================================
+# LOG_LEVEL: 运行日志级别(DEBUG/INFO/WARNING/ERROR),默认INFO
+# LOG_RATE_LIMIT: 同一代码位置每分钟最多输出的日志条数(0表示不限流)
+setup_logging(
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    max_records=int(os.getenv('LOG_RATE_LIMIT', 20))
+)
+logger = logging.getLogger('pdsa')
+
 # ========================================
 # 阿里云AccessKey配置
 # ========================================
@@ -66,30 +102,38 @@ FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
 # ========================================
 # 验证必需的配置项是否已正确设置
 # 如果缺失关键配置,抛出明确的错误提示指引用户
+# 在启动服务时(create_app / 直接运行)调用,导入模块本身不做验证
 
-if not ACCESS_KEY_ID or ACCESS_KEY_ID == 'your_access_key_id_here':
-    raise ValueError(
-        "❌ 缺少配置: ALIBABA_CLOUD_ACCESS_KEY_ID\n"
-        "请在backend/.env文件中配置阿里云AccessKey ID\n"
-        "获取方式: https://ram.console.aliyun.com/manage/ak\n"
-        "参考文件: backend/.env.example"
-    )
-
-if not ACCESS_KEY_SECRET or ACCESS_KEY_SECRET == 'your_access_key_secret_here':
-    raise ValueError(
-        "❌ 缺少配置: ALIBABA_CLOUD_ACCESS_KEY_SECRET\n"
-        "请在backend/.env文件中配置阿里云AccessKey Secret\n"
-        "获取方式: https://ram.console.aliyun.com/manage/ak\n"
-        "参考文件: backend/.env.example"
-    )
-
-if not APP_ID or APP_ID == 'your_bailian_app_id_here':
-    raise ValueError(
-        "❌ 缺少配置: BAILIAN_APP_ID\n"
-        "请在backend/.env文件中配置百炼应用ID\n"
-        "获取方式: https://bailian.console.aliyun.com/ -> 应用中心\n"
-        "参考文件: backend/.env.example"
-    )
+def validate_config():
+    """
+    验证必需配置
+    
+    异常:
+        ValueError: 缺少必需配置
+    """
+    if not ACCESS_KEY_ID or ACCESS_KEY_ID == 'your_access_key_id_here':
+        raise ValueError(
+            "❌ 缺少配置: ALIBABA_CLOUD_ACCESS_KEY_ID\n"
+            "请在backend/.env文件中配置阿里云AccessKey ID\n"
+            "获取方式: https://ram.console.aliyun.com/manage/ak\n"
+            "参考文件: backend/.env.example"
+        )
+    
+    if not ACCESS_KEY_SECRET or ACCESS_KEY_SECRET == 'your_access_key_secret_here':
+        raise ValueError(
+            "❌ 缺少配置: ALIBABA_CLOUD_ACCESS_KEY_SECRET\n"
+            "请在backend/.env文件中配置阿里云AccessKey Secret\n"
+            "获取方式: https://ram.console.aliyun.com/manage/ak\n"
+            "参考文件: backend/.env.example"
+        )
+    
+    if not APP_ID or APP_ID == 'your_bailian_app_id_here':
+        raise ValueError(
+            "❌ 缺少配置: BAILIAN_APP_ID\n"
+            "请在backend/.env文件中配置百炼应用ID\n"
+            "获取方式: https://bailian.console.aliyun.com/ -> 应用中心\n"
+            "参考文件: backend/.env.example"
+        )
 
 # ========================================
 # Flask应用初始化
@@ -97,29 +141,512 @@ if not APP_ID or APP_ID == 'your_bailian_app_id_here':
 app = Flask(__name__, static_folder='../frontend')
 CORS(app)  # 启用跨域支持,允许前端访问API
 
-# 设置日志文件路径
-LOG_FILE = os.path.join(os.path.dirname(__file__), 'chat_logs.txt')
+# ========================================
+# 运行指标定义
+# ========================================
+# 指标通过 GET /metrics 以Prometheus文本格式输出(每个进程独立统计)
+HTTP_REQUESTS = metrics.Counter(
+    'pdsa_http_requests_total', 'HTTP请求总数', ('method', 'route', 'status'))
+HTTP_REQUEST_SECONDS = metrics.Histogram(
+    'pdsa_http_request_duration_seconds', 'HTTP请求处理耗时(流式接口统计到开始响应)', ('method', 'route'))
+HTTP_IN_FLIGHT = metrics.Gauge(
+    'pdsa_http_requests_in_flight', '正在处理的HTTP请求数', ('route',))
+UPSTREAM_REQUESTS = metrics.Counter(
+    'pdsa_dashscope_requests_total', '百炼API调用总数', ('app_id', 'operation', 'status'))
+UPSTREAM_SECONDS = metrics.Histogram(
+    'pdsa_dashscope_request_duration_seconds', '百炼API调用耗时(流式调用统计到最后一个分片)', ('app_id', 'operation'))
+UPSTREAM_FIRST_CHUNK_SECONDS = metrics.Histogram(
+    'pdsa_dashscope_first_chunk_seconds', '百炼流式调用首个分片耗时', ('app_id',))
+UPSTREAM_IN_FLIGHT = metrics.Gauge(
+    'pdsa_dashscope_requests_in_flight', '正在进行的百炼API调用数', ('operation',))
+FETCH_SECONDS = metrics.Histogram(
+    'pdsa_web_fetch_duration_seconds', '网页抓取耗时(含正文提取)', ('result',))
+PARSE_SECONDS = metrics.Histogram(
+    'pdsa_html_parse_duration_seconds', 'HTML正文提取耗时', ('engine',))
+ADMISSION_WAIT_SECONDS = metrics.Histogram(
+    'pdsa_admission_wait_seconds', '百炼调用名额排队等待时间', ('pool',),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+DOC_FASTPATH = metrics.Counter(
+    'pdsa_doc_fastpath_total', '本地FAQ匹配结果(answered: 本地直接回答 / grounded: 附带资料调用百炼 / miss: 未命中)',
+    ('result',))
+ADMISSION_REJECTED = metrics.Counter(
+    'pdsa_admission_rejected_total', '被拒绝(HTTP 429)的请求数', ('reason',))
+LOG_WRITE_SECONDS = metrics.Histogram(
+    'pdsa_log_write_batch_seconds', '对话日志批量写入耗时',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+
+def observe_upstream(app_id, operation, started, status):
+    """
+    记录一次百炼API调用的耗时和结果
+    
+    参数:
+        app_id (str): 百炼应用ID
+        operation (str): 调用类型 chat/chat_stream/doc
+        started (float): 开始时间(time.perf_counter)
+        status: HTTP状态码,异常时为'exception'
+    """
+    UPSTREAM_SECONDS.labels(app_id=app_id, operation=operation).observe(time.perf_counter() - started)
+    UPSTREAM_REQUESTS.labels(app_id=app_id, operation=operation, status=status).inc()
+
+
+def request_route():
+    """
+    当前请求匹配的路由模板(未匹配时为unmatched,避免按原始路径产生大量标签)
+    """
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+@app.before_request
+def start_request_metrics():
+    request.environ['pdsa.started'] = time.perf_counter()
+    route = request_route()
+    request.environ['pdsa.route'] = route
+    HTTP_IN_FLIGHT.labels(route=route).inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = request.environ.get('pdsa.started')
+    if started is not None:
+        route = request.environ['pdsa.route']
+        HTTP_REQUEST_SECONDS.labels(method=request.method, route=route).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(method=request.method, route=route, status=response.status_code).inc()
+    return response
 
-# 设置配置文件路径
-SETTINGS_FILE = os.path.join(os.path.dirname(__file__), 'settings.json')
 
-# 设置文档存储目录
-DOCS_DIR = os.path.join(os.path.dirname(__file__), '..', 'docs')
+@app.teardown_request
+def finish_request_metrics(exc):
+    route = request.environ.pop('pdsa.route', None)
+    if route is not None:
+        HTTP_IN_FLIGHT.labels(route=route).dec()
+
+
+# ========================================
+# 请求剖析配置
+# ========================================
+# PROFILE_SAMPLE_RATE: 请求采样比例(0~1),默认0不采样;可在管理后台临时调整
+# PROFILE_MAX_TRACES: 保留耗时最长的剖析记录条数
+# PROFILE_TOKEN: 请求头X-PDSA-Profile等于该口令时剖析该请求,为空时不允许请求头触发
+# PROFILE_SAMPLE_INTERVAL_MS: 剖析期间调用栈采样间隔(毫秒),用于生成火焰图
+request_profiler = RequestProfiler(
+    sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', 0)),
+    max_traces=int(os.getenv('PROFILE_MAX_TRACES', 20)),
+    token=os.getenv('PROFILE_TOKEN', ''),
+    sample_interval=float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5)) / 1000
+)
+
+
+@app.before_request
+def start_request_profile():
+    # 关闭时只做一次判断,不产生额外开销
+    if request_profiler.enabled:
+        trace = request_profiler.begin(request.method, request.path, request.headers)
+        if trace is not None:
+            request.environ['pdsa.trace'] = trace
+
+
+@app.after_request
+def finish_request_profile(response):
+    trace = request.environ.pop('pdsa.trace', None)
+    if trace is not None:
+        trace.route = request_route()
+        # 在响应关闭时结束剖析,流式接口包含整个生成过程
+        response.call_on_close(lambda: request_profiler.end(trace, response.status_code))
+    return response
+
+
+@app.teardown_request
+def abort_request_profile(exc):
+    # 未经过after_request(未处理的异常)时在这里结束剖析
+    trace = request.environ.pop('pdsa.trace', None)
+    if trace is not None:
+        trace.route = request_route()
+        request_profiler.end(trace, 500)
+
+# ========================================
+# 对话日志存储配置
+# ========================================
+# LOG_DIR: 结构化日志目录(JSON Lines段文件 + manifest.json清单)
+# LOG_SEGMENT_MAX_BYTES: 单个段文件大小上限(字节),写满后切换到新段
+LOG_DIR = os.getenv('LOG_DIR', os.path.join(os.path.dirname(__file__), 'data', 'chat_logs'))
+LOG_SEGMENT_MAX_BYTES = int(os.getenv('LOG_SEGMENT_MAX_BYTES', 16 * 1024 * 1024))
+# LEGACY_LOG_FILE: 旧版纯文本日志,启动时(开始写入新日志之前)一次性导入LOG_DIR,导入后重命名为 *.imported
+LEGACY_LOG_FILE = os.getenv('LEGACY_LOG_FILE', os.path.join(os.path.dirname(__file__), 'chat_logs.txt'))
+# LOG_MAINTENANCE_INTERVAL: 日志轮转/压缩/清理的检查间隔(分钟)
+LOG_MAINTENANCE_INTERVAL = int(os.getenv('LOG_MAINTENANCE_INTERVAL', 5))
+
+# 日志轮转间隔选项 -> 秒数
+LOG_ROTATE_INTERVALS = {'none': None, 'hourly': 3600, 'daily': 86400, 'weekly': 7 * 86400}
+
+# ========================================
+# 异步日志写入配置
+# ========================================
+# LOG_QUEUE_SIZE: 日志内存队列容量
+# LOG_FLUSH_INTERVAL: 批量写入间隔(秒)
+# LOG_DURABILITY: 持久化级别(flush: 每批刷新到操作系统 / fsync: 每批强制落盘)
+# LOG_OVERFLOW_POLICY: 队列满时的策略(sync: 直接写入 / block: 等待 / drop: 丢弃)
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 0.2))
+LOG_DURABILITY = os.getenv('LOG_DURABILITY', 'flush').lower()
+LOG_OVERFLOW_POLICY = os.getenv('LOG_OVERFLOW_POLICY', 'sync').lower()
+
+chat_log_store = LogStore(LOG_DIR, segment_max_bytes=LOG_SEGMENT_MAX_BYTES, durability=LOG_DURABILITY)
+
+# 在开始写入新日志之前导入旧版文本日志,旧记录的序号小于新记录(多个worker同时启动时只有一个进程导入)
+try:
+    _legacy_imported = chat_log_store.import_legacy(LEGACY_LOG_FILE)
+    if _legacy_imported:
+        logger.info("已导入旧版日志%d条: %s", _legacy_imported, LEGACY_LOG_FILE)
+except Exception as e:
+    logger.error("导入旧版日志失败: %s", e)
+
+
+def write_log_batch(records):
+    """
+    日志写入线程的写出函数: 写入日志存储并记录批次耗时
+    """
+    with LOG_WRITE_SECONDS.time():
+        chat_log_store.append(records)
+
+
+chat_log_writer = AsyncLogWriter(
+    write_log_batch,
+    max_queue=LOG_QUEUE_SIZE,
+    flush_interval=LOG_FLUSH_INTERVAL,
+    overflow=LOG_OVERFLOW_POLICY
+)
+
+# 进程退出前写出队列中剩余的日志
+atexit.register(chat_log_writer.close)
+
+# 设置配置文件路径(SETTINGS_FILE可覆盖)
+SETTINGS_FILE = os.getenv('SETTINGS_FILE', os.path.join(os.path.dirname(__file__), 'settings.json'))
+
+# 设置文档存储目录(DOCS_DIR可覆盖,压测时指向临时目录)
+DOCS_DIR = os.getenv('DOCS_DIR', os.path.join(os.path.dirname(__file__), '..', 'docs'))
 
 # 确保docs目录存在
 if not os.path.exists(DOCS_DIR):
     os.makedirs(DOCS_DIR)
 
+# 设置运行时数据目录(任务日志、索引等,DATA_DIR可覆盖)
+DATA_DIR = os.getenv('DATA_DIR', os.path.join(os.path.dirname(__file__), 'data'))
+
+# 确保data目录存在
+if not os.path.exists(DATA_DIR):
+    os.makedirs(DATA_DIR)
+
 # 百炼文档整理应用配置
 # 注意: 如果下面的APP_ID无法使用,将会降级使用现有的百炼应用
 DOC_APP_ID = os.getenv('DOC_APP_ID', 'af2071542ff0433c92d8c0d3f18595ce')
 DOC_API_KEY = os.getenv('DOC_API_KEY', 'sk-2b88c624bb4748e8b058f49a9d4c33f1')
 
+# 文档去重索引: 来源内容哈希 -> 已生成文档(只追加的JSON Lines日志),同时负责在docs目录中占用文件名
+doc_index = DocIndex(os.path.join(DATA_DIR, 'doc_index.jsonl'), DOCS_DIR)
+
+# 对话日志全文索引: 日志写入线程批量写出后增量更新
+LOG_SEARCH_DB = os.getenv('LOG_SEARCH_DB', os.path.join(DATA_DIR, 'chat_logs.db'))
+LOG_SEARCH_MAX_LIMIT = 100
+log_search_index = LogSearchIndex(LOG_SEARCH_DB)
+chat_log_store.listeners.append(log_search_index.add)
+
+# ========================================
+# 问答缓存配置
+# ========================================
+# ANSWER_CACHE_ENABLED: 是否启用问答缓存,默认启用
+# ANSWER_CACHE_MAX_ENTRIES: 最大缓存条目数
+# ANSWER_CACHE_MAX_BYTES: 缓存内存预算(字节),默认16MB
+# ANSWER_CACHE_TTL: 缓存有效期(秒),默认1小时
+# ANSWER_CACHE_HISTORY_TURNS: 参与缓存键计算的历史轮数,0表示只按问题缓存
+#   历史会随问题一起发送给百炼,历史超过该轮数的问题不读写缓存(回答依赖上下文)
+ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+ANSWER_CACHE_HISTORY_TURNS = int(os.getenv('ANSWER_CACHE_HISTORY_TURNS', 0))
+
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 1000)),
+    max_bytes=int(os.getenv('ANSWER_CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+    ttl=float(os.getenv('ANSWER_CACHE_TTL', 3600))
+)
+
+# 请求合并器: 相同问题的并发请求共享一次百炼调用
+chat_flight = SingleFlight()
+
+# ========================================
+# 本地文档检索配置
+# ========================================
+# 对docs目录建立BM25索引,问题与FAQ标题高度相似时走本地快速路径
+# DOC_FASTPATH_MODE: off: 关闭 / answer: 直接返回FAQ答案,不调用百炼 / ground: 把FAQ答案附在问题前一起发给百炼
+# DOC_FASTPATH_MIN_SIMILARITY: 问题与FAQ标题的最低相似度(0~1),越高越保守
+# DOC_SEARCH_REFRESH_INTERVAL: 检查docs目录变化的间隔(秒),多进程部署时其他进程生成的文档据此更新
+DOC_FASTPATH_MODE = os.getenv('DOC_FASTPATH_MODE', 'off').lower()
+DOC_FASTPATH_MIN_SIMILARITY = float(os.getenv('DOC_FASTPATH_MIN_SIMILARITY', 0.8))
+doc_search_index = DocSearchIndex(DOCS_DIR, refresh_interval=float(os.getenv('DOC_SEARCH_REFRESH_INTERVAL', 30)))
+
+# ========================================
+# 对话会话配置
+# ========================================
+# 对话历史保存在服务端,前端每轮只发送新问题和sessionId
+# CHAT_SESSION_MAX: 内存中保留的会话数,超出时淘汰最久未使用的会话
+# CHAT_SESSION_TTL: 会话空闲多久后过期(秒)
+# CHAT_SESSION_SPILL: 每轮对话是否写入DATA_DIR/chat_sessions(多worker部署时共享会话,关闭后会话只在本进程内有效)
+# CHAT_HISTORY_TOKEN_BUDGET: 每轮随问题发送的历史token预算(按最近的轮次保留)
+# CHAT_HISTORY_MAX_TURNS: 每轮最多发送的历史轮数
+chat_sessions = SessionStore(
+    max_sessions=int(os.getenv('CHAT_SESSION_MAX', 10000)),
+    ttl=float(os.getenv('CHAT_SESSION_TTL', 86400)),
+    token_budget=int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', 2000)),
+    max_turns=int(os.getenv('CHAT_HISTORY_MAX_TURNS', 10)),
+    spill_dir=(os.path.join(DATA_DIR, 'chat_sessions')
+               if os.getenv('CHAT_SESSION_SPILL', 'true').lower() == 'true' else None)
+)
+
+
+def resolve_chat_session(data):
+    """
+    根据请求体确定会话和随问题发送的历史
+    
+    参数:
+        data (dict): 请求体,可包含sessionId;旧版前端仍会发送完整的history
+    
+    返回:
+        tuple: (会话ID, 已裁剪的历史对话列表)
+    """
+    session_id = chat_sessions.resolve(data.get('sessionId'))
+    chat_history = chat_sessions.history(session_id)
+    legacy_history = data.get('history')
+    if not chat_history and isinstance(legacy_history, list) and legacy_history:
+        # 兼容旧版前端: 使用请求中的历史,同样按预算裁剪
+        chat_history = trim_history([turn for turn in legacy_history if isinstance(turn, dict)],
+                                    chat_sessions.token_budget, chat_sessions.max_turns)
+    return session_id, chat_history
+
+# ========================================
+# 百炼调用容错配置
+# ========================================
+# UPSTREAM_CHAT_DEADLINE: 对话调用截止时间(秒,含重试),超时后直接返回错误
+# UPSTREAM_DOC_DEADLINE: 文档整理调用截止时间(秒,含重试)
+# UPSTREAM_MAX_ATTEMPTS: 单次调用最多尝试次数(含首次),仅限流/服务端错误/网络异常重试
+# UPSTREAM_RETRY_RATIO: 全局重试预算,10秒内重试数不超过请求数的该比例
+# UPSTREAM_BREAKER_FAILURES: 连续失败多少次后熔断
+# UPSTREAM_BREAKER_OPEN_SECONDS: 熔断持续时间(秒),之后放行一个探测请求
+# UPSTREAM_HEDGE: 对话调用超过近期p95延迟仍未返回时,是否再发一个对冲请求
+# UPSTREAM_POOL_SIZE: 执行百炼调用的线程数(即同时进行的非流式调用上限)
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv('UPSTREAM_MAX_ATTEMPTS', 3))
+UPSTREAM_BREAKER_FAILURES = int(os.getenv('UPSTREAM_BREAKER_FAILURES', 5))
+UPSTREAM_BREAKER_OPEN_SECONDS = float(os.getenv('UPSTREAM_BREAKER_OPEN_SECONDS', 30))
+
+upstream_executor = create_executor(int(os.getenv('UPSTREAM_POOL_SIZE', 32)), name='dashscope')
+upstream_retry_budget = RetryBudget(ratio=float(os.getenv('UPSTREAM_RETRY_RATIO', 0.2)))
+
+# 对话应用和文档整理应用各自熔断,共享重试预算和线程池
+chat_upstream = ResilientCaller(
+    'AI对话服务',
+    CircuitBreaker('AI对话服务', UPSTREAM_BREAKER_FAILURES, UPSTREAM_BREAKER_OPEN_SECONDS),
+    upstream_retry_budget,
+    upstream_executor,
+    deadline=float(os.getenv('UPSTREAM_CHAT_DEADLINE', 60)),
+    max_attempts=UPSTREAM_MAX_ATTEMPTS,
+    hedge=os.getenv('UPSTREAM_HEDGE', 'false').lower() == 'true'
+)
+doc_upstream = ResilientCaller(
+    '文档整理服务',
+    CircuitBreaker('文档整理服务', UPSTREAM_BREAKER_FAILURES, UPSTREAM_BREAKER_OPEN_SECONDS),
+    upstream_retry_budget,
+    upstream_executor,
+    deadline=float(os.getenv('UPSTREAM_DOC_DEADLINE', 240)),
+    max_attempts=UPSTREAM_MAX_ATTEMPTS
+)
+
+# ========================================
+# 准入控制配置
+# ========================================
+# ADMISSION_CHAT_CONCURRENCY: 同时进行的对话百炼调用上限
+# ADMISSION_CHAT_QUEUE: 对话等待队列上限,超出时返回429
+# ADMISSION_CHAT_QUEUE_PER_CLIENT: 单个客户端在对话等待队列中的请求数上限,超出时返回429(0表示不限)
+# ADMISSION_CHAT_MAX_WAIT: 对话最长排队时间(秒),预计等待超过该值时立即返回429
+# ADMISSION_DOC_CONCURRENCY: 同时进行的文档整理百炼调用上限(后台任务排队等待,不拒绝)
+# RATE_LIMIT_PER_MINUTE / RATE_LIMIT_BURST: 每个客户端的对话请求速率和突发上限(0表示不限流)
+# ADMISSION_CLIENT_HEADER: 识别客户端的请求头(如部署在反向代理后使用X-Real-IP),为空时使用连接IP
+chat_admission = AdmissionPool(
+    'AI对话服务',
+    int(os.getenv('ADMISSION_CHAT_CONCURRENCY', 16)),
+    max_queue=int(os.getenv('ADMISSION_CHAT_QUEUE', 64)),
+    max_wait=float(os.getenv('ADMISSION_CHAT_MAX_WAIT', 10)),
+    max_queue_per_client=int(os.getenv('ADMISSION_CHAT_QUEUE_PER_CLIENT', 8)) or None
+)
+doc_admission = AdmissionPool('文档整理服务', int(os.getenv('ADMISSION_DOC_CONCURRENCY', 4)))
+chat_rate_limiter = TokenBucketLimiter(
+    rate=float(os.getenv('RATE_LIMIT_PER_MINUTE', 30)) / 60,
+    burst=int(os.getenv('RATE_LIMIT_BURST', 10))
+)
+ADMISSION_CLIENT_HEADER = os.getenv('ADMISSION_CLIENT_HEADER', '')
+
+
+def request_client_id():
+    """
+    当前请求的客户端标识(用于限流和公平排队)
+    """
+    if ADMISSION_CLIENT_HEADER:
+        value = request.headers.get(ADMISSION_CLIENT_HEADER, '').split(',')[0].strip()
+        if value:
+            return value
+    return request.remote_addr or 'unknown'
+
+
+def admission_rejected_response(error):
+    """
+    未被准入的请求返回429,并通过Retry-After告知客户端何时重试
+    
+    参数:
+        error (AdmissionRejected): 拒绝原因
+    
+    返回:
+        Response: HTTP 429响应
+    """
+    ADMISSION_REJECTED.labels(reason=error.reason).inc()
+    response = jsonify({
+        "success": False,
+        "error": str(error),
+        "retryAfter": round(error.retry_after, 1)
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, int(error.retry_after + 0.999)))
+    return response
+
+# ========================================
+# 对话统计配置
+# ========================================
+# ANALYTICS_SNAPSHOT_INTERVAL: 统计快照写入间隔(秒)
+# ANALYTICS_RETAIN_HOURS: 按小时统计的保留时长
+# ANALYTICS_TOP_K: 热门问题数量
+chat_analytics = ChatAnalytics(
+    os.path.join(DATA_DIR, 'chat_analytics.json'),
+    retain_buckets=int(os.getenv('ANALYTICS_RETAIN_HOURS', 168)),
+    top_k=int(os.getenv('ANALYTICS_TOP_K', 20)),
+    snapshot_interval=float(os.getenv('ANALYTICS_SNAPSHOT_INTERVAL', 60))
+)
+
+# 进程退出前写入最后一次统计快照
+atexit.register(chat_analytics.close)
+
+# ========================================
+# 文档生成任务队列配置
+# ========================================
+# DOC_JOB_WORKERS: 后台执行文档生成的工作线程数
+# DOC_JOB_MAX_QUEUED: 排队任务上限,超出时拒绝提交
+DOC_JOB_WORKERS = int(os.getenv('DOC_JOB_WORKERS', 2))
+DOC_JOB_MAX_QUEUED = int(os.getenv('DOC_JOB_MAX_QUEUED', 100))
+DOC_JOB_JOURNAL = os.path.join(DATA_DIR, 'doc_jobs.jsonl')
+
+# ========================================
+# 批量文档导入配置
+# ========================================
+# DOC_BATCH_MAX_URLS: 单个批次最多处理的URL数
+# DOC_BATCH_FETCH_WORKERS: 并发抓取线程总数
+# DOC_BATCH_PER_HOST_LIMIT: 同一域名的并发抓取上限
+# DOC_BATCH_GENERATE_CONCURRENCY: 文档生成(百炼调用)并发上限
+DOC_BATCH_MAX_URLS = int(os.getenv('DOC_BATCH_MAX_URLS', 500))
+DOC_BATCH_FETCH_WORKERS = int(os.getenv('DOC_BATCH_FETCH_WORKERS', 16))
+DOC_BATCH_PER_HOST_LIMIT = int(os.getenv('DOC_BATCH_PER_HOST_LIMIT', 4))
+DOC_BATCH_GENERATE_CONCURRENCY = int(os.getenv('DOC_BATCH_GENERATE_CONCURRENCY', 4))
+
+# ========================================
+# 站点抓取配置
+# ========================================
+# CRAWL_WORKERS: 并发抓取线程数
+# CRAWL_GENERATE_CONCURRENCY: 抓取过程中文档生成的并发数
+# CRAWL_DELAY: 同一域名的最小请求间隔(秒),robots.txt的Crawl-delay更大时以其为准
+# CRAWL_MAX_DEPTH / CRAWL_MAX_PAGES: 默认的链接跟随层数和单轮最多页面数
+# CRAWL_RESPECT_ROBOTS: 是否遵守robots.txt
+# CRAWL_SEEDS / CRAWL_SITEMAPS: 定时抓取的种子URL和站点地图(逗号分隔)
+# CRAWL_INTERVAL_HOURS: 定时重新抓取的间隔(小时),0表示只手动抓取
+CRAWL_WORKERS = int(os.getenv('CRAWL_WORKERS', 4))
+CRAWL_GENERATE_CONCURRENCY = int(os.getenv('CRAWL_GENERATE_CONCURRENCY', 2))
+CRAWL_DELAY = float(os.getenv('CRAWL_DELAY', 1.0))
+CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH', 3))
+CRAWL_MAX_PAGES = int(os.getenv('CRAWL_MAX_PAGES', DOC_BATCH_MAX_URLS))
+CRAWL_RESPECT_ROBOTS = os.getenv('CRAWL_RESPECT_ROBOTS', 'true').lower() == 'true'
+CRAWL_SEEDS = [url.strip() for url in os.getenv('CRAWL_SEEDS', '').split(',') if url.strip()]
+CRAWL_SITEMAPS = [url.strip() for url in os.getenv('CRAWL_SITEMAPS', '').split(',') if url.strip()]
+CRAWL_INTERVAL_HOURS = float(os.getenv('CRAWL_INTERVAL_HOURS', 0))
+
+# ========================================
+# 知识库同步配置
+# ========================================
+# KB_SYNC_ENABLED: 是否把docs目录的变化同步到知识库
+# KB_SYNC_UPLOADER: 上传器 local(复制到本地目录) / http(PUT/DELETE接口) / 模块名:类名(自定义,须继承kb_sync.Uploader)
+# KB_SYNC_LOCAL_DIR: local上传器的目标目录
+# KB_SYNC_HTTP_URL / KB_SYNC_HTTP_TOKEN: http上传器的文档集合地址和Bearer令牌
+# KB_SYNC_BATCH_SIZE: 每批同步的文档数(每批结束后保存同步状态)
+# KB_SYNC_WORKERS: 批次内的并发上传数
+# KB_SYNC_MAX_ATTEMPTS: 单个文档的最多尝试次数
+# KB_SYNC_DEBOUNCE: 文档写入后等待多久再同步(秒),期间的新文档合并为一次同步
+# KB_SYNC_INTERVAL: 定时全量扫描的间隔(分钟),0表示只在文档写入后同步
+KB_SYNC_ENABLED = os.getenv('KB_SYNC_ENABLED', 'false').lower() == 'true'
+KB_SYNC_INTERVAL = int(os.getenv('KB_SYNC_INTERVAL', 60))
+KB_SYNC_UPLOADER = os.getenv('KB_SYNC_UPLOADER', 'local')
+# 内置上传器的构造参数(自定义上传器不传参数,自行读取配置)
+KB_SYNC_UPLOADER_OPTIONS = {
+    'local': {'target_dir': os.getenv('KB_SYNC_LOCAL_DIR') or os.path.join(DATA_DIR, 'kb_mirror')},
+    'http': {'endpoint': os.getenv('KB_SYNC_HTTP_URL', ''), 'token': os.getenv('KB_SYNC_HTTP_TOKEN')}
+}
+
+kb_sync = KnowledgeBaseSync(
+    DOCS_DIR,
+    os.path.join(DATA_DIR, 'kb_sync_state.json'),
+    create_uploader(KB_SYNC_UPLOADER, **KB_SYNC_UPLOADER_OPTIONS.get(KB_SYNC_UPLOADER, {})),
+    batch_size=int(os.getenv('KB_SYNC_BATCH_SIZE', 20)),
+    workers=int(os.getenv('KB_SYNC_WORKERS', 4)),
+    max_attempts=int(os.getenv('KB_SYNC_MAX_ATTEMPTS', 3)),
+    debounce=float(os.getenv('KB_SYNC_DEBOUNCE', 10))
+) if KB_SYNC_ENABLED else None
+
+# ========================================
+# 网页抓取配置
+# ========================================
+# FETCH_MAX_BYTES: 单个页面最大下载字节数,默认10MB
+# FETCH_TIMEOUT: 抓取请求超时(秒)
+# FETCH_POOL_SIZE: 每个域名保持的最大连接数
+FETCH_MAX_BYTES = int(os.getenv('FETCH_MAX_BYTES', 10 * 1024 * 1024))
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', 30))
+FETCH_POOL_SIZE = int(os.getenv('FETCH_POOL_SIZE', max(16, DOC_BATCH_FETCH_WORKERS)))
+
+# HTML_EXTRACT_ENGINE: 正文提取引擎(auto/lxml/bs4),auto优先使用lxml
+HTML_EXTRACT_ENGINE = os.getenv('HTML_EXTRACT_ENGINE', 'auto')
+
+# 共享网页抓取器: 连接池 + ETag/Last-Modified条件请求缓存
+web_fetcher = WebFetcher(
+    os.path.join(DATA_DIR, 'http_cache'),
+    max_bytes=FETCH_MAX_BYTES,
+    timeout=FETCH_TIMEOUT,
+    pool_size=FETCH_POOL_SIZE
+)
+
+# ========================================
+# 长文档分块生成配置
+# ========================================
+# DOC_CHUNK_MAX_CHARS: 单次生成的最大内容字符数,超出时按结构分块
+# DOC_CHUNK_CONCURRENCY: 单个文档的分块并发生成数
+# DOC_CHUNK_CONSOLIDATE: 分块结果整体整理策略(auto/always/never)
+#   auto: 拼接结果不超过单块上限时再调用一次百炼统一结构
+DOC_CHUNK_MAX_CHARS = int(os.getenv('DOC_CHUNK_MAX_CHARS', 12000))
+DOC_CHUNK_CONCURRENCY = int(os.getenv('DOC_CHUNK_CONCURRENCY', 4))
+DOC_CHUNK_CONSOLIDATE = os.getenv('DOC_CHUNK_CONSOLIDATE', 'auto').lower()
+
+# 文档更新回调列表: generate_doc()写入新文档后依次调用,参数为文件路径
+DOCS_UPDATE_HOOKS = []
+
 # 默认设置
 DEFAULT_SETTINGS = {
     'logCleanup': {
         'strategy': 'never',  # never, daily, weekly, immediate
-        'cleanupTime': '02:00'  # 清理时间
+        'cleanupTime': '02:00',  # 清理时间
+        'rotateMaxMB': max(1, LOG_SEGMENT_MAX_BYTES // (1024 * 1024)),  # 单个日志段大小上限(MB)
+        'rotateInterval': 'none',  # 按时间轮转: none, hourly, daily, weekly
+        'compression': 'gzip',  # 轮转后的归档压缩格式: gzip, zstd, none
+        'retainDays': 0,  # 最长保留天数(0表示不限)
+        'retainMaxMB': 0  # 日志总占用上限(MB, 0表示不限)
     }
 }
 
@@ -128,6 +655,23 @@ DEFAULT_SETTINGS = {
 # 工具函数
 # ========================================
 
+def extract_text_from_html(html):
+    """
+    从HTML中提取纯文本正文
+    
+    参数:
+        html (str): 网页HTML
+    
+    返回:
+        str: 提取的文本内容
+    
+    说明:
+        提取引擎由HTML_EXTRACT_ENGINE配置,lxml不可用或解析失败时降级为BeautifulSoup
+    """
+    with PARSE_SECONDS.labels(engine=HTML_EXTRACT_ENGINE).time(), request_profiler.span('html_parse'):
+        return html_extract.extract_text(html, HTML_EXTRACT_ENGINE)
+
+
 def fetch_web_content(url):
     """
     爬取网页内容
@@ -137,58 +681,49 @@ def fetch_web_content(url):
     
     返回:
         str: 提取的文本内容
+    
+    说明:
+        通过共享连接池发起条件请求,页面未变化(304)时直接复用上次提取的正文
     """
+    started = time.perf_counter()
     try:
-        print(f"[DEBUG] 开始爬取网页: {url}")
-        
-        # 设置请求头,模拟浏览器访问
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+        logger.debug("开始爬取网页: %s", url)
         
-        # 发送请求
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        response.encoding = response.apparent_encoding
+        with request_profiler.span('fetch'):
+            text, not_modified = web_fetcher.fetch_text(
+                url,
+                extract_text_from_html,
+                html_extract.extract_version(HTML_EXTRACT_ENGINE)
+            )
         
-        # 解析HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 移除script和style标签
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # 提取文本内容
-        text = soup.get_text()
-        
-        # 清理空白字符
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-        
-        print(f"[DEBUG] 成功提取内容,长度: {len(text)}")
+        FETCH_SECONDS.labels(result='not_modified' if not_modified else 'ok').observe(time.perf_counter() - started)
+        if not_modified:
+            logger.debug("页面未变化(304),复用缓存内容,长度: %d", len(text))
+        else:
+            logger.debug("成功提取内容,长度: %d", len(text))
         return text
         
     except requests.RequestException as e:
+        FETCH_SECONDS.labels(result='error').observe(time.perf_counter() - started)
         error_msg = f"网页爬取失败: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         raise Exception(error_msg)
     except Exception as e:
+        FETCH_SECONDS.labels(result='error').observe(time.perf_counter() - started)
         error_msg = f"内容解析失败: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+        logger.error(error_msg)
         raise Exception(error_msg)
 
 
-def generate_unique_filename(base_name, docs_dir):
+def generate_unique_filename(base_name):
     """
-    生成唯一的文件名,如果文件已存在则递增编号
+    生成DOCS_DIR下唯一的文件名,如果文件名已被占用则递增编号
     
     参数:
         base_name (str): 基础文件名
-        docs_dir (str): 文档目录路径
     
     返回:
-        str: 唯一的文件名
+        str: 唯一的文件名(已创建空文件占位,生成失败时需调用doc_index.release_name释放)
     """
     # 清理文件名,移除特殊字符
     base_name = re.sub(r'[^a-zA-Z0-9\u4e00-\u9fa5_-]', '', base_name)
@@ -199,20 +734,164 @@ def generate_unique_filename(base_name, docs_dir):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"{base_name}_{timestamp}.md"
     
-    # 检查文件是否存在,如果存在则递增编号
+    # 在docs目录中原子创建空文件占用文件名(多进程之间不冲突),如果已存在则递增编号
     counter = 1
-    while os.path.exists(os.path.join(docs_dir, filename)):
+    while not doc_index.reserve_name(filename):
         filename = f"{base_name}_{timestamp}_{counter}.md"
         counter += 1
     
-    print(f"[DEBUG] 生成唯一文件名: {filename}")
+    logger.debug("生成唯一文件名: %s", filename)
     return filename
 
 
+def notify_docs_updated(file_path):
+    """
+    通知所有文档更新回调: docs目录写入了新文件
+    
+    参数:
+        file_path (str): 新文档的完整路径
+    
+    说明:
+        单个回调失败不影响其他回调和文档生成结果
+    """
+    for hook in DOCS_UPDATE_HOOKS:
+        try:
+            hook(file_path)
+        except Exception as e:
+            logger.error("文档更新回调执行失败(%s): %s", getattr(hook, '__name__', hook), e)
+
+
+def invalidate_answer_cache(file_path):
+    """
+    文档更新回调: 知识库内容变化后清空问答缓存,避免返回过时回复
+    
+    参数:
+        file_path (str): 新文档的完整路径
+    """
+    cleared = answer_cache.clear()
+    logger.info("文档已更新(%s),清除问答缓存%d条", os.path.basename(file_path), cleared)
+
+
+DOCS_UPDATE_HOOKS.append(invalidate_answer_cache)
+
+
+def update_doc_search_index(file_path):
+    """
+    文档更新回调: 增量索引新文档
+    
+    参数:
+        file_path (str): 新文档的完整路径
+    """
+    doc_search_index.add_file(file_path)
+
+
+DOCS_UPDATE_HOOKS.append(update_doc_search_index)
+
+
+def schedule_kb_sync(file_path):
+    """
+    文档更新回调: 延迟同步到知识库(短时间内的多个新文档合并为一次同步)
+    
+    参数:
+        file_path (str): 新文档的完整路径
+    """
+    kb_sync.schedule(file_path)
+
+
+if kb_sync is not None:
+    DOCS_UPDATE_HOOKS.append(schedule_kb_sync)
+
+
+def match_local_faq(user_message, chat_history):
+    """
+    在本地索引中查找与问题高度相似的FAQ(快速路径关闭或为追问时返回None)
+    
+    参数:
+        user_message (str): 用户当前问题
+        chat_history (list): 历史对话列表,有历史时问题可能依赖上下文,不匹配FAQ
+    
+    返回:
+        dict|None: 命中的FAQ段落
+    """
+    if DOC_FASTPATH_MODE not in ('answer', 'ground') or chat_history:
+        return None
+    with request_profiler.span('local_search'):
+        hit = doc_search_index.match_faq(user_message, DOC_FASTPATH_MIN_SIMILARITY)
+    if hit is None:
+        DOC_FASTPATH.labels(result='miss').inc()
+    return hit
+
+
+def local_faq_answer(user_message, chat_history):
+    """
+    answer模式下命中FAQ时直接返回本地答案
+    
+    返回:
+        str|None: 答案(附来源),未命中或非answer模式时返回None
+    """
+    if DOC_FASTPATH_MODE != 'answer':
+        return None
+    hit = match_local_faq(user_message, chat_history)
+    if hit is None:
+        return None
+    DOC_FASTPATH.labels(result='answered').inc()
+    return f"{hit['text']}\n\n> 来源: {hit['file']} · {' > '.join(hit['headings'])}"
+
+
+def grounded_prompt(user_message, chat_history):
+    """
+    ground模式下命中FAQ时把FAQ答案作为参考资料附在问题前
+    
+    返回:
+        str: 发送给百炼的提示词(未命中时为原问题)
+    """
+    if DOC_FASTPATH_MODE != 'ground':
+        return user_message
+    hit = match_local_faq(user_message, chat_history)
+    if hit is None:
+        return user_message
+    DOC_FASTPATH.labels(result='grounded').inc()
+    return (f"参考资料({hit['file']} · {' > '.join(hit['headings'])}):\n{hit['text']}\n\n"
+            f"请优先依据以上资料回答问题,资料不相关时忽略。\n问题: {user_message}")
+
+
+def get_answer_cache_key(user_message, chat_history):
+    """
+    计算问答缓存键,缓存禁用时返回None
+    
+    参数:
+        user_message (str): 用户当前问题
+        chat_history (list): 历史对话列表
+    
+    返回:
+        str|None: 缓存键
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if chat_history and len(chat_history) > ANSWER_CACHE_HISTORY_TURNS:
+        return None
+    return build_cache_key(user_message, chat_history, ANSWER_CACHE_HISTORY_TURNS)
+
+
 # ========================================
 # 百炼API调用函数
 # ========================================
 
+def upstream_error(response):
+    """
+    把百炼返回的非200响应转换为UpstreamError
+    
+    参数:
+        response: ApplicationResponse对象
+    
+    返回:
+        UpstreamError: 限流(429)和服务端错误(5xx)可重试,其余(参数/鉴权等)不重试
+    """
+    status = response.status_code  # type: ignore
+    retryable = status == HTTPStatus.TOO_MANY_REQUESTS or (isinstance(status, int) and status >= 500)
+    return UpstreamError(f"API调用失败: {response.message}", retryable=retryable)  # type: ignore
+
+
 def call_doc_generation_api(prompt):
     """
     调用百炼文档整理API
@@ -222,58 +901,69 @@ def call_doc_generation_api(prompt):
     
     返回:
         str: 生成的Markdown内容
+    
+    说明:
+        限流/服务端错误/网络异常按退避重试,超过截止时间或熔断中时直接抛出异常
     """
-    try:
-        print("[DEBUG] 开始调用Application.call...")
-        print(f"[DEBUG] 使用API Key: {DOC_API_KEY[:20]}...")
-        print(f"[DEBUG] 使用APP ID: {DOC_APP_ID}")
-        
+    logger.debug("调用文档整理API - APP_ID: %s, Prompt长度: %d字符", DOC_APP_ID, len(prompt))
+    
+    def attempt():
         # 调用DashScope Application API
         # Application.call返回ApplicationResponse对象或生成器(取决于stream参数)
-        response = Application.call(
-            api_key=DOC_API_KEY,
-            app_id=DOC_APP_ID,
-            prompt=prompt
-        )
-        
-        print(f"[DEBUG] 响应类型: {type(response)}")
+        started = time.perf_counter()
+        try:
+            with UPSTREAM_IN_FLIGHT.labels(operation='doc').track_inprogress():
+                response = Application.call(
+                    api_key=DOC_API_KEY,
+                    app_id=DOC_APP_ID,
+                    prompt=prompt
+                )
+        except Exception:
+            observe_upstream(DOC_APP_ID, 'doc', started, 'exception')
+            raise
+        observe_upstream(DOC_APP_ID, 'doc', started, getattr(response, 'status_code', 'unknown'))
         
         # 直接访问ApplicationResponse对象
-        if hasattr(response, 'status_code'):
-            print(f"[DEBUG] API响应状态码: {response.status_code}")  # type: ignore
-            
-            # 检查响应状态
-            if response.status_code != HTTPStatus.OK:  # type: ignore
-                error_msg = f"request_id={response.request_id}, code={response.status_code}, message={response.message}"  # type: ignore
-                print(f"[ERROR] API调用失败: {error_msg}")
-                raise Exception(f"API调用失败: {response.message}")  # type: ignore
-            
-            # 直接从response.output.text获取内容
-            if hasattr(response, 'output') and hasattr(response.output, 'text'):  # type: ignore
-                markdown_content = response.output.text  # type: ignore
-                print(f"[DEBUG] AI生成内容长度: {len(markdown_content)}")
-                return markdown_content
-            else:
-                print(f"[ERROR] 响应对象结构: {vars(response)}")
-                raise Exception("response.output.text不存在")
-        else:
-            raise Exception(f"未知的响应类型: {type(response)}")
-            
+        if not hasattr(response, 'status_code'):
+            raise UpstreamError(f"未知的响应类型: {type(response)}", retryable=False)
+        
+        # 检查响应状态
+        if response.status_code != HTTPStatus.OK:  # type: ignore
+            error_msg = f"request_id={response.request_id}, code={response.status_code}, message={response.message}"  # type: ignore
+            logger.error("文档API调用失败: %s", error_msg)
+            raise upstream_error(response)
+        
+        # 直接从response.output.text获取内容
+        if hasattr(response, 'output') and hasattr(response.output, 'text'):  # type: ignore
+            markdown_content = response.output.text  # type: ignore
+            logger.debug("AI生成内容长度: %d", len(markdown_content))
+            return markdown_content
+        logger.error("文档API响应缺少output.text, request_id=%s", getattr(response, 'request_id', '-'))
+        raise UpstreamError("response.output.text不存在", retryable=False)
+    
+    try:
+        # 文档整理与对话使用各自的并发池,长时间的批量生成不会占满对话的名额
+        with doc_admission.acquire() as slot, request_profiler.span('upstream'):
+            ADMISSION_WAIT_SECONDS.labels(pool='doc').observe(slot.waited)
+            # 超时后仍在执行的调用继续占用名额,直到真正结束
+            return doc_upstream.call(attempt, on_abandon=slot.hold)
+    except CircuitOpenError as e:
+        logger.warning("百炼文档API熔断中,跳过调用: %s", e)
+        raise
     except Exception as e:
-        error_msg = f"百炼文档API调用失败: {str(e)}"
-        print(f"[ERROR] {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("百炼文档API调用失败: %s", e)
         raise
 
 
-def call_bailian_api(user_message, chat_history):
+def call_bailian_api(user_message, chat_history, outcome=None, client=None):
     """
     调用阿里云百炼应用API获取智能回复
     
     参数说明:
         user_message (str): 用户当前输入的问题
         chat_history (list): 历史对话列表,格式: [{"user": "...", "bot": "..."}]
+        outcome (dict): 可选,调用结束后写入 {"ok": 是否成功, "cached": 是否命中缓存},供统计使用
+        client (str): 可选,客户端标识,排队等待调用名额时按客户端公平分配
     
     返回值:
         str: AI生成的回复内容
@@ -286,49 +976,57 @@ def call_bailian_api(user_message, chat_history):
         - 网络错误: 返回友好提示信息
         - 认证失败: 检查API Key配置
         - 应用不存在: 检查APP_ID配置
+        - 调用名额已满: 抛出AdmissionRejected,由接口返回429
     
     DashScope API文档:
         https://help.aliyun.com/zh/model-studio/call-single-agent-application/
     """
+    if outcome is None:
+        outcome = {}
+    outcome.update(ok=False, cached=False)
+    
     try:
         # 确保配置存在
         if not ACCESS_KEY_SECRET or not APP_ID:
             return "配置错误: 缺少API Key或应用ID"
         
-        print(f"[DEBUG] 调用百炼API - APP_ID: {APP_ID}")
-        print(f"[DEBUG] 用户问题: {user_message}")
-        print(f"[DEBUG] 历史对话数量: {len(chat_history)}")
+        # 本地FAQ快速路径: 与FAQ标题高度相似的问题直接使用本地答案
+        local_reply = local_faq_answer(user_message, chat_history)
+        if local_reply is not None:
+            outcome.update(ok=True, cached=True)
+            return local_reply
         
-        # 调用DashScope Application API
-        print("[DEBUG] 开始调用Application.call...")
-        response = Application.call(
-            api_key=ACCESS_KEY_SECRET,
-            app_id=APP_ID,
-            prompt=user_message
-        )
+        # 优先读取问答缓存
+        cache_key = get_answer_cache_key(user_message, chat_history)
+        if cache_key:
+            cached_reply = answer_cache.get(cache_key)
+            if cached_reply is not None:
+                logger.debug("问答缓存命中")
+                outcome.update(ok=True, cached=True)
+                return cached_reply
         
-        print(f"[DEBUG] 响应类型: {type(response)}")
+        def fetch_reply():
+            # 执行者再次检查缓存,避免与刚结束的同键调用重复请求
+            if cache_key:
+                cached = answer_cache.get(cache_key)
+                if cached is not None:
+                    return cached, True
+            with chat_admission.acquire(client) as slot:
+                ADMISSION_WAIT_SECONDS.labels(pool='chat').observe(slot.waited)
+                ai_reply, ok = request_bailian_reply(user_message, chat_history, slot)
+            # 仅缓存成功的回复
+            if ok and cache_key and ai_reply:
+                answer_cache.set(cache_key, ai_reply)
+            return ai_reply, ok
         
-        # 直接访问ApplicationResponse对象
-        if hasattr(response, 'status_code'):
-            print(f"[DEBUG] API响应状态码: {response.status_code}")  # type: ignore
-            
-            # 检查响应状态
-            if response.status_code != HTTPStatus.OK:  # type: ignore
-                error_msg = f"request_id={response.request_id}, code={response.status_code}, message={response.message}"  # type: ignore
-                print(f"[ERROR] API调用失败: {error_msg}")
-                return f"抱歉,AI服务暂时不可用。\n错误信息: {response.message}"  # type: ignore
-            
-            # 提取AI回复
-            if hasattr(response, 'output') and hasattr(response.output, 'text'):  # type: ignore
-                ai_reply = response.output.text  # type: ignore
-                print(f"[DEBUG] AI回复: {ai_reply}")
-                return ai_reply
-            else:
-                return "AI服务返回格式异常"
-        else:
-            return "AI服务返回类型异常"
-            
+        # 相同问题且相同上下文的并发请求合并为一次上游调用
+        flight_key = build_cache_key(user_message, chat_history, len(chat_history))
+        ai_reply, ok = chat_flight.do(flight_key, fetch_reply)
+        outcome['ok'] = ok
+        return ai_reply
+    
+    except AdmissionRejected:
+        raise
     except Exception as e:
         # 记录错误日志
         error_msg = f"百炼API调用失败: {str(e)}"
@@ -338,38 +1036,672 @@ def call_bailian_api(user_message, chat_history):
         return f"抱歉,AI服务暂时不可用。错误信息: {str(e)}"
 
 
-# ========================================
-# 日志记录函数
-# ========================================
-def log_chat(user_message, bot_reply, prefix=""):
+def history_params(user_message, chat_history):
     """
-    记录对话内容到本地日志文件
+    多轮对话时传给Application.call的额外参数
     
     参数:
-        user_message (str): 用户消息
-        bot_reply (str): AI回复
-        prefix (str): 日志前缀,用于标记特殊日志(如错误)
+        user_message (str): 用户当前问题
+        chat_history (list): 已按token预算裁剪的历史对话列表
     
-    日志格式:
-        [时间戳]
-        用户: 问题内容
-        AI: 回复内容
-        ---
+    返回:
+        dict: 有历史时为{"messages": [...]}(百炼按messages理解上下文,忽略prompt),否则为空
     """
-    try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"{prefix}[{timestamp}]\n用户: {user_message}\nAI: {bot_reply}\n---\n\n"
-        
-        # 追加写入日志文件
-        with open(LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(log_entry)
-    except Exception as e:
-        print(f"日志记录失败: {e}")
+    if not chat_history:
+        return {}
+    return {'messages': build_messages(chat_history, user_message)}
 
 
-def load_settings():
+def request_bailian_reply(user_message, chat_history, slot=None):
     """
-    加载系统设置
+    向百炼应用发起一次非流式调用并解析回复
+    
+    参数说明:
+        user_message (str): 用户当前输入的问题
+        chat_history (list): 历史对话列表
+        slot (Slot): 可选,当前占用的调用名额,超时后仍在执行的调用继续占用该名额
+    
+    返回值:
+        tuple: (回复文本, 是否成功) - 失败时回复文本为友好的错误提示
+    
+    异常处理:
+        限流/服务端错误/网络异常按退避重试(受全局重试预算限制);
+        熔断中或超过截止时间时返回友好提示,重试耗尽后的网络异常直接抛出,由call_bailian_api统一处理
+    """
+    # 只记录长度,不把用户问题和回复内容写入运行日志
+    logger.debug("调用百炼API - APP_ID: %s, 问题长度: %d, 历史对话数量: %d",
+                 APP_ID, len(user_message), len(chat_history))
+    prompt = grounded_prompt(user_message, chat_history)
+    
+    def attempt():
+        # 调用DashScope Application API
+        started = time.perf_counter()
+        try:
+            with UPSTREAM_IN_FLIGHT.labels(operation='chat').track_inprogress():
+                response = Application.call(
+                    api_key=ACCESS_KEY_SECRET,
+                    app_id=APP_ID,
+                    prompt=prompt,
+                    **history_params(prompt, chat_history)
+                )
+        except Exception:
+            observe_upstream(APP_ID, 'chat', started, 'exception')
+            raise
+        observe_upstream(APP_ID, 'chat', started, getattr(response, 'status_code', 'unknown'))
+        
+        # 限流/服务端错误抛出异常以便重试,其余非200状态直接返回
+        if (hasattr(response, 'status_code') and response.status_code != HTTPStatus.OK  # type: ignore
+                and upstream_error(response).retryable):
+            error_msg = f"request_id={response.request_id}, code={response.status_code}, message={response.message}"  # type: ignore
+            logger.error("API调用失败: %s", error_msg)
+            raise upstream_error(response)
+        return response
+    
+    try:
+        with request_profiler.span('upstream'):
+            response = chat_upstream.call(attempt, on_abandon=slot.hold if slot is not None else None)
+    except CircuitOpenError as e:
+        # 熔断中快速失败,不占用线程等待上游
+        logger.warning("百炼API熔断中,跳过调用: %s", e)
+        return "抱歉,AI服务暂时繁忙,请稍后再试。", False
+    except UpstreamError as e:
+        return f"抱歉,AI服务暂时不可用。\n错误信息: {e}", False
+    
+    # 直接访问ApplicationResponse对象
+    if not hasattr(response, 'status_code'):
+        return "AI服务返回类型异常", False
+    
+    # 检查响应状态
+    if response.status_code != HTTPStatus.OK:  # type: ignore
+        error_msg = f"request_id={response.request_id}, code={response.status_code}, message={response.message}"  # type: ignore
+        logger.error("API调用失败: %s", error_msg)
+        return f"抱歉,AI服务暂时不可用。\n错误信息: {response.message}", False  # type: ignore
+    
+    # 提取AI回复
+    if hasattr(response, 'output') and hasattr(response.output, 'text'):  # type: ignore
+        ai_reply = response.output.text  # type: ignore
+        logger.debug("AI回复长度: %d", len(ai_reply or ''))
+        return ai_reply, True
+    return "AI服务返回格式异常", False
+
+
+def call_bailian_api_stream(user_message, chat_history):
+    """
+    以流式方式调用阿里云百炼应用API,逐段产出AI回复
+    
+    参数说明:
+        user_message (str): 用户当前输入的问题
+        chat_history (list): 历史对话列表,格式: [{"user": "...", "bot": "..."}]
+    
+    返回值:
+        generator: 逐段产出回复文本增量(str)
+    
+    异常处理:
+        - 配置缺失或API返回非200状态码时抛出Exception
+        - 调用方负责捕获异常并转换为前端可读的错误事件
+    
+    说明:
+        使用stream=True + incremental_output=True,每个分片只包含新增文本,
+        首个分片到达即可推送给前端,无需等待完整回复生成
+    """
+    if not ACCESS_KEY_SECRET or not APP_ID:
+        raise Exception("配置错误: 缺少API Key或应用ID")
+    
+    logger.debug("流式调用百炼API - APP_ID: %s, 问题长度: %d, 历史对话数量: %d",
+                 APP_ID, len(user_message), len(chat_history))
+    prompt = grounded_prompt(user_message, chat_history)
+    
+    # 流式调用只经过熔断判断(熔断中直接抛出CircuitOpenError),已推送部分内容后不再重试
+    breaker = chat_upstream.breaker
+    probe = breaker.allow()
+    outcome = None
+    
+    started = time.perf_counter()
+    status = 'exception'
+    first_chunk = True
+    with UPSTREAM_IN_FLIGHT.labels(operation='chat_stream').track_inprogress(), request_profiler.span('upstream'):
+        try:
+            responses = Application.call(
+                api_key=ACCESS_KEY_SECRET,
+                app_id=APP_ID,
+                prompt=prompt,
+                stream=True,
+                incremental_output=True,
+                **history_params(prompt, chat_history)
+            )
+            
+            for response in responses:
+                if first_chunk:
+                    UPSTREAM_FIRST_CHUNK_SECONDS.labels(app_id=APP_ID).observe(time.perf_counter() - started)
+                    first_chunk = False
+                
+                # 检查每个分片的响应状态
+                status = response.status_code  # type: ignore
+                if response.status_code != HTTPStatus.OK:  # type: ignore
+                    error_msg = f"request_id={response.request_id}, code={response.status_code}, message={response.message}"  # type: ignore
+                    logger.error("流式API调用失败: %s", error_msg)
+                    if outcome is None and not upstream_error(response).retryable:
+                        # 参数/鉴权等错误不代表上游故障,不计入熔断
+                        outcome = 'rejected'
+                        breaker.record_success(probe)
+                    raise Exception(response.message)  # type: ignore
+                
+                if outcome is None:
+                    # 收到首个正常分片即视为上游可用
+                    outcome = 'ok'
+                    breaker.record_success(probe)
+                
+                # 提取增量文本
+                output = getattr(response, 'output', None)
+                delta = getattr(output, 'text', None) if output is not None else None
+                if delta:
+                    yield delta
+        except GeneratorExit:
+            # 客户端在首个分片前断开,不能说明上游状态
+            if outcome is None:
+                outcome = 'cancelled'
+                breaker.release(probe)
+            raise
+        except Exception:
+            if outcome is None:
+                outcome = 'failed'
+                breaker.record_failure(probe)
+            raise
+        finally:
+            observe_upstream(APP_ID, 'chat_stream', started, status)
+            if outcome is None:
+                breaker.record_success(probe)
+
+
+def format_sse(payload, event=None):
+    """
+    将数据编码为Server-Sent Events消息格式
+    
+    参数:
+        payload (dict): 事件数据,序列化为JSON
+        event (str): 事件类型(可选),缺省为message事件
+    
+    返回:
+        str: SSE格式的消息文本
+    """
+    message = f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+
+# ========================================
+# 文档生成流程
+# ========================================
+
+class DocSourceError(Exception):
+    """
+    文档来源获取失败(网页爬取失败等),对应请求参数层面的错误
+    """
+
+
+def build_doc_prompt(content):
+    """
+    构建文档整理提示词
+    
+    参数:
+        content (str): 网页文本内容
+    
+    返回:
+        str: 提示词
+    """
+    return f"""请帮我将以下内容整理为标准的Markdown格式文档:
+
+{content}
+
+要求:
+1. 提取核心内容,去除广告和无关信息
+2. 使用标准Markdown语法格式化
+3. 保持内容层级结构清晰
+4. 包含标题、段落、列表等元素
+5. 直接输出Markdown内容,不需要额外说明
+"""
+
+
+def derive_doc_file_name(url, content):
+    """
+    未指定文件名时,从URL路径或内容首行推导文件名
+    
+    参数:
+        url (str): 网页URL(可为空)
+        content (str): 网页文本内容
+    
+    返回:
+        str: 基础文件名
+    """
+    if url:
+        # 尝试从URL路径提取有意义的部分
+        url_path = url.rstrip('/').split('/')[-1]
+        if url_path and url_path != url:
+            return url_path.split('?')[0].split('#')[0]
+        return 'document'
+    # 从内容第一行提取
+    first_line = content.split('\n')[0][:30]
+    return first_line or 'document'
+
+
+def save_generated_doc(markdown_content, file_name):
+    """
+    保存生成的Markdown文档并通知文档更新
+    
+    参数:
+        markdown_content (str): Markdown内容
+        file_name (str): 基础文件名
+    
+    返回:
+        tuple: (最终文件名, 创建时间字符串)
+    """
+    # 生成唯一文件名
+    final_file_name = generate_unique_filename(file_name)
+    
+    # 保存到docs目录
+    file_path = os.path.join(DOCS_DIR, final_file_name)
+    try:
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(markdown_content)
+    except Exception:
+        doc_index.release_name(final_file_name)
+        raise
+    
+    create_time = finalize_generated_doc(final_file_name)
+    return final_file_name, create_time
+
+
+def finalize_generated_doc(final_file_name):
+    """
+    文档写入完成后的收尾: 通知文档更新并记录日志
+    
+    参数:
+        final_file_name (str): docs目录下的文件名
+    
+    返回:
+        str: 创建时间字符串
+    """
+    file_path = os.path.join(DOCS_DIR, final_file_name)
+    logger.info("文档已保存: %s", file_path)
+    
+    # 通知文档更新(清空问答缓存等)
+    notify_docs_updated(file_path)
+    
+    # 记录日志
+    create_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    chat_log_writer.write({'type': 'doc', 'time': create_time, 'file': final_file_name})
+    
+    return create_time
+
+
+def build_doc_chunk_prompt(chunk, index, total):
+    """
+    构建长文档分块整理提示词
+    
+    参数:
+        chunk (str): 分块文本
+        index (int): 分块序号(从0开始)
+        total (int): 分块总数
+    
+    返回:
+        str: 提示词
+    """
+    return f"""以下是一篇长文档的第{index + 1}/{total}部分,请将这一部分整理为标准的Markdown格式:
+
+{chunk}
+
+要求:
+1. 只整理本部分内容,不要补充前言、总结或其他部分的内容
+2. 去除广告和无关信息,使用标准Markdown语法格式化
+3. 保持原有的标题层级,本部分开头没有标题时不要新增一级标题
+4. 直接输出Markdown内容,不需要额外说明
+"""
+
+
+def build_doc_consolidate_prompt(markdown_content):
+    """
+    构建分块结果合并整理提示词
+    
+    参数:
+        markdown_content (str): 分块拼接后的Markdown
+    
+    返回:
+        str: 提示词
+    """
+    return f"""以下Markdown文档由多个部分分别整理后拼接而成,请将其合并为一篇结构完整的文档:
+
+{markdown_content}
+
+要求:
+1. 统一标题层级,合并重复的标题和小节
+2. 保留全部有效信息,不要删减内容
+3. 直接输出Markdown内容,不需要额外说明
+"""
+
+
+def generate_chunked_doc(chunks, file_name):
+    """
+    长文档分块并发生成: 各分块并行调用百炼,按顺序边完成边写入文件
+    
+    参数:
+        chunks (list): 分块文本列表
+        file_name (str): 基础文件名
+    
+    返回:
+        tuple: (Markdown内容, 最终文件名)
+    
+    说明:
+        - 生成过程中写入docs目录下的.part临时文件,完成后原子重命名
+        - DOC_CHUNK_CONSOLIDATE=auto时,合并结果不超过单块上限才做整体整理
+    """
+    total = len(chunks)
+    final_file_name = generate_unique_filename(file_name)
+    file_path = os.path.join(DOCS_DIR, final_file_name)
+    part_path = file_path + '.part'
+    logger.info("长文档分块生成: %d块, 并发%d", total, DOC_CHUNK_CONCURRENCY)
+    
+    merger = SectionMerger()
+    parts = []
+    
+    def generate_chunk(index, chunk):
+        return call_doc_generation_api(build_doc_chunk_prompt(chunk, index, total))
+    
+    try:
+        with open(part_path, 'w', encoding='utf-8') as f:
+            def write_section(index, section):
+                text = merger.add(section)
+                parts.append(text)
+                f.write(text)
+                f.flush()
+                logger.debug("分块%d/%d已写入", index + 1, total)
+            
+            map_chunks(chunks, generate_chunk, DOC_CHUNK_CONCURRENCY, write_section)
+            f.write('\n')
+        
+        markdown_content = ''.join(parts) + '\n'
+        
+        # 整体整理(可选)
+        if DOC_CHUNK_CONSOLIDATE == 'always' or (
+                DOC_CHUNK_CONSOLIDATE == 'auto' and len(markdown_content) <= DOC_CHUNK_MAX_CHARS):
+            try:
+                markdown_content = call_doc_generation_api(build_doc_consolidate_prompt(markdown_content))
+                with open(part_path, 'w', encoding='utf-8') as f:
+                    f.write(markdown_content)
+            except Exception as e:
+                # 整理失败时保留分块拼接结果
+                logger.warning("分块结果整体整理失败,使用拼接结果: %s", e)
+        
+        os.replace(part_path, file_path)
+    except Exception:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        doc_index.release_name(final_file_name)
+        raise
+    
+    return markdown_content, final_file_name
+
+
+def run_doc_generation(url, content, file_name, progress=None, force=False):
+    """
+    执行完整的文档生成流程: 抓取 -> 构建提示词 -> 调用百炼 -> 保存
+    
+    参数:
+        url (str): 网页URL(可为空)
+        content (str): 网页内容(url为空时使用)
+        file_name (str): 文件名(可为空,为空时自动推导)
+        progress (callable): 阶段回调(可选),参数为阶段名 fetching/generating/saving
+        force (bool): 是否忽略去重索引强制重新生成
+    
+    返回:
+        dict: {"filePath": "docs/xxx.md", "markdown": "...", "createTime": "...", "deduplicated": bool}
+    
+    异常:
+        DocSourceError: 网页爬取失败或未提取到正文
+        Exception: 百炼调用或文件保存失败
+    """
+    def report(stage):
+        if progress:
+            progress(stage)
+    
+    # 获取网页内容
+    if url:
+        report('fetching')
+        logger.debug("用户提供URL: %s", url)
+        try:
+            # 爬取网页内容
+            content = fetch_web_content(url)
+        except Exception as e:
+            raise DocSourceError(str(e))
+    elif html_extract.looks_like_html(content):
+        # 直接粘贴的HTML同样提取正文,缩短提示词(没有正文时拒绝生成)
+        content = extract_text_from_html(content)
+    
+    # 未提取到正文时generate_doc_from_content抛出DocSourceError,不会生成空文档
+    return generate_doc_from_content(url, content, file_name, report, force)
+
+
+def generate_doc_from_content(url, content, file_name, progress=None, force=False):
+    """
+    根据已获取的网页内容生成并保存Markdown文档
+    
+    参数:
+        url (str): 来源URL(可为空,用于推导文件名和去重)
+        content (str): 网页文本内容
+        file_name (str): 文件名(可为空,为空时自动推导)
+        progress (callable): 阶段回调(可选)
+        force (bool): 是否忽略去重索引强制重新生成
+    
+    返回:
+        dict: {"filePath": "docs/xxx.md", "markdown": "...", "createTime": "...", "deduplicated": bool}
+    
+    异常:
+        DocSourceError: 内容为空(批量导入等直接调用时同样不生成空文档)
+    """
+    def report(stage):
+        if progress:
+            progress(stage)
+    
+    if not (content or '').strip():
+        raise DocSourceError("未能从网页中提取到正文内容")
+    
+    # 相同来源内容已生成过文档时直接返回
+    source_key = content_key(url, content)
+    if not force:
+        existing = doc_index.lookup(source_key)
+        if existing:
+            logger.info("内容未变化,复用已有文档: %s", existing['fileName'])
+            with open(os.path.join(DOCS_DIR, existing['fileName']), 'r', encoding='utf-8') as f:
+                markdown_content = f.read()
+            return {
+                "filePath": f"docs/{existing['fileName']}",
+                "markdown": markdown_content,
+                "createTime": existing['createdAt'],
+                "deduplicated": True
+            }
+    
+    base_name = file_name or derive_doc_file_name(url, content)
+    
+    # 超长内容分块并发生成,避免超出模型上下文
+    report('generating')
+    chunks = split_content(content, DOC_CHUNK_MAX_CHARS)
+    if len(chunks) > 1:
+        markdown_content, final_file_name = generate_chunked_doc(chunks, base_name)
+        report('saving')
+        doc_index.record(source_key, final_file_name, url)
+        create_time = finalize_generated_doc(final_file_name)
+        return {
+            "filePath": f"docs/{final_file_name}",
+            "markdown": markdown_content,
+            "createTime": create_time,
+            "deduplicated": False
+        }
+    
+    # 构建提示词
+    prompt = build_doc_prompt(content)
+    
+    # 调用百炼API生成Markdown
+    markdown_content = call_doc_generation_api(prompt)
+    
+    # 保存文档
+    report('saving')
+    final_file_name, create_time = save_generated_doc(markdown_content, base_name)
+    doc_index.record(source_key, final_file_name, url)
+    
+    return {
+        "filePath": f"docs/{final_file_name}",
+        "markdown": markdown_content,
+        "createTime": create_time,
+        "deduplicated": False
+    }
+
+
+def handle_doc_job(params, progress):
+    """
+    文档生成任务处理函数(由任务队列工作线程调用)
+    
+    参数:
+        params (dict): 任务参数(url/content/fileName)
+        progress (callable): 阶段回调
+    
+    返回:
+        dict: 生成结果
+    """
+    try:
+        return run_doc_generation(
+            params.get('url', ''),
+            params.get('content', ''),
+            params.get('fileName', ''),
+            progress,
+            bool(params.get('force'))
+        )
+    except DocSourceError as e:
+        raise Exception(f"网页爬取失败: {str(e)}")
+
+
+def fetch_sitemap_urls(sitemap_url, max_urls):
+    """
+    抓取站点地图并展开其中的页面URL(支持一层站点地图索引)
+    
+    参数:
+        sitemap_url (str): sitemap.xml地址
+        max_urls (int): 最多返回的URL数量
+    
+    返回:
+        list: 页面URL列表
+    """
+    _, body = web_fetcher.get_bytes(sitemap_url)
+    urls, child_sitemaps = parse_sitemap(body)
+    
+    for child_url in child_sitemaps:
+        if len(urls) >= max_urls:
+            break
+        try:
+            _, child_body = web_fetcher.get_bytes(child_url)
+            child_urls, _ = parse_sitemap(child_body)
+            urls.extend(child_urls)
+        except Exception as e:
+            logger.error("子站点地图抓取失败(%s): %s", child_url, e)
+    
+    return urls[:max_urls]
+
+
+# 批量导入执行器: 抓取与生成使用独立的并发上限
+batch_ingestor = BatchIngestor(
+    fetch_web_content,
+    lambda url, content, force=False: generate_doc_from_content(url, content, '', force=force),
+    fetch_workers=DOC_BATCH_FETCH_WORKERS,
+    per_host_limit=DOC_BATCH_PER_HOST_LIMIT,
+    generate_concurrency=DOC_BATCH_GENERATE_CONCURRENCY
+)
+
+
+# 站点抓取器: 只为正文指纹变化的页面生成文档,状态持久化以便中断后继续
+site_crawler = SiteCrawler(
+    web_fetcher,
+    extract_text_from_html,
+    lambda url, content: generate_doc_from_content(url, content, ''),
+    os.path.join(DATA_DIR, 'crawler_state.json'),
+    sitemap_fn=fetch_sitemap_urls,
+    workers=CRAWL_WORKERS,
+    generate_workers=CRAWL_GENERATE_CONCURRENCY,
+    delay=CRAWL_DELAY,
+    respect_robots=CRAWL_RESPECT_ROBOTS
+)
+
+
+def run_scheduled_crawl():
+    """
+    定时任务: 按配置的种子重新抓取(已有抓取运行中时跳过)
+    """
+    try:
+        site_crawler.start(CRAWL_SEEDS, CRAWL_SITEMAPS, CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES)
+        logger.info("已开始定时抓取: %d个种子, %d个站点地图", len(CRAWL_SEEDS), len(CRAWL_SITEMAPS))
+    except CrawlerBusyError as e:
+        logger.info("跳过定时抓取: %s", e)
+
+
+# 文档生成任务队列(首次提交或服务启动时恢复日志并启动工作线程)
+doc_job_queue = DocJobQueue(
+    handle_doc_job,
+    DOC_JOB_JOURNAL,
+    workers=DOC_JOB_WORKERS,
+    max_queued=DOC_JOB_MAX_QUEUED
+)
+
+
+# ========================================
+# 日志记录函数
+# ========================================
+def log_chat(user_message, bot_reply, prefix=""):
+    """
+    记录对话内容到结构化日志
+    
+    参数:
+        user_message (str): 用户消息
+        bot_reply (str): AI回复
+        prefix (str): 日志前缀,用于标记特殊日志(如错误)
+    
+    日志格式(每条一行JSON):
+        {"type": "chat"/"error", "time": "时间", "ts": 时间戳, "seq": 序号, "user": "问题", "bot": "回复"}
+    """
+    try:
+        is_error = user_message == "[ERROR]" or prefix.strip() == "[ERROR]"
+        record = {
+            'type': 'error' if is_error else 'chat',
+            'user': '' if user_message == "[ERROR]" else user_message,
+            'bot': bot_reply
+        }
+        
+        # 放入异步写入队列,由后台线程批量追加到当前日志段
+        with request_profiler.span('log'):
+            chat_log_writer.write(record)
+    except Exception as e:
+        logger.error("日志记录失败: %s", e)
+
+
+def record_chat_analytics(user_message, bot_reply, started, ok=True, cached=False):
+    """
+    对话完成后更新统计(只做内存计数,不影响响应)
+    
+    参数:
+        user_message (str): 用户消息
+        bot_reply (str): 回复内容(失败时为错误信息)
+        started (float): 请求开始时的time.perf_counter()
+        ok (bool): 是否成功
+        cached (bool): 是否命中问答缓存
+    """
+    try:
+        latency_ms = (time.perf_counter() - started) * 1000
+        with request_profiler.span('analytics'):
+            chat_analytics.record(user_message, bot_reply, latency_ms, ok=ok, cached=cached)
+    except Exception as e:
+        logger.error("更新对话统计失败: %s", e)
+
+
+def load_settings():
+    """
+    加载系统设置
     
     返回:
         dict: 设置字典
@@ -381,7 +1713,7 @@ def load_settings():
         else:
             return DEFAULT_SETTINGS.copy()
     except Exception as e:
-        print(f"加载设置失败: {e}")
+        logger.error("加载设置失败: %s", e)
         return DEFAULT_SETTINGS.copy()
 
 
@@ -397,253 +1729,887 @@ def save_settings(settings):
             json.dump(settings, f, ensure_ascii=False, indent=2)
         return True
     except Exception as e:
-        print(f"保存设置失败: {e}")
+        logger.error("保存设置失败: %s", e)
         return False
 
 
 def clear_log_file():
     """
-    清空日志文件
+    清空日志(删除所有日志段并重置清单)
     """
     try:
-        with open(LOG_FILE, 'w', encoding='utf-8') as f:
-            f.write('')
-        print(f"[日志清理] 日志文件已清空")
+        # 先写出队列中的记录,再清空,避免清空后又写入旧记录
+        chat_log_writer.flush()
+        chat_log_store.clear()
+        log_search_index.clear()
+        logger.info("日志已清空")
         return True
     except Exception as e:
-        print(f"[日志清理] 清空日志失败: {e}")
+        logger.error("清空日志失败: %s", e)
         return False
 
 
 def get_log_stats():
     """
-    获取日志文件统计信息
+    获取日志统计信息
     
     返回:
         dict: 日志统计信息
+    
+    说明:
+        只读取清单中的计数,不扫描日志内容,耗时与日志大小无关
     """
     try:
-        if not os.path.exists(LOG_FILE):
-            return {
-                'logPath': LOG_FILE,
-                'logCount': 0,
-                'logSize': 0,
-                'lastUpdate': '-'
-            }
-        
-        # 获取文件大小
-        file_size = os.path.getsize(LOG_FILE)
-        
-        # 获取最后修改时间
-        last_update_timestamp = os.path.getmtime(LOG_FILE)
-        last_update = datetime.fromtimestamp(last_update_timestamp).strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 统计日志条数(通过分隔符"---"计数)
-        with open(LOG_FILE, 'r', encoding='utf-8') as f:
-            content = f.read()
-            log_count = content.count('---')
+        manifest = chat_log_store.stats()
+        type_counts = manifest.get('typeCounts', {})
         
         return {
-            'logPath': LOG_FILE,
-            'logCount': log_count,
-            'logSize': file_size,
-            'lastUpdate': last_update
+            'logPath': LOG_DIR,
+            # 对话条数(含错误记录,与原"---"分隔符计数口径一致)
+            'logCount': type_counts.get('chat', 0) + type_counts.get('error', 0),
+            'logSize': manifest.get('totalBytes', 0),
+            'lastUpdate': manifest.get('lastWrite') or '-',
+            'totalRecords': manifest.get('totalRecords', 0),
+            'typeCounts': type_counts,
+            'segmentCount': len(manifest.get('segments', [])),
+            'archivedSegments': sum(1 for segment in manifest.get('segments', []) if segment.get('codec')),
+            # 压缩前的日志大小
+            'rawSize': sum(segment.get('rawBytes', segment['bytes']) for segment in manifest.get('segments', []))
         }
     except Exception as e:
-        print(f"获取日志统计失败: {e}")
+        logger.error("获取日志统计失败: %s", e)
         return {
-            'logPath': LOG_FILE,
+            'logPath': LOG_DIR,
             'logCount': 0,
             'logSize': 0,
             'lastUpdate': '-'
         }
 
 
-def schedule_log_cleanup():
+def get_log_cleanup_settings():
     """
-    定时任务:根据设置执行日志清理
+    获取日志清理设置(缺少的字段使用默认值)
+    
+    返回:
+        dict: 日志清理设置
     """
-    settings = load_settings()
-    strategy = settings.get('logCleanup', {}).get('strategy', 'never')
-    cleanup_time = settings.get('logCleanup', {}).get('cleanupTime', '02:00')
+    return {**DEFAULT_SETTINGS['logCleanup'], **load_settings().get('logCleanup', {})}
+
+
+def run_log_maintenance():
+    """
+    定时任务:日志轮转、压缩归档、按保留策略清理
     
-    # 清除之前的所有任务
+    说明:
+        1. 按时间间隔封存当前日志段(按大小封存在写入时完成)
+        2. 压缩所有已封存的日志段
+        3. 删除超过保留天数或超出总占用上限的最旧日志段,并同步删除检索索引中的记录
+    """
+    try:
+        config = get_log_cleanup_settings()
+        chat_log_store.segment_max_bytes = int(config['rotateMaxMB']) * 1024 * 1024
+        
+        max_age = LOG_ROTATE_INTERVALS.get(config['rotateInterval'])
+        if max_age and chat_log_store.rotate(max_age_seconds=max_age):
+            logger.info("已按%s轮转日志段", config['rotateInterval'])
+        
+        if config['compression'] != 'none':
+            result = chat_log_store.compress_sealed(config['compression'])
+            if result['segments']:
+                logger.info("已压缩%d个日志段: %d -> %d 字节",
+                            result['segments'], result['rawBytes'], result['bytes'])
+        
+        removed = chat_log_store.prune(
+            max_age_seconds=float(config['retainDays']) * 86400,
+            max_total_bytes=int(config['retainMaxMB']) * 1024 * 1024
+        )
+        for segment in removed:
+            if segment.get('firstSeq') is not None:
+                log_search_index.delete_range(segment['firstSeq'], segment['lastSeq'])
+        if removed:
+            logger.info("已清理%d个过期日志段", len(removed))
+    except Exception as e:
+        logger.error("日志维护失败: %s", e)
+
+
+def schedule_log_cleanup():
+    """
+    定时任务:根据设置执行日志清理
+    """
+    config = get_log_cleanup_settings()
+    strategy = config['strategy']
+    cleanup_time = config['cleanupTime']
+    
+    # 清除之前的所有任务
     schedule.clear()
     
-    if strategy == 'daily':
-        # 每天定时清理
-        schedule.every().day.at(cleanup_time).do(clear_log_file)
-        print(f"[定时任务] 已设置每天{cleanup_time}清理日志")
-    elif strategy == 'weekly':
-        # 每周一定时清理
-        schedule.every().monday.at(cleanup_time).do(clear_log_file)
-        print(f"[定时任务] 已设置每周一{cleanup_time}清理日志")
-    elif strategy == 'never':
-        print(f"[定时任务] 日志清理已禁用")
+    # 日志轮转/归档/保留策略始终生效
+    chat_log_store.segment_max_bytes = int(config['rotateMaxMB']) * 1024 * 1024
+    schedule.every(LOG_MAINTENANCE_INTERVAL).minutes.do(run_log_maintenance)
+    # 清理过期的对话会话文件
+    schedule.every(LOG_MAINTENANCE_INTERVAL).minutes.do(chat_sessions.purge_expired)
+    # 定时重新抓取站点,只为内容变化的页面生成文档
+    if CRAWL_INTERVAL_HOURS > 0 and (CRAWL_SEEDS or CRAWL_SITEMAPS):
+        schedule.every(CRAWL_INTERVAL_HOURS).hours.do(run_scheduled_crawl)
+    # 定时全量扫描docs目录,同步手动放入或修改的文档
+    if kb_sync is not None and KB_SYNC_INTERVAL > 0:
+        schedule.every(KB_SYNC_INTERVAL).minutes.do(kb_sync.sync)
+    
+    if strategy == 'daily':
+        # 每天定时清理
+        schedule.every().day.at(cleanup_time).do(clear_log_file)
+        logger.info("已设置每天%s清理日志", cleanup_time)
+    elif strategy == 'weekly':
+        # 每周一定时清理
+        schedule.every().monday.at(cleanup_time).do(clear_log_file)
+        logger.info("已设置每周一%s清理日志", cleanup_time)
+    elif strategy == 'never':
+        logger.info("日志清理已禁用")
+
+
+def run_schedule():
+    """
+    在后台线程中运行定时任务(只在后台任务主进程中运行)
+    
+    说明:
+        多进程部署时设置可能由其他进程保存,设置文件变化后重新安排定时任务
+    """
+    settings_mtime = _settings_mtime()
+    while True:
+        mtime = _settings_mtime()
+        if mtime != settings_mtime:
+            settings_mtime = mtime
+            schedule_log_cleanup()
+        schedule.run_pending()
+        time.sleep(60)  # 每分钟检查一次
+
+
+def _settings_mtime():
+    try:
+        return os.path.getmtime(SETTINGS_FILE)
+    except OSError:
+        return None
+
+
+# ========================================
+# 后台服务启动
+# ========================================
+# 定时清理/日志维护、任务恢复、检索索引补齐只在选出的主进程中运行,
+# 多worker部署时不会重复执行;主进程退出后其他进程自动接替
+leader_election = LeaderElection(os.path.join(DATA_DIR, 'leader.lock'))
+_background_started = False
+_background_lock = threading.Lock()
+
+
+def start_leader_services():
+    """
+    当选为后台任务主进程后启动的服务
+    """
+    logger.info("进程%d成为后台任务主进程", os.getpid())
+    schedule_log_cleanup()
+    threading.Thread(target=run_schedule, name='log-schedule', daemon=True).start()
+    
+    # 恢复上次未完成的文档生成任务
+    doc_job_queue.start(resume=True)
+    
+    # 后台补齐日志检索索引(上次运行中未写入索引的记录,含启动时导入的旧版日志)
+    threading.Thread(target=log_search_index.sync_from, args=(chat_log_store,), daemon=True).start()
+    
+    # 继续上次中断的站点抓取
+    site_crawler.resume()
+    
+    # 同步服务停止期间变化的文档
+    if kb_sync is not None:
+        threading.Thread(target=kb_sync.sync, name='kb-sync', daemon=True).start()
+
+
+def start_background_services():
+    """
+    启动后台服务(每个进程调用一次,重复调用无副作用)
+    
+    说明:
+        所有进程都启动文档任务工作线程以执行本进程提交的任务,
+        只有主进程负责恢复任务和运行定时任务
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    
+    doc_job_queue.start(resume=False)
+    # 预先建立本地文档索引,避免第一个请求承担建索引的耗时
+    if DOC_FASTPATH_MODE != 'off':
+        threading.Thread(target=doc_search_index.refresh, name='doc-search-index', daemon=True).start()
+    leader_election.start(start_leader_services)
+    atexit.register(leader_election.release)
+
+
+def shutdown_background_services():
+    """
+    进程退出前写出日志和统计快照并释放主进程锁(生产服务器worker退出时调用)
+    """
+    chat_log_writer.close()
+    chat_analytics.close()
+    if kb_sync is not None:
+        kb_sync.close()
+    leader_election.release()
+
+
+def create_app():
+    """
+    应用工厂: 验证配置并启动后台服务,返回Flask应用
+    
+    用法:
+        gunicorn 'app:create_app()'  或  python serve.py
+    
+    返回:
+        Flask: 应用实例
+    
+    说明:
+        只负责启动阶段的工作(配置验证、后台线程、主进程选举),不创建新的应用:
+        Flask应用、路由、监控指标和各单例(日志存储、缓存、并发池等)在导入本模块时创建,
+        导入时会读取环境变量、创建数据目录并导入旧版日志;每个进程只有一个应用实例,
+        多次调用返回同一个app,不能用不同配置创建多个实例(测试时在导入前设置环境变量)
+    """
+    validate_config()
+    start_background_services()
+    return app
+
+
+# ========================================
+# API路由定义
+# ========================================
+
+@app.route('/')
+def index():
+    """
+    主页路由 - 返回前端HTML页面
+    """
+    if app.static_folder:
+        return send_from_directory(app.static_folder, 'index.html')
+    return "Static folder not configured", 500
+
+
+@app.route('/<path:path>')
+def static_files(path):
+    """
+    静态文件路由 - 提供前端资源(CSS, JS等)
+    """
+    if app.static_folder:
+        return send_from_directory(app.static_folder, path)
+    return "Static folder not configured", 500
+
+
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    """
+    健康检查接口
+    
+    用途: 检查服务是否正常运行
+    响应: {"status": "ok"|"degraded", "message": "...", "upstream": {熔断器和重试预算状态}}
+    
+    说明:
+        百炼调用熔断中时status为degraded,HTTP状态码仍为200(服务本身可用)
+    """
+    breakers = {
+        'chat': dict(chat_upstream.breaker.status(), **chat_upstream.stats()),
+        'doc': dict(doc_upstream.breaker.status(), **doc_upstream.stats())
+    }
+    degraded = any(item['state'] != 'closed' for item in breakers.values())
+    return jsonify({
+        "status": "degraded" if degraded else "ok",
+        "message": "AI service circuit open" if degraded else "Service is running",
+        "upstream": {
+            "breakers": breakers,
+            "retryBudget": upstream_retry_budget.stats()
+        }
+    })
+
+
+@app.route('/api/admin/generate-doc', methods=['POST'])
+def generate_doc():
+    """
+    管理员文档生成接口
+    
+    请求格式:
+        POST /api/admin/generate-doc
+        Content-Type: application/json
+        {
+            "url": "网页URL(可选)",
+            "content": "网页内容(可选)",
+            "fileName": "文件名(可选)",
+            "force": false  (可选,为true时忽略去重索引强制重新生成)
+        }
+    
+    响应格式:
+        成功: {
+            "success": true,
+            "filePath": "docs/xxx.md",
+            "markdown": "生成的Markdown内容",
+            "createTime": "2024-01-01 12:00:00",
+            "deduplicated": false
+        }
+        失败: {"success": false, "error": "错误描述"}
+    """
+    try:
+        data = request.get_json()
+        
+        # 获取输入参数,处理None情况
+        url = (data.get('url') or '').strip()
+        content = (data.get('content') or '').strip()
+        file_name = (data.get('fileName') or '').strip()
+        
+        # 验证输入
+        if not url and not content:
+            return jsonify({
+                "success": False,
+                "error": "请提供URL或内容"
+            }), 400
+        
+        try:
+            result = run_doc_generation(url, content, file_name, force=bool(data.get('force')))
+        except DocSourceError as e:
+            return jsonify({
+                "success": False,
+                "error": f"网页爬取失败: {str(e)}"
+            }), 400
+        
+        # 返回成功响应
+        return jsonify({
+            "success": True,
+            **result
+        })
+        
+    except Exception as e:
+        error_msg = f"生成文档失败: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({
+            "success": False,
+            "error": error_msg
+        }), 500
+
+
+@app.route('/api/admin/generate-doc/jobs', methods=['GET', 'POST'])
+def doc_jobs():
+    """
+    文档生成任务接口(异步模式)
+    
+    GET: 列出最近的任务及队列统计
+    POST: 提交任务,立即返回任务ID,请求体与/api/admin/generate-doc相同
+    
+    响应格式(POST):
+        成功: {"success": true, "jobId": "...", "status": "queued"}  HTTP 202
+        失败: {"success": false, "error": "错误描述"}
+    
+    HTTP状态码:
+        202: 任务已入队
+        400: 请求参数错误
+        503: 任务队列已满
+    """
+    if request.method == 'GET':
+        return jsonify({
+            "success": True,
+            "jobs": doc_job_queue.list(),
+            "stats": doc_job_queue.stats()
+        })
+    
+    data = request.get_json(silent=True) or {}
+    params = {
+        'url': (data.get('url') or '').strip(),
+        'content': (data.get('content') or '').strip(),
+        'fileName': (data.get('fileName') or '').strip(),
+        'force': bool(data.get('force'))
+    }
+    
+    # 验证输入
+    if not params['url'] and not params['content']:
+        return jsonify({
+            "success": False,
+            "error": "请提供URL或内容"
+        }), 400
+    
+    try:
+        job = doc_job_queue.submit(params)
+    except JobQueueFullError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 503
+    
+    return jsonify({
+        "success": True,
+        "jobId": job['id'],
+        "status": job['status']
+    }), 202
+
+
+@app.route('/api/admin/generate-doc/jobs/<job_id>', methods=['GET'])
+def doc_job_status(job_id):
+    """
+    文档生成任务状态查询接口
+    
+    响应格式:
+        {
+            "success": true,
+            "job": {
+                "id": "...",
+                "status": "queued|running|done|failed",
+                "stage": "queued|fetching|generating|saving|done|failed",
+                "progress": 0-100,
+                "result": {"filePath": "...", "markdown": "...", "createTime": "..."},
+                "error": null
+            }
+        }
+    """
+    job = doc_job_queue.get(job_id)
+    if not job:
+        return jsonify({
+            "success": False,
+            "error": "任务不存在"
+        }), 404
+    
+    # 进程重启后恢复的任务结果中不含正文,从文档文件读取
+    result = job.get('result')
+    if result and 'markdown' not in result and result.get('filePath'):
+        doc_path = os.path.join(DOCS_DIR, os.path.basename(result['filePath']))
+        if os.path.exists(doc_path):
+            with open(doc_path, 'r', encoding='utf-8') as f:
+                result['markdown'] = f.read()
+    
+    job['params'] = {k: v for k, v in job['params'].items() if k != 'content'}
+    return jsonify({
+        "success": True,
+        "job": job
+    })
+
+
+@app.route('/api/admin/generate-doc/batch', methods=['POST'])
+def doc_batch():
+    """
+    批量文档导入接口
+    
+    请求格式:
+        POST /api/admin/generate-doc/batch
+        Content-Type: application/json
+        {
+            "urls": ["https://...", "https://..."],  (可选)
+            "sitemap": "https://example.com/sitemap.xml",  (可选)
+            "force": false  (可选,为true时忽略去重索引强制重新生成)
+        }
+    
+    响应格式:
+        成功: {"success": true, "batchId": "...", "total": 120}  HTTP 202
+        失败: {"success": false, "error": "错误描述"}
+    """
+    data = request.get_json(silent=True) or {}
+    urls = [str(url).strip() for url in (data.get('urls') or []) if str(url).strip()]
+    sitemap_url = (data.get('sitemap') or '').strip()
+    
+    if sitemap_url:
+        try:
+            urls.extend(fetch_sitemap_urls(sitemap_url, DOC_BATCH_MAX_URLS))
+        except Exception as e:
+            return jsonify({
+                "success": False,
+                "error": f"站点地图解析失败: {str(e)}"
+            }), 400
+    
+    # 验证输入
+    if not urls:
+        return jsonify({
+            "success": False,
+            "error": "请提供URL列表或站点地图地址"
+        }), 400
+    
+    invalid = [url for url in urls if not url.startswith(('http://', 'https://'))]
+    if invalid:
+        return jsonify({
+            "success": False,
+            "error": f"无效的URL: {invalid[0]}"
+        }), 400
+    
+    if len(urls) > DOC_BATCH_MAX_URLS:
+        return jsonify({
+            "success": False,
+            "error": f"单个批次最多{DOC_BATCH_MAX_URLS}个URL"
+        }), 400
+    
+    batch_id = batch_ingestor.submit(urls, force=bool(data.get('force')))
+    batch = batch_ingestor.get(batch_id)
+    return jsonify({
+        "success": True,
+        "batchId": batch_id,
+        "total": batch['total'] if batch else len(urls)
+    }), 202
+
+
+@app.route('/api/admin/generate-doc/batch/<batch_id>', methods=['GET'])
+def doc_batch_status(batch_id):
+    """
+    批量导入状态查询接口
+    
+    响应格式:
+        {
+            "success": true,
+            "batch": {
+                "id": "...",
+                "total": 120,
+                "summary": {"done": 100, "failed": 3, "generating": 4, ...},
+                "finishedAt": null,
+                "items": [{"url": "...", "status": "done", "filePath": "docs/...", "error": null}]
+            }
+        }
+    """
+    batch = batch_ingestor.get(batch_id)
+    if not batch:
+        return jsonify({
+            "success": False,
+            "error": "批次不存在"
+        }), 404
+    
+    return jsonify({
+        "success": True,
+        "batch": batch
+    })
+
+
+@app.route('/api/admin/crawler', methods=['GET', 'POST', 'DELETE'])
+def crawler_admin():
+    """
+    站点抓取管理接口
+    
+    GET: 获取抓取状态和最近抓取的页面
+    POST: 开始新一轮抓取,或继续被停止/中断的抓取
+        {
+            "seeds": ["https://docs.qoder.com/zh/"],  (可选)
+            "sitemaps": ["https://example.com/sitemap.xml"],  (可选)
+            "maxDepth": 3,  (可选)
+            "maxPages": 500,  (可选)
+            "force": false,  (可选,为true时忽略指纹,所有页面重新生成文档)
+            "resume": false  (可选,为true时继续上次的抓取,忽略其他参数)
+        }
+    DELETE: 停止当前抓取(未完成的页面保留,可继续)
+    
+    响应格式:
+        {
+            "success": true,
+            "status": {"crawl": {"id", "status", "counts", ...}, "pending": 10, "inflight": 2, "pages": 120},
+            "pages": [{"url", "status", "fileName", "crawledAt", "changedAt", "error"}]
+        }
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            if data.get('resume'):
+                if not site_crawler.resume(include_stopped=True):
+                    return jsonify({
+                        "success": False,
+                        "error": "没有可以继续的抓取"
+                    }), 400
+            else:
+                seeds = [str(url).strip() for url in (data.get('seeds') or []) if str(url).strip()]
+                sitemaps = [str(url).strip() for url in (data.get('sitemaps') or []) if str(url).strip()]
+                invalid = [url for url in seeds + sitemaps if not url.startswith(('http://', 'https://'))]
+                if invalid:
+                    return jsonify({
+                        "success": False,
+                        "error": f"无效的URL: {invalid[0]}"
+                    }), 400
+                try:
+                    max_depth = int(data.get('maxDepth', CRAWL_MAX_DEPTH))
+                    max_pages = min(int(data.get('maxPages', CRAWL_MAX_PAGES)), CRAWL_MAX_PAGES)
+                except (TypeError, ValueError):
+                    return jsonify({
+                        "success": False,
+                        "error": "maxDepth和maxPages必须是整数"
+                    }), 400
+                # 未提供种子时使用配置的定时抓取种子
+                if not seeds and not sitemaps:
+                    seeds, sitemaps = CRAWL_SEEDS, CRAWL_SITEMAPS
+                site_crawler.start(seeds, sitemaps, max_depth, max_pages, bool(data.get('force')))
+        except CrawlerBusyError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 409
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+    elif request.method == 'DELETE':
+        site_crawler.stop()
+    
+    return jsonify({
+        "success": True,
+        "status": site_crawler.status(),
+        "pages": site_crawler.pages(request.args.get('limit', 100, type=int))
+    }), 202 if request.method == 'POST' else 200
+
+
+@app.route('/api/admin/kb-sync', methods=['GET', 'POST'])
+def kb_sync_admin():
+    """
+    知识库同步管理接口
+    
+    GET: 获取同步状态和文档列表(可用status参数过滤,如 ?status=failed)
+    POST: 立即在后台执行一次同步 {"force": false}(force为true时重新上传所有文档)
+    
+    响应格式:
+        {
+            "success": true,
+            "stats": {"uploader", "files", "pending", "statusCounts", "syncing", "lastRun", "totals"},
+            "files": [{"fileName", "status", "syncedAt", "attempts", "error"}]
+        }
+    """
+    if kb_sync is None:
+        return jsonify({
+            "success": False,
+            "error": "知识库同步未启用(KB_SYNC_ENABLED=false)"
+        }), 400
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        threading.Thread(
+            target=kb_sync.sync,
+            kwargs={'force': bool(data.get('force'))},
+            name='kb-sync',
+            daemon=True
+        ).start()
+    
+    return jsonify({
+        "success": True,
+        "stats": kb_sync.stats(),
+        "files": kb_sync.files(request.args.get('status') or None, request.args.get('limit', 200, type=int))
+    }), 202 if request.method == 'POST' else 200
 
 
-def run_schedule():
+@app.route('/api/admin/cache', methods=['GET', 'DELETE'])
+def answer_cache_admin():
     """
-    在后台线程中运行定时任务
+    问答缓存管理接口
+    
+    GET: 获取缓存统计(命中/未命中/淘汰次数、容量占用)
+    DELETE: 清空缓存
+    
+    响应格式:
+        成功: {"success": true, "enabled": true, "stats": {...}}
     """
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # 每分钟检查一次
-
+    if request.method == 'DELETE':
+        cleared = answer_cache.clear()
+        return jsonify({
+            "success": True,
+            "message": f"已清除{cleared}条缓存"
+        })
+    
+    return jsonify({
+        "success": True,
+        "enabled": ANSWER_CACHE_ENABLED,
+        "historyTurns": ANSWER_CACHE_HISTORY_TURNS,
+        "stats": answer_cache.stats()
+    })
 
-# ========================================
-# API路由定义
-# ========================================
 
-@app.route('/')
-def index():
+@app.route('/api/admin/coalescing', methods=['GET'])
+def coalescing_stats():
     """
-    主页路由 - 返回前端HTML页面
+    请求合并统计接口
+    
+    响应格式:
+        {"success": true, "stats": {"inFlight": 0, "executions": 10, "coalesced": 25, ...}}
     """
-    if app.static_folder:
-        return send_from_directory(app.static_folder, 'index.html')
-    return "Static folder not configured", 500
+    return jsonify({
+        "success": True,
+        "stats": chat_flight.stats()
+    })
 
 
-@app.route('/<path:path>')
-def static_files(path):
+@app.route('/api/admin/doc-search', methods=['GET'])
+def doc_search():
     """
-    静态文件路由 - 提供前端资源(CSS, JS等)
+    本地文档检索接口(用于检查索引和调整快速路径阈值)
+    
+    请求参数:
+        q: 查询文本
+        limit: 返回段落数(默认5,最多20)
+    
+    响应格式:
+        {
+            "success": true,
+            "mode": "off|answer|ground",
+            "faq": {命中的FAQ段落,含similarity} | null,
+            "hits": [{"file", "headings", "text", "score", "coverage", "question"}],
+            "stats": {"files": 9, "passages": 243, ...}
+        }
     """
-    if app.static_folder:
-        return send_from_directory(app.static_folder, path)
-    return "Static folder not configured", 500
+    query = (request.args.get('q') or '').strip()
+    limit = min(max(request.args.get('limit', 5, type=int) or 5, 1), 20)
+    started = time.perf_counter()
+    hits = doc_search_index.search(query, limit) if query else []
+    for hit in hits:
+        # 只返回段落开头,完整内容见对应文档
+        hit['text'] = hit['text'][:300]
+    faq = doc_search_index.match_faq(query, DOC_FASTPATH_MIN_SIMILARITY) if query else None
+    return jsonify({
+        "success": True,
+        "mode": DOC_FASTPATH_MODE,
+        "minSimilarity": DOC_FASTPATH_MIN_SIMILARITY,
+        "faq": faq,
+        "hits": hits,
+        "tookMs": round((time.perf_counter() - started) * 1000, 3),
+        "stats": doc_search_index.stats()
+    })
 
 
-@app.route('/api/health', methods=['GET'])
-def health_check():
+@app.route('/api/admin/admission', methods=['GET'])
+def admission_stats():
     """
-    健康检查接口
+    准入控制统计接口
     
-    用途: 检查服务是否正常运行
-    响应: {"status": "ok", "message": "Service is running"}
+    响应格式:
+        {
+            "success": true,
+            "pools": {"chat": {"limit": 16, "active": 3, "queued": 0, "p95WaitSeconds": 0.01, ...}, "doc": {...}},
+            "rateLimit": {"enabled": true, "ratePerMinute": 30, "limited": 2, ...}
+        }
     """
     return jsonify({
-        "status": "ok",
-        "message": "Service is running"
+        "success": True,
+        "pools": {
+            "chat": chat_admission.stats(),
+            "doc": doc_admission.stats()
+        },
+        "rateLimit": chat_rate_limiter.stats()
     })
 
 
-@app.route('/api/admin/generate-doc', methods=['POST'])
-def generate_doc():
+@app.route('/api/admin/analytics', methods=['GET'])
+def analytics_stats():
     """
-    管理员文档生成接口
+    对话统计接口
     
-    请求格式:
-        POST /api/admin/generate-doc
-        Content-Type: application/json
+    查询参数:
+        hours: 统计窗口(小时),默认24
+    
+    响应格式:
         {
-            "url": "网页URL(可选)",
-            "content": "网页内容(可选)",
-            "fileName": "文件名(可选)"
+            "success": true,
+            "analytics": {
+                "totals": {累计统计},
+                "window": {"requests", "errors", "errorRate", "cacheHitRate", "latency", "answerLength"},
+                "series": [{"time": "2025-01-01 08:00", "requests": 10, "errors": 1, "cached": 3}],
+                "topQuestions": [{"question": "...", "count": 12}]
+            }
         }
+    """
+    try:
+        hours = min(max(int(request.args.get('hours', 24)), 1), chat_analytics.retain_buckets)
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "error": "hours必须是整数"
+        }), 400
+    
+    return jsonify({
+        "success": True,
+        "analytics": chat_analytics.summary(hours)
+    })
+
+
+@app.route('/api/admin/profiling', methods=['GET', 'POST', 'DELETE'])
+def profiling_admin():
+    """
+    请求剖析管理接口
+    
+    GET: 获取剖析设置和耗时最长的剖析记录
+    POST: 调整采样率/保留条数 {"sampleRate": 0.01, "maxTraces": 20}
+    DELETE: 清空剖析记录
+    
+    权限:
+        POST/DELETE需要在请求头X-PDSA-Profile中携带PROFILE_TOKEN,未配置口令时不允许在线修改
     
     响应格式:
-        成功: {
+        {
             "success": true,
-            "filePath": "docs/xxx.md",
-            "markdown": "生成的Markdown内容",
-            "createTime": "2024-01-01 12:00:00"
+            "settings": {"enabled", "sampleRate", "maxTraces", "headerEnabled", "header", "sampleIntervalMs"},
+            "traces": [{"id", "method", "path", "route", "status", "durationMs", "spans": [...], ...}]
         }
-        失败: {"success": false, "error": "错误描述"}
     """
-    try:
-        data = request.get_json()
-        
-        # 获取输入参数,处理None情况
-        url = (data.get('url') or '').strip()
-        content = (data.get('content') or '').strip()
-        file_name = (data.get('fileName') or '').strip()
-        
-        # 验证输入
-        if not url and not content:
+    if request.method in ('POST', 'DELETE') and not request_profiler.authorized(request.headers):
+        return jsonify({
+            "success": False,
+            "error": (f"需要在请求头{request_profiler.header}中提供PROFILE_TOKEN" if request_profiler.token
+                      else "未配置PROFILE_TOKEN,不允许在线修改剖析设置")
+        }), 403
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            request_profiler.configure(
+                sample_rate=data.get('sampleRate'),
+                max_traces=data.get('maxTraces')
+            )
+        except (TypeError, ValueError):
             return jsonify({
                 "success": False,
-                "error": "请提供URL或内容"
+                "error": "sampleRate必须是0~1之间的数字,maxTraces必须是整数"
             }), 400
-        
-        # 获取网页内容
-        if url:
-            print(f"[DEBUG] 用户提供URL: {url}")
-            try:
-                # 爬取网页内容
-                content = fetch_web_content(url)
-            except Exception as e:
-                return jsonify({
-                    "success": False,
-                    "error": f"网页爬取失败: {str(e)}"
-                }), 400
-        
-        # 构建提示词
-        prompt = f"""请帮我将以下内容整理为标准的Markdown格式文档:
+    elif request.method == 'DELETE':
+        request_profiler.clear()
+    
+    return jsonify({
+        "success": True,
+        "settings": request_profiler.settings(),
+        "traces": request_profiler.traces()
+    })
 
-{content}
 
-要求:
-1. 提取核心内容,去除广告和无关信息
-2. 使用标准Markdown语法格式化
-3. 保持内容层级结构清晰
-4. 包含标题、段落、列表等元素
-5. 直接输出Markdown内容,不需要额外说明
-"""
-        
-        # 调用百炼API生成Markdown
-        print(f"[DEBUG] 调用文档整理API - APP_ID: {DOC_APP_ID}")
-        print(f"[DEBUG] Prompt内容长度: {len(prompt)}字符")
-        
-        markdown_content = call_doc_generation_api(prompt)
-        
-        # 生成文件名
-        if not file_name:
-            # 从URL提取标题作为文件名
-            if url:
-                # 尝试从URL路径提取有意义的部分
-                url_path = url.rstrip('/').split('/')[-1]
-                if url_path and url_path != url:
-                    file_name = url_path.split('?')[0].split('#')[0]
-                else:
-                    file_name = 'document'
-            else:
-                # 从内容第一行提取
-                first_line = content.split('\n')[0][:30]
-                file_name = first_line or 'document'
-        
-        # 生成唯一文件名
-        final_file_name = generate_unique_filename(file_name, DOCS_DIR)
-        
-        # 保存到docs目录
-        file_path = os.path.join(DOCS_DIR, final_file_name)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
-        
-        print(f"[DEBUG] 文档已保存: {file_path}")
-        
-        # 记录日志
-        create_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{create_time}] 文档生成成功: {final_file_name}\n"
-        with open(LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(log_entry)
-        
-        # 返回成功响应
+@app.route('/api/admin/profiling/traces/<trace_id>', methods=['GET'])
+def profiling_trace(trace_id):
+    """
+    下载单条剖析记录
+    
+    查询参数:
+        format: json(默认,含阶段耗时和函数耗时排行) / pstats(cProfile统计文件) / flamegraph(折叠栈文本)
+        sort: 函数耗时排行的排序字段 cumulative/tottime/calls(仅json)
+    """
+    trace = request_profiler.get(trace_id)
+    if trace is None:
         return jsonify({
-            "success": True,
-            "filePath": f"docs/{final_file_name}",
-            "markdown": markdown_content,
-            "createTime": create_time
-        })
-        
-    except Exception as e:
-        error_msg = f"生成文档失败: {str(e)}"
-        print(f"[ERROR] {error_msg}")
+            "success": False,
+            "error": "剖析记录不存在或已被淘汰"
+        }), 404
+    
+    fmt = request.args.get('format', 'json')
+    if fmt == 'pstats':
+        data = trace.pstats_bytes()
+        if data is None:
+            return jsonify({
+                "success": False,
+                "error": "该请求未记录函数耗时"
+            }), 404
+        response = Response(data, mimetype='application/octet-stream')
+        response.headers['Content-Disposition'] = f'attachment; filename="trace-{trace.id}.pstats"'
+        return response
+    if fmt == 'flamegraph':
+        response = Response(trace.collapsed_stacks(), mimetype='text/plain')
+        response.headers['Content-Disposition'] = f'attachment; filename="trace-{trace.id}.folded"'
+        return response
+    if fmt != 'json':
         return jsonify({
             "success": False,
-            "error": error_msg
-        }), 500
+            "error": "format只支持json/pstats/flamegraph"
+        }), 400
+    
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'calls'):
+        sort = 'cumulative'
+    return jsonify({
+        "success": True,
+        "trace": trace.summary(),
+        "topFunctions": trace.top_functions(sort=sort)
+    })
 
 
 @app.route('/api/settings/log-cleanup', methods=['GET', 'POST'])
@@ -657,23 +2623,26 @@ def log_cleanup_settings():
     请求格式(POST):
         {
             "strategy": "never|daily|weekly|immediate",
-            "cleanupTime": "HH:MM"
+            "cleanupTime": "HH:MM",
+            "rotateMaxMB": 16,
+            "rotateInterval": "none|hourly|daily|weekly",
+            "compression": "gzip|zstd|none",
+            "retainDays": 0,
+            "retainMaxMB": 0
         }
+        轮转与保留字段可选,缺省时保持原设置
     
     响应格式:
-        成功: {"success": true, "strategy": "...", "cleanupTime": "..."}
+        成功: {"success": true, "strategy": "...", "cleanupTime": "...", "rotateMaxMB": ..., ...}
         失败: {"success": false, "error": "..."}
     """
     try:
         if request.method == 'GET':
             # 获取当前设置
-            settings = load_settings()
-            log_cleanup = settings.get('logCleanup', DEFAULT_SETTINGS['logCleanup'])
-            
             return jsonify({
                 "success": True,
-                "strategy": log_cleanup.get('strategy', 'never'),
-                "cleanupTime": log_cleanup.get('cleanupTime', '02:00')
+                **get_log_cleanup_settings(),
+                "availableCodecs": available_codecs()
             })
         
         else:  # POST
@@ -695,13 +2664,48 @@ def log_cleanup_settings():
                     "error": "无效的清理策略"
                 }), 400
             
+            # 验证轮转与保留设置
+            config = get_log_cleanup_settings()
+            try:
+                rotate_max_mb = int(data.get('rotateMaxMB', config['rotateMaxMB']))
+                retain_days = float(data.get('retainDays', config['retainDays']))
+                retain_max_mb = int(data.get('retainMaxMB', config['retainMaxMB']))
+            except (TypeError, ValueError):
+                return jsonify({
+                    "success": False,
+                    "error": "日志段大小、保留天数和占用上限必须是数字"
+                }), 400
+            rotate_interval = data.get('rotateInterval', config['rotateInterval'])
+            compression = data.get('compression', config['compression'])
+            
+            if rotate_max_mb < 1 or retain_days < 0 or retain_max_mb < 0:
+                return jsonify({
+                    "success": False,
+                    "error": "日志段大小至少1MB,保留天数和占用上限不能为负数"
+                }), 400
+            if rotate_interval not in LOG_ROTATE_INTERVALS:
+                return jsonify({
+                    "success": False,
+                    "error": "无效的轮转间隔"
+                }), 400
+            if compression != 'none' and compression not in available_codecs():
+                return jsonify({
+                    "success": False,
+                    "error": f"不支持的压缩格式: {compression}"
+                }), 400
+            
             # 加载当前设置
             settings = load_settings()
             
             # 更新设置
             settings['logCleanup'] = {
                 'strategy': strategy,
-                'cleanupTime': cleanup_time
+                'cleanupTime': cleanup_time,
+                'rotateMaxMB': rotate_max_mb,
+                'rotateInterval': rotate_interval,
+                'compression': compression,
+                'retainDays': retain_days,
+                'retainMaxMB': retain_max_mb
             }
             
             # 保存设置
@@ -726,13 +2730,13 @@ def log_cleanup_settings():
             return jsonify({
                 "success": True,
                 "message": message,
-                "strategy": strategy,
-                "cleanupTime": cleanup_time
+                **settings['logCleanup'],
+                "strategy": strategy
             })
     
     except Exception as e:
         error_msg = f"处理请求失败: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return jsonify({
             "success": False,
             "error": "服务器错误"
@@ -758,18 +2762,123 @@ def log_status():
         
         return jsonify({
             "success": True,
-            **stats
+            **stats,
+            "writer": chat_log_writer.stats()
         })
     
     except Exception as e:
         error_msg = f"获取日志状态失败: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
+        return jsonify({
+            "success": False,
+            "error": "服务器错误"
+        }), 500
+
+
+@app.route('/api/logs/search', methods=['GET'])
+def search_logs():
+    """
+    日志检索接口
+    
+    查询参数:
+        q: 关键词(可选,空格分隔的多个词需同时匹配)
+        type: 记录类型 chat/error/doc(可选)
+        start: 起始时间,如 2025-01-01 或 2025-01-01 08:00(可选)
+        end: 结束时间,只给日期时包含当天(可选)
+        cursor: 分页游标,取上一页返回的nextCursor(可选)
+        limit: 每页条数,默认20,最大100
+    
+    响应格式:
+        {
+            "success": true,
+            "items": [{"seq": 序号, "time": "时间", "type": "chat", "user": "问题", "bot": "回复", "file": ""}],
+            "nextCursor": "下一页游标"或null,
+            "tookMs": 查询耗时
+        }
+    """
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), LOG_SEARCH_MAX_LIMIT)
+        except ValueError:
+            raise SearchQueryError("limit必须是整数")
+        
+        result = log_search_index.search(
+            keyword=request.args.get('q', '').strip(),
+            record_type=request.args.get('type', '').strip(),
+            start=parse_time_bound(request.args.get('start')),
+            end=parse_time_bound(request.args.get('end'), end=True),
+            cursor=request.args.get('cursor'),
+            limit=limit
+        )
+        
+        return jsonify({
+            "success": True,
+            **result
+        })
+    
+    except SearchQueryError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    
+    except Exception as e:
+        logger.error("日志检索失败: %s", e)
         return jsonify({
             "success": False,
             "error": "服务器错误"
         }), 500
 
 
+@app.route('/api/logs/export', methods=['GET'])
+def export_logs():
+    """
+    日志导出接口(流式输出,内存占用与日志大小无关)
+    
+    查询参数:
+        format: ndjson(默认) / csv
+        q: 关键词过滤(可选,空格分隔的多个词需同时包含)
+        type: 记录类型 chat/error/doc(可选)
+        start: 起始时间,如 2025-01-01 或 2025-01-01 08:00(可选)
+        end: 结束时间,只给日期时包含当天(可选)
+    
+    说明:
+        依次读取所有日志段(包括已压缩归档的段),只跳过时间范围之外的段;
+        客户端请求头Accept-Encoding包含gzip时以gzip压缩传输
+    """
+    try:
+        fmt = request.args.get('format', 'ndjson').lower()
+        if fmt not in EXPORT_FORMATS:
+            raise SearchQueryError("format只支持ndjson或csv")
+        start = parse_time_bound(request.args.get('start'))
+        end = parse_time_bound(request.args.get('end'), end=True)
+    except SearchQueryError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    
+    chunks = iter_export(
+        chat_log_store.iter_records(start_ts=start, end_ts=end),
+        fmt=fmt,
+        keyword=request.args.get('q', '').strip(),
+        record_type=request.args.get('type', '').strip()
+    )
+    
+    content_type, extension = EXPORT_FORMATS[fmt]
+    file_name = f"chat_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    headers = {
+        'Content-Disposition': f'attachment; filename="{file_name}"',
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding'
+    }
+    if 'gzip' in request.headers.get('Accept-Encoding', '').lower():
+        chunks = gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(stream_with_context(chunks), mimetype=content_type, headers=headers)
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """
@@ -780,24 +2889,34 @@ def chat():
         Content-Type: application/json
         {
             "message": "用户问题",
-            "history": [
-                {"user": "历史问题1", "bot": "历史回答1"},
-                {"user": "历史问题2", "bot": "历史回答2"}
-            ]
+            "sessionId": "会话ID(可选,首轮不传,之后使用响应中返回的值)"
         }
+        旧版前端可改为传入 "history": [{"user": "历史问题", "bot": "历史回答"}, ...]
     
     响应格式:
-        成功: {"success": true, "reply": "AI回复内容"}
+        成功: {"success": true, "reply": "AI回复内容", "sessionId": "会话ID"}
         失败: {"success": false, "error": "错误描述"}
     
+    说明:
+        历史保存在服务端并按token预算裁剪后随问题发送给百炼,每轮请求和提示词大小不随对话轮数增长
+    
     HTTP状态码:
         200: 成功返回AI回复
         400: 请求参数错误
+        429: 请求过于频繁或服务繁忙(响应头Retry-After为建议的重试秒数)
         500: 服务器内部错误
     """
+    started = time.perf_counter()
+    user_message = ''
+    client = request_client_id()
+    try:
+        chat_rate_limiter.acquire(client)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     try:
         # 1. 解析请求参数
-        data = request.get_json()
+        with request_profiler.span('parse'):
+            data = request.get_json()
         
         # 验证必需参数
         if not data or 'message' not in data:
@@ -807,7 +2926,6 @@ def chat():
             }), 400
         
         user_message = data['message']
-        chat_history = data.get('history', [])  # 历史对话,默认为空列表
         
         # 验证消息非空
         if not user_message or not user_message.strip():
@@ -816,23 +2934,36 @@ def chat():
                 "error": "消息内容不能为空"
             }), 400
         
-        # 2. 调用百炼API获取回复
-        bot_reply = call_bailian_api(user_message, chat_history)
+        # 读取服务端会话中的历史对话
+        session_id, chat_history = resolve_chat_session(data)
+        
+        # 2. 调用百炼API获取回复(排队等待调用名额,过载时返回429)
+        outcome = {}
+        try:
+            bot_reply = call_bailian_api(user_message, chat_history, outcome, client=client)
+        except AdmissionRejected as e:
+            return admission_rejected_response(e)
         
-        # 3. 记录对话日志
+        # 3. 记录会话历史、对话日志和统计(失败的回复不计入历史)
+        if outcome['ok']:
+            chat_sessions.append(session_id, user_message, bot_reply)
         log_chat(user_message, bot_reply)
+        record_chat_analytics(user_message, bot_reply, started, ok=outcome['ok'], cached=outcome['cached'])
         
         # 4. 返回成功响应
-        return jsonify({
-            "success": True,
-            "reply": bot_reply
-        })
+        with request_profiler.span('serialize'):
+            return jsonify({
+                "success": True,
+                "reply": bot_reply,
+                "sessionId": session_id
+            })
         
     except Exception as e:
         # 记录错误
         error_msg = f"处理请求时出错: {str(e)}"
-        print(error_msg)
+        logger.exception(error_msg)
         log_chat("", error_msg, "[ERROR] ")
+        record_chat_analytics(user_message, error_msg, started, ok=False)
         
         # 返回错误响应
         return jsonify({
@@ -841,10 +2972,192 @@ def chat():
         }), 500
 
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    流式对话接口 - 通过Server-Sent Events逐段返回AI回复
+    
+    请求格式:
+        与/api/chat相同
+    
+    响应格式(text/event-stream):
+        增量: data: {"delta": "回复片段"}
+        完成: event: done / data: {"reply": "完整回复", "sessionId": "会话ID"}
+        失败: event: error / data: {"error": "错误描述"}
+    
+    HTTP状态码:
+        200: 开始推送事件流
+        400: 请求参数错误
+        429: 请求过于频繁或服务繁忙(响应头Retry-After为建议的重试秒数)
+    """
+    client = request_client_id()
+    try:
+        chat_rate_limiter.acquire(client)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    
+    with request_profiler.span('parse'):
+        data = request.get_json(silent=True)
+    
+    # 验证必需参数
+    if not data or 'message' not in data:
+        return jsonify({
+            "success": False,
+            "error": "缺少必需参数: message"
+        }), 400
+    
+    user_message = data['message']
+    
+    # 验证消息非空
+    if not user_message or not user_message.strip():
+        return jsonify({
+            "success": False,
+            "error": "消息内容不能为空"
+        }), 400
+    
+    session_id, chat_history = resolve_chat_session(data)
+    started = time.perf_counter()
+    
+    # 未命中本地FAQ和缓存时先获取调用名额,排不上队直接返回429(此时尚未开始推送事件流)
+    cache_key = get_answer_cache_key(user_message, chat_history)
+    cached_reply = local_faq_answer(user_message, chat_history)
+    if cached_reply is None and cache_key:
+        cached_reply = answer_cache.get(cache_key)
+    slot = None
+    if cached_reply is None:
+        try:
+            slot = chat_admission.acquire(client)
+        except AdmissionRejected as e:
+            return admission_rejected_response(e)
+        ADMISSION_WAIT_SECONDS.labels(pool='chat').observe(slot.waited)
+    
+    def generate():
+        parts = []
+        try:
+            # 缓存命中时一次性推送完整回复
+            if cached_reply is not None:
+                chat_sessions.append(session_id, user_message, cached_reply)
+                log_chat(user_message, cached_reply)
+                record_chat_analytics(user_message, cached_reply, started, cached=True)
+                yield format_sse({"delta": cached_reply})
+                yield format_sse({"reply": cached_reply, "sessionId": session_id}, event='done')
+                return
+            
+            for delta in call_bailian_api_stream(user_message, chat_history):
+                parts.append(delta)
+                yield format_sse({"delta": delta})
+            
+            bot_reply = ''.join(parts)
+            if cache_key and bot_reply:
+                answer_cache.set(cache_key, bot_reply)
+            # 完整回复生成后再记录会话历史、日志和统计
+            chat_sessions.append(session_id, user_message, bot_reply)
+            log_chat(user_message, bot_reply)
+            record_chat_analytics(user_message, bot_reply, started)
+            yield format_sse({"reply": bot_reply, "sessionId": session_id}, event='done')
+            
+        except Exception as e:
+            error_msg = f"百炼API调用失败: {str(e)}"
+            logger.error(error_msg)
+            log_chat("[ERROR]", error_msg, "")
+            record_chat_analytics(user_message, error_msg, started, ok=False)
+            yield format_sse({"error": f"抱歉,AI服务暂时不可用。错误信息: {str(e)}"}, event='error')
+        finally:
+            if slot is not None:
+                slot.release()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    # 禁用代理缓冲和缓存,保证增量内容立即送达浏览器
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    if slot is not None:
+        # 客户端在事件流开始前断开时生成器不会执行,在响应关闭时归还名额
+        response.call_on_close(slot.release)
+    return response
+
+
+# ========================================
+# 运行指标接口
+# ========================================
+# 队列深度等已有统计在抓取时读取
+metrics.Gauge('pdsa_background_leader', '当前进程是否为后台任务主进程').set_function(
+    lambda: 1 if leader_election.is_leader else 0)
+metrics.Gauge('pdsa_log_queue_depth', '对话日志写入队列深度').set_function(
+    lambda: chat_log_writer.stats()['queueDepth'])
+metrics.Counter('pdsa_log_dropped_total', '因队列已满丢弃的对话日志条数').set_function(
+    lambda: chat_log_writer.stats()['dropped'])
+metrics.Gauge('pdsa_doc_job_queue_depth', '排队中的文档生成任务数').set_function(
+    lambda: doc_job_queue.stats()['queueDepth'])
+metrics.Gauge('pdsa_answer_cache_entries', '问答缓存条目数').set_function(
+    lambda: answer_cache.stats()['entries'])
+metrics.Counter('pdsa_answer_cache_hits_total', '问答缓存累计命中数').set_function(
+    lambda: answer_cache.stats()['hits'])
+metrics.Counter('pdsa_answer_cache_misses_total', '问答缓存累计未命中数').set_function(
+    lambda: answer_cache.stats()['misses'])
+metrics.Counter('pdsa_chat_coalesced_total', '被合并到进行中请求的对话数').set_function(
+    lambda: chat_flight.stats()['coalesced'])
+metrics.Gauge('pdsa_doc_search_passages', '本地文档索引中的段落数').set_function(
+    lambda: doc_search_index.stats()['passages'])
+metrics.Gauge('pdsa_chat_sessions', '内存中的对话会话数').set_function(
+    lambda: chat_sessions.stats()['sessions'])
+if kb_sync is not None:
+    metrics.Gauge('pdsa_kb_sync_pending', '等待同步到知识库的文档数').set_function(
+        lambda: kb_sync.stats()['pending'])
+    metrics.Counter('pdsa_kb_sync_failed_total', '同步到知识库失败的文档数').set_function(
+        lambda: kb_sync.stats()['totals']['failed'])
+
+# 熔断器状态: 0关闭 1半开 2打开
+UPSTREAM_BREAKER_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+UPSTREAM_BREAKER_STATE = metrics.Gauge(
+    'pdsa_dashscope_circuit_state', '百炼调用熔断器状态(0关闭/1半开/2打开)', ('upstream',))
+UPSTREAM_BREAKER_REJECTED = metrics.Counter(
+    'pdsa_dashscope_circuit_rejected_total', '熔断期间被直接拒绝的调用数', ('upstream',))
+UPSTREAM_RETRIES = metrics.Counter(
+    'pdsa_dashscope_retries_total', '百炼调用重试次数', ('upstream',))
+UPSTREAM_HEDGES = metrics.Counter(
+    'pdsa_dashscope_hedged_requests_total', '百炼调用对冲请求数', ('upstream',))
+UPSTREAM_TIMEOUTS = metrics.Counter(
+    'pdsa_dashscope_deadline_exceeded_total', '超过截止时间的百炼调用数', ('upstream',))
+UPSTREAM_ABANDONED = metrics.Gauge(
+    'pdsa_dashscope_abandoned_in_flight', '调用方已超时返回但仍在执行的百炼调用数', ('upstream',))
+for _name, _caller in (('chat', chat_upstream), ('doc', doc_upstream)):
+    UPSTREAM_BREAKER_STATE.labels(upstream=_name).set_function(
+        lambda caller=_caller: UPSTREAM_BREAKER_STATES[caller.breaker.state])
+    UPSTREAM_BREAKER_REJECTED.labels(upstream=_name).set_function(
+        lambda caller=_caller: caller.breaker.status()['rejected'])
+    UPSTREAM_RETRIES.labels(upstream=_name).set_function(lambda caller=_caller: caller.stats()['retries'])
+    UPSTREAM_HEDGES.labels(upstream=_name).set_function(lambda caller=_caller: caller.stats()['hedges'])
+    UPSTREAM_TIMEOUTS.labels(upstream=_name).set_function(lambda caller=_caller: caller.stats()['timeouts'])
+    UPSTREAM_ABANDONED.labels(upstream=_name).set_function(
+        lambda caller=_caller: caller.stats()['abandonedInFlight'])
+metrics.Counter('pdsa_dashscope_retry_budget_exhausted_total', '因重试预算耗尽而放弃的重试数').set_function(
+    lambda: upstream_retry_budget.stats()['exhausted'])
+
+# 准入控制: 占用名额数和排队数
+ADMISSION_ACTIVE = metrics.Gauge('pdsa_admission_active', '占用中的百炼调用名额数', ('pool',))
+ADMISSION_QUEUED = metrics.Gauge('pdsa_admission_queued', '排队等待百炼调用名额的请求数', ('pool',))
+for _name, _pool in (('chat', chat_admission), ('doc', doc_admission)):
+    ADMISSION_ACTIVE.labels(pool=_name).set_function(lambda pool=_pool: pool.stats()['active'])
+    ADMISSION_QUEUED.labels(pool=_name).set_function(lambda pool=_pool: pool.stats()['queued'])
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Prometheus抓取接口
+    
+    返回:
+        text/plain: Prometheus文本格式的运行指标
+    """
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
 # ========================================
 # 应用启动入口
 # ========================================
 if __name__ == '__main__':
+    validate_config()
+    
     print("=" * 60)
     print("🤖 PDSA数字分身智能体启动中...")
     print("=" * 60)
@@ -856,11 +3169,11 @@ if __name__ == '__main__':
     print("✅ 配置验证通过,服务器启动中...")
     print("=" * 60)
     
-    # 启动定时任务线程
-    schedule_log_cleanup()
-    schedule_thread = threading.Thread(target=run_schedule, daemon=True)
-    schedule_thread.start()
-    print("✅ 定时任务线程已启动")
+    # 启动定时任务、文档生成任务队列和检索索引补齐
+    # 开发模式下热加载器的父进程不处理请求,只在实际服务的子进程中启动,避免占用主进程锁
+    if FLASK_ENV != 'development' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+        print("✅ 后台服务已启动")
     
     # 启动Flask应用
     # debug: 开发模式下启用调试和热加载
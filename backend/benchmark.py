@@ -0,0 +1,530 @@
+"""
+PDSA数字分身智能体 - 离线压测工具
+
+功能说明:
+1. 用本地模拟实现替换dashscope.Application.call,可配置延迟分布、错误率和流式分片
+2. 启动本地网页夹具服务器,供fetch_web_content()抓取(支持ETag/304)
+3. 在进程内启动服务,按指定并发压测 /api/chat、/api/chat/stream、
+   /api/admin/generate-doc 和 /api/logs/status
+4. 输出p50/p95/p99延迟和每秒请求数,可保存为JSON并与基线比较,用于发现性能回退
+
+使用方法:
+    python benchmark.py --scenarios chat,logs-status --concurrency 16 --requests 500
+    python benchmark.py --upstream-latency-ms 800 --upstream-dist lognormal --error-rate 0.02
+    python benchmark.py --json result.json --baseline baseline.json --max-regression 0.2
+
+说明:
+    压测期间的日志、索引和生成的文档写入临时目录,不影响正式数据;
+    使用--target压测已部署的服务时,模拟实现不生效,请求会到达真实的百炼API
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# 支持的压测场景 -> (请求方法, 路径)
+SCENARIOS = {
+    'chat': ('POST', '/api/chat'),
+    'chat-stream': ('POST', '/api/chat/stream'),
+    'generate-doc': ('POST', '/api/admin/generate-doc'),
+    'logs-status': ('GET', '/api/logs/status'),
+}
+
+# 上游延迟分布
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+
+# 基线比较的指标(数值越大越差)
+REGRESSION_METRICS = ('p50Ms', 'p95Ms', 'p99Ms')
+
+
+# ========================================
+# 百炼API模拟实现
+# ========================================
+
+class FakeDashScope:
+    """
+    dashscope.Application.call的本地模拟实现
+
+    参数:
+        latency_ms (float): 单次调用的延迟中位数(毫秒)
+        distribution (str): 延迟分布 fixed/uniform/lognormal
+        jitter (float): 分布参数; uniform为相对抖动比例,lognormal为sigma
+        error_rate (float): 返回非200状态码的比例
+        exception_rate (float): 直接抛出异常(模拟网络错误)的比例
+        reply_chars (int): 回复长度(字符)
+        stream_chunks (int): 流式调用的分片数
+        first_chunk_ms (float): 流式调用首个分片的延迟(毫秒),其余延迟均摊到后续分片
+        seed (int): 随机种子
+    """
+
+    def __init__(self, latency_ms=500.0, distribution='lognormal', jitter=0.5, error_rate=0.0,
+                 exception_rate=0.0, reply_chars=300, stream_chunks=20, first_chunk_ms=None, seed=None):
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.exception_rate = exception_rate
+        self.reply_chars = reply_chars
+        self.stream_chunks = max(1, stream_chunks)
+        self.first_chunk_ms = first_chunk_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def install(self):
+        """
+        替换dashscope.Application.call(需在导入app之前或之后调用均可,app按属性访问)
+        """
+        from dashscope import Application
+        fake = self
+
+        def call(*args, **kwargs):
+            return fake.call(**kwargs)
+
+        Application.call = staticmethod(call)
+
+    def call(self, prompt='', stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            latency = self._sample_latency()
+            roll = self._random.random()
+        if roll < self.exception_rate:
+            time.sleep(latency)
+            raise ConnectionError("模拟的上游网络错误")
+        if roll < self.exception_rate + self.error_rate:
+            time.sleep(latency)
+            return _response(HTTPStatus.INTERNAL_SERVER_ERROR, None, "模拟的上游错误")
+
+        reply = _fake_reply(prompt, self.reply_chars)
+        if not stream:
+            time.sleep(latency)
+            return _response(HTTPStatus.OK, reply)
+        return self._stream(reply, latency)
+
+    def _stream(self, reply, latency):
+        first = (self.first_chunk_ms / 1000.0) if self.first_chunk_ms is not None else latency / self.stream_chunks
+        rest = max(0.0, latency - first) / max(1, self.stream_chunks - 1)
+        size = math.ceil(len(reply) / self.stream_chunks)
+        for index in range(self.stream_chunks):
+            time.sleep(first if index == 0 else rest)
+            yield _response(HTTPStatus.OK, reply[index * size:(index + 1) * size])
+
+    def _sample_latency(self):
+        """
+        按配置的分布抽取一次延迟(秒)
+        """
+        median = self.latency_ms / 1000.0
+        if self.distribution == 'uniform':
+            value = self._random.uniform(median * (1 - self.jitter), median * (1 + self.jitter))
+        elif self.distribution == 'lognormal':
+            value = self._random.lognormvariate(math.log(median), self.jitter) if median > 0 else 0.0
+        else:
+            value = median
+        return max(0.0, value)
+
+
+def _response(status_code, text, message=''):
+    return types.SimpleNamespace(
+        status_code=status_code,
+        request_id=f"bench-{random.getrandbits(32):08x}",
+        code='' if status_code == HTTPStatus.OK else 'InternalError',
+        message=message,
+        output=types.SimpleNamespace(text=text, session_id='bench')
+    )
+
+
+def _fake_reply(prompt, length):
+    """
+    生成固定长度的回复(内容由问题决定,便于缓存命中时结果一致)
+    """
+    seed = hashlib.md5((prompt or '').encode('utf-8')).hexdigest()
+    base = f"# 模拟回复 {seed[:8]}\n\n这是压测使用的模拟回复内容。"
+    return (base * (length // len(base) + 1))[:length]
+
+
+# ========================================
+# 网页夹具服务器
+# ========================================
+
+class FixtureServer:
+    """
+    本地网页夹具: /page/<n> 返回带ETag的合成HTML页面
+
+    参数:
+        pages (int): 不同页面数量
+        paragraphs (int): 每个页面的段落数
+        latency_ms (float): 每次响应前的等待时间(毫秒)
+    """
+
+    def __init__(self, pages=50, paragraphs=40, latency_ms=20.0):
+        self.pages = max(1, pages)
+        self.paragraphs = paragraphs
+        self.latency_ms = latency_ms
+        self.hits = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fixture._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='bench-fixture', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def url(self, index):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/page/{index % self.pages}"
+
+    def _handle(self, handler):
+        time.sleep(self.latency_ms / 1000.0)
+        if not handler.path.startswith('/page/'):
+            handler.send_error(404)
+            return
+        body = self._render(handler.path.rsplit('/', 1)[-1]).encode('utf-8')
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        with self._lock:
+            self.hits += 1
+            if handler.headers.get('If-None-Match') == etag:
+                self.not_modified += 1
+                handler.send_response(304)
+                handler.send_header('ETag', etag)
+                handler.end_headers()
+                return
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/html; charset=utf-8')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.send_header('ETag', etag)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _render(self, page):
+        paragraphs = ''.join(
+            f"<p>第{page}页第{i}段: PDSA方法论压测页面内容,用于测量网页抓取和正文提取的耗时。</p>"
+            for i in range(self.paragraphs)
+        )
+        return (f"<html><head><title>压测页面{page}</title></head><body>"
+                f"<nav><a href='/'>首页</a></nav><main><h1>压测页面{page}</h1>{paragraphs}</main>"
+                f"<footer>版权所有</footer></body></html>")
+
+
+# ========================================
+# 压测执行
+# ========================================
+
+def build_request(scenario, index, args, fixture, phase='run'):
+    """
+    构造第index个请求的参数
+
+    参数:
+        phase (str): run/warmup,预热请求使用不同的问题,避免正式请求命中预热写入的缓存
+
+    返回:
+        dict: requests.request的关键字参数
+    """
+    if scenario in ('chat', 'chat-stream'):
+        question_id = index % args.question_pool if args.question_pool else index
+        message = f"压测问题[{scenario}/{phase}]{question_id}: 什么是PDSA方法论?"
+        return {'json': {'message': message, 'history': []}, 'stream': scenario == 'chat-stream'}
+    if scenario == 'generate-doc':
+        payload = {'url': fixture.url(index), 'fileName': f"bench-{index}"}
+        if args.force_generate:
+            payload['force'] = True
+        return {'json': payload}
+    return {}
+
+
+def run_scenario(base_url, scenario, args, fixture, phase='run'):
+    """
+    以固定并发执行一个场景
+
+    返回:
+        dict: 请求数、错误数、每秒请求数和延迟分位数
+    """
+    method, path = SCENARIOS[scenario]
+    url = base_url + path
+    total = args.requests
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+    latencies = []
+    statuses = {}
+    errors = 0
+    results_lock = threading.Lock()
+    local = threading.local()
+
+    def next_index():
+        with counter_lock:
+            index = next(counter)
+        if deadline is not None:
+            return index if time.perf_counter() < deadline else None
+        return index if index < total else None
+
+    def worker():
+        nonlocal errors
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        while True:
+            index = next_index()
+            if index is None:
+                return
+            kwargs = build_request(scenario, index, args, fixture, phase)
+            started = time.perf_counter()
+            ok = False
+            status = 'exception'
+            try:
+                response = session.request(method, url, timeout=args.timeout, **kwargs)
+                status = response.status_code
+                if kwargs.get('stream'):
+                    # 流式接口读取到done/error事件为止
+                    body = b''.join(response.iter_content(chunk_size=None))
+                    ok = response.ok and b'event: done' in body
+                else:
+                    ok = response.ok and response.json().get('success', True)
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with results_lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if not ok:
+                    errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'scenario': scenario,
+        'concurrency': args.concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': statuses,
+        'seconds': round(wall, 3),
+        'rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'meanMs': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+        'p50Ms': _percentile_ms(latencies, 0.50),
+        'p95Ms': _percentile_ms(latencies, 0.95),
+        'p99Ms': _percentile_ms(latencies, 0.99),
+        'maxMs': round(latencies[-1] * 1000, 2) if latencies else None
+    }
+
+
+def _percentile_ms(sorted_values, p):
+    """
+    最近秩法分位数(毫秒)
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p * len(sorted_values)))
+    return round(sorted_values[rank - 1] * 1000, 2)
+
+
+def start_local_service(args, work_dir):
+    """
+    在进程内启动服务(数据目录指向临时目录)
+
+    返回:
+        tuple: (服务地址, werkzeug服务器)
+    """
+    defaults = {
+        'ALIBABA_CLOUD_ACCESS_KEY_ID': 'bench',
+        'ALIBABA_CLOUD_ACCESS_KEY_SECRET': 'bench',
+        'BAILIAN_APP_ID': 'bench-app',
+        'DOC_APP_ID': 'bench-doc-app',
+        'DOC_API_KEY': 'bench',
+        # 压测请求都来自本机,默认关闭按客户端限流(并发池和排队仍然生效,过载时计入429)
+        'RATE_LIMIT_PER_MINUTE': '0',
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    os.environ['DATA_DIR'] = os.path.join(work_dir, 'data')
+    os.environ['DOCS_DIR'] = os.path.join(work_dir, 'docs')
+    os.environ['LOG_DIR'] = os.path.join(work_dir, 'data', 'chat_logs')
+    os.environ['LOG_SEARCH_DB'] = os.path.join(work_dir, 'data', 'chat_logs.db')
+    os.environ['SETTINGS_FILE'] = os.path.join(work_dir, 'settings.json')
+    os.environ['LOG_LEVEL'] = args.log_level
+    if args.no_answer_cache:
+        os.environ['ANSWER_CACHE_ENABLED'] = 'false'
+    os.makedirs(os.environ['DATA_DIR'], exist_ok=True)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as service
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, service.create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def compare_with_baseline(results, baseline_path, max_regression):
+    """
+    与基线结果比较,延迟分位数或吞吐量变差超过阈值时视为回退
+
+    返回:
+        list: 回退描述
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {item['scenario']: item for item in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        base = baseline.get(result['scenario'])
+        if not base:
+            continue
+        for metric in REGRESSION_METRICS:
+            if base.get(metric) and result.get(metric) and result[metric] > base[metric] * (1 + max_regression):
+                regressions.append(f"{result['scenario']} {metric}: {base[metric]} -> {result[metric]}")
+        if base.get('rps') and result['rps'] < base['rps'] * (1 - max_regression):
+            regressions.append(f"{result['scenario']} rps: {base['rps']} -> {result['rps']}")
+    return regressions
+
+
+def print_report(results):
+    header = f"{'场景':<14}{'并发':>6}{'请求数':>8}{'错误':>6}{'RPS':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['scenario']:<14}{r['concurrency']:>6}{r['requests']:>8}{r['errors']:>6}{r['rps']:>10}"
+              f"{r['p50Ms']!s:>10}{r['p95Ms']!s:>10}{r['p99Ms']!s:>10}{r['maxMs']!s:>10}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='PDSA离线压测工具')
+    parser.add_argument('--scenarios', default='chat,logs-status,generate-doc',
+                        help=f"逗号分隔的场景: {', '.join(SCENARIOS)}")
+    parser.add_argument('--concurrency', type=int, default=8, help='并发请求数')
+    parser.add_argument('--requests', type=int, default=200, help='每个场景的请求总数')
+    parser.add_argument('--duration', type=float, default=0, help='每个场景的持续时间(秒),设置后忽略--requests')
+    parser.add_argument('--warmup', type=int, default=10, help='每个场景正式计时前的预热请求数')
+    parser.add_argument('--timeout', type=float, default=120, help='单个请求超时(秒)')
+    parser.add_argument('--target', help='压测已部署的服务地址(不启动本地服务,模拟实现不生效)')
+
+    upstream = parser.add_argument_group('百炼API模拟')
+    upstream.add_argument('--upstream-latency-ms', type=float, default=500, help='延迟中位数(毫秒)')
+    upstream.add_argument('--upstream-dist', choices=LATENCY_DISTRIBUTIONS, default='lognormal', help='延迟分布')
+    upstream.add_argument('--upstream-jitter', type=float, default=0.5,
+                          help='uniform为相对抖动比例,lognormal为sigma')
+    upstream.add_argument('--error-rate', type=float, default=0.0, help='返回非200状态码的比例')
+    upstream.add_argument('--exception-rate', type=float, default=0.0, help='抛出网络异常的比例')
+    upstream.add_argument('--reply-chars', type=int, default=300, help='回复长度(字符)')
+    upstream.add_argument('--stream-chunks', type=int, default=20, help='流式分片数')
+    upstream.add_argument('--first-chunk-ms', type=float, default=None, help='流式首个分片延迟(毫秒)')
+    upstream.add_argument('--seed', type=int, default=None, help='随机种子')
+
+    workload = parser.add_argument_group('请求内容')
+    workload.add_argument('--question-pool', type=int, default=0,
+                          help='不同问题的数量(0表示每个问题都不同,>0时会命中问答缓存)')
+    workload.add_argument('--no-answer-cache', action='store_true', help='关闭问答缓存')
+    workload.add_argument('--pages', type=int, default=50, help='网页夹具的不同页面数量')
+    workload.add_argument('--page-paragraphs', type=int, default=40, help='每个夹具页面的段落数')
+    workload.add_argument('--page-latency-ms', type=float, default=20, help='网页夹具响应延迟(毫秒)')
+    workload.add_argument('--force-generate', action='store_true', help='文档生成时跳过去重,每次都调用百炼')
+
+    output = parser.add_argument_group('结果输出')
+    output.add_argument('--json', help='把结果保存为JSON文件')
+    output.add_argument('--baseline', help='与基线JSON比较,出现回退时退出码为1')
+    output.add_argument('--max-regression', type=float, default=0.2, help='允许的回退比例')
+    output.add_argument('--keep-data', action='store_true', help='保留压测产生的临时数据目录')
+    output.add_argument('--log-level', default='CRITICAL',
+                        help='本地服务的运行日志级别(默认只输出严重错误,避免模拟错误刷屏)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"未知场景: {', '.join(unknown)}")
+        return 2
+
+    fixture = FixtureServer(args.pages, args.page_paragraphs, args.page_latency_ms).start()
+    work_dir = tempfile.mkdtemp(prefix='pdsa-bench-')
+    if not args.keep_data:
+        # 先于app注册: 退出时在日志和统计快照写完之后再删除临时目录
+        atexit.register(shutil.rmtree, work_dir, True)
+    server = None
+    try:
+        if args.target:
+            base_url = args.target.rstrip('/')
+        else:
+            FakeDashScope(
+                latency_ms=args.upstream_latency_ms,
+                distribution=args.upstream_dist,
+                jitter=args.upstream_jitter,
+                error_rate=args.error_rate,
+                exception_rate=args.exception_rate,
+                reply_chars=args.reply_chars,
+                stream_chunks=args.stream_chunks,
+                first_chunk_ms=args.first_chunk_ms,
+                seed=args.seed
+            ).install()
+            base_url, server = start_local_service(args, work_dir)
+        print(f"压测地址: {base_url}  并发: {args.concurrency}  场景: {', '.join(scenarios)}")
+
+        results = []
+        for scenario in scenarios:
+            if args.warmup:
+                warmup = argparse.Namespace(**{**vars(args), 'requests': args.warmup, 'duration': 0})
+                run_scenario(base_url, scenario, warmup, fixture, phase='warmup')
+            results.append(run_scenario(base_url, scenario, args, fixture))
+        print_report(results)
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({'config': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        if args.baseline:
+            regressions = compare_with_baseline(results, args.baseline, args.max_regression)
+            if regressions:
+                print("性能回退:")
+                for line in regressions:
+                    print(f"  {line}")
+                return 1
+            print("未发现超过阈值的性能回退")
+        return 0
+    finally:
+        if server is not None:
+            server.shutdown()
+        fixture.stop()
+        if args.keep_data:
+            print(f"压测数据目录: {work_dir}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,537 @@
+"""
+PDSA数字分身智能体 - 对话统计分析
+
+功能说明:
+1. 每次对话完成时增量更新统计,不需要重新扫描日志
+2. 累计计数器: 请求数、失败数、缓存命中数
+3. 按小时分桶的直方图: 请求数、失败数、回复长度分布、响应耗时分布
+4. 近似热门问题: Count-Min Sketch估算频次 + 固定大小的Top-K候选表
+5. 每个进程定期把自己的统计写入独立的快照文件,查询时合并所有进程的快照;
+   进程退出后其快照在下次启动时并入基础快照,多worker部署时计数不丢失也不重复
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl,跳过跨进程文件锁
+    fcntl = None
+
+from answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+# 响应耗时分桶上界(毫秒),最后一个桶为"超过最大上界"
+LATENCY_BOUNDS_MS = [100, 250, 500, 1000, 2000, 5000, 10000, 20000, 30000, 60000]
+
+# 回复长度分桶上界(字符)
+ANSWER_LENGTH_BOUNDS = [50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+# 热门问题展示文本的最大长度
+QUESTION_TEXT_LIMIT = 200
+
+
+class CountMinSketch:
+    """
+    Count-Min Sketch频次估算(估算值只会偏大,不会偏小)
+
+    参数:
+        width (int): 每行计数器个数
+        depth (int): 行数(哈希函数个数,最多8)
+    """
+
+    def __init__(self, width=2048, depth=4, table=None):
+        self.width = width
+        self.depth = min(depth, 8)
+        self.table = table or [[0] * width for _ in range(self.depth)]
+
+    def add(self, item, count=1):
+        """
+        增加计数
+
+        参数:
+            item (str): 元素
+            count (int): 增加的次数
+
+        返回:
+            int: 增加后的估算频次
+        """
+        estimate = None
+        for row, index in enumerate(self._indexes(item)):
+            self.table[row][index] += count
+            value = self.table[row][index]
+            estimate = value if estimate is None else min(estimate, value)
+        return estimate
+
+    def estimate(self, item):
+        """
+        估算频次
+
+        参数:
+            item (str): 元素
+
+        返回:
+            int: 估算频次
+        """
+        return min(self.table[row][index] for row, index in enumerate(self._indexes(item)))
+
+    def _indexes(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=self.depth * 8).digest()
+        return [int.from_bytes(digest[i * 8:(i + 1) * 8], 'big') % self.width for i in range(self.depth)]
+
+
+class ChatAnalytics:
+    """
+    对话统计聚合器
+
+    参数:
+        snapshot_path (str): 基础快照文件路径,各进程的快照写入同目录下的 <名称>.<pid>.json
+        bucket_seconds (int): 时间桶长度(秒)
+        retain_buckets (int): 保留的时间桶数量
+        top_k (int): 热门问题数量
+        snapshot_interval (float): 快照写入间隔(秒)
+
+    说明:
+        record()只做内存计数,快照由后台线程按间隔写入,不占用请求路径;
+        内存中只保存本进程启动以来的统计,summary()合并基础快照和其他进程的快照
+    """
+
+    def __init__(self, snapshot_path, bucket_seconds=3600, retain_buckets=168, top_k=20,
+                 snapshot_interval=60.0):
+        self.snapshot_path = snapshot_path
+        self.bucket_seconds = bucket_seconds
+        self.retain_buckets = retain_buckets
+        self.top_k = top_k
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._thread = None
+        self._stop = threading.Event()
+
+        self._totals = _empty_counters()
+        self._buckets = {}
+        self._sketch = CountMinSketch()
+        self._top = {}
+        self._since = time.time()
+        root, ext = os.path.splitext(snapshot_path)
+        self._process_path = f"{root}.{os.getpid()}{ext}"
+        self._process_pattern = re.compile(rf'^{re.escape(os.path.basename(root))}\.(\d+){re.escape(ext)}$')
+        self._consolidate()
+
+    # ----------------------------------------
+    # 记录
+    # ----------------------------------------
+
+    def record(self, question, reply, latency_ms, ok=True, cached=False, ts=None):
+        """
+        记录一次完成的对话
+
+        参数:
+            question (str): 用户问题
+            reply (str): 回复内容(失败时为错误信息)
+            latency_ms (float): 从收到请求到回复完成的耗时(毫秒)
+            ok (bool): 是否成功
+            cached (bool): 是否命中问答缓存
+            ts (float): 完成时间戳(默认当前时间)
+        """
+        ts = ts or time.time()
+        bucket_start = int(ts // self.bucket_seconds * self.bucket_seconds)
+        key = normalize_question(question or '')
+
+        with self._lock:
+            bucket = self._buckets.get(bucket_start)
+            if bucket is None:
+                bucket = self._buckets[bucket_start] = _empty_counters()
+                self._trim_buckets()
+            for counters in (self._totals, bucket):
+                _add(counters, reply, latency_ms, ok, cached)
+
+            if key:
+                self._update_top(key, question, self._sketch.add(key))
+            self._dirty = True
+
+        self.start()
+
+    # ----------------------------------------
+    # 查询
+    # ----------------------------------------
+
+    def summary(self, hours=24):
+        """
+        获取统计摘要
+
+        参数:
+            hours (int): 统计窗口(小时),窗口内按时间桶汇总
+
+        返回:
+            dict: 累计统计、窗口统计、按时间桶的请求数和热门问题
+        """
+        now = time.time()
+        window_start = now - hours * 3600
+        merged = self._combined()
+        window = _empty_counters()
+        series = []
+        for bucket_start in sorted(merged['buckets']):
+            if bucket_start + self.bucket_seconds <= window_start:
+                continue
+            bucket = merged['buckets'][bucket_start]
+            _merge(window, bucket)
+            series.append({
+                'time': datetime.fromtimestamp(bucket_start).strftime('%Y-%m-%d %H:%M'),
+                'requests': bucket['requests'],
+                'errors': bucket['errors'],
+                'cached': bucket['cached']
+            })
+        top = sorted(merged['top'].values(), key=lambda entry: entry['count'], reverse=True)
+        return {
+            'since': datetime.fromtimestamp(merged['since']).strftime('%Y-%m-%d %H:%M:%S'),
+            'windowHours': hours,
+            'totals': _describe(merged['totals']),
+            'window': _describe(window),
+            'series': series,
+            'topQuestions': [{'question': entry['text'], 'count': entry['count']} for entry in top]
+        }
+
+    # ----------------------------------------
+    # 快照
+    # ----------------------------------------
+
+    def start(self):
+        """
+        启动快照写入线程(重复调用无副作用)
+        """
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='chat-analytics', daemon=True)
+            self._thread.start()
+
+    def save(self):
+        """
+        写入本进程的快照(无变化时跳过)
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = json.dumps(self._snapshot_locked(), ensure_ascii=False)
+            self._dirty = False
+        try:
+            _write_atomic(self._process_path, snapshot)
+        except Exception as e:
+            logger.error("写入统计快照失败: %s", e)
+
+    def close(self):
+        """
+        停止快照线程并写入最后一次快照(进程退出时调用)
+        """
+        self._stop.set()
+        self.save()
+
+    def _run(self):
+        while not self._stop.wait(self.snapshot_interval):
+            self.save()
+
+    def _consolidate(self):
+        """
+        把已退出进程(及本进程pid之前的遗留文件)的快照并入基础快照并删除(启动时执行)
+        """
+        pid = os.getpid()
+        with self._file_lock():
+            folded = []
+            for path, file_pid in self._process_files():
+                if file_pid == pid or not _process_alive(file_pid):
+                    folded.append(path)
+            if not folded:
+                return
+            snapshots = [_read_snapshot(self.snapshot_path)] + [_read_snapshot(path) for path in folded]
+            merged = _combine([snap for snap in snapshots if snap], self.bucket_seconds, self.top_k)
+            for bucket_start in sorted(merged['buckets'])[:-self.retain_buckets]:
+                del merged['buckets'][bucket_start]
+            try:
+                _write_atomic(self.snapshot_path, json.dumps(_dump_snapshot(merged, self.bucket_seconds),
+                                                             ensure_ascii=False))
+                for path in folded:
+                    os.remove(path)
+            except Exception as e:
+                logger.error("合并统计快照失败: %s", e)
+
+    def _combined(self):
+        """
+        合并基础快照、其他进程的快照和本进程内存中的统计
+        """
+        pid = os.getpid()
+        with self._lock:
+            snapshots = [copy.deepcopy(self._snapshot_locked())]
+        with self._file_lock():
+            snapshots.append(_read_snapshot(self.snapshot_path))
+            for path, file_pid in self._process_files():
+                if file_pid != pid:
+                    snapshots.append(_read_snapshot(path))
+        merged = _combine([snap for snap in snapshots if snap], self.bucket_seconds, self.top_k)
+        for bucket_start in sorted(merged['buckets'])[:-self.retain_buckets]:
+            del merged['buckets'][bucket_start]
+        return merged
+
+    def _process_files(self):
+        """
+        各进程的快照文件
+
+        返回:
+            list: [(路径, pid)]
+        """
+        directory = os.path.dirname(self.snapshot_path) or '.'
+        files = []
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return files
+        for name in names:
+            match = self._process_pattern.match(name)
+            if match:
+                files.append((os.path.join(directory, name), int(match.group(1))))
+        return files
+
+    def _snapshot_locked(self):
+        """
+        本进程统计的快照数据(调用方需持有锁)
+        """
+        return {
+            'since': self._since,
+            'bucketSeconds': self.bucket_seconds,
+            'totals': self._totals,
+            'buckets': {str(k): v for k, v in self._buckets.items()},
+            'sketch': {'width': self._sketch.width, 'depth': self._sketch.depth, 'table': self._sketch.table},
+            'top': self._top
+        }
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        快照文件的跨进程排他锁(无fcntl时为空操作)
+        """
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.snapshot_path + '.lock', os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    # ----------------------------------------
+    # 内部实现
+    # ----------------------------------------
+
+    def _trim_buckets(self):
+        """
+        只保留最近retain_buckets个时间桶(调用方需持有锁)
+        """
+        if len(self._buckets) > self.retain_buckets:
+            for bucket_start in sorted(self._buckets)[:-self.retain_buckets]:
+                del self._buckets[bucket_start]
+
+    def _update_top(self, key, question, estimate):
+        """
+        更新Top-K候选表(调用方需持有锁)
+        """
+        entry = self._top.get(key)
+        if entry is not None:
+            entry['count'] = estimate
+            return
+        if len(self._top) < self.top_k:
+            self._top[key] = {'text': question[:QUESTION_TEXT_LIMIT], 'count': estimate}
+            return
+        min_key = min(self._top, key=lambda k: self._top[k]['count'])
+        if estimate > self._top[min_key]['count']:
+            del self._top[min_key]
+            self._top[key] = {'text': question[:QUESTION_TEXT_LIMIT], 'count': estimate}
+
+
+def _combine(snapshots, bucket_seconds, top_k):
+    """
+    合并多个快照: 计数器和时间桶相加,Count-Min Sketch按位置相加,热门问题按合并后的估算频次重选
+
+    参数:
+        snapshots (list): 快照字典列表
+        bucket_seconds (int): 当前时间桶长度,长度不同的快照忽略其时间桶
+        top_k (int): 热门问题数量
+
+    返回:
+        dict: {"since": 时间戳, "totals": {...}, "buckets": {时间桶: {...}}, "sketch": CountMinSketch, "top": {...}}
+    """
+    merged = {'since': time.time(), 'totals': _empty_counters(), 'buckets': {},
+              'sketch': CountMinSketch(), 'top': {}}
+    texts = {}
+    for snapshot in snapshots:
+        merged['since'] = min(merged['since'], snapshot.get('since') or merged['since'])
+        _merge(merged['totals'], {**_empty_counters(), **snapshot.get('totals', {})})
+        if snapshot.get('bucketSeconds') == bucket_seconds:
+            for bucket_start, bucket in snapshot.get('buckets', {}).items():
+                _merge(merged['buckets'].setdefault(int(bucket_start), _empty_counters()), bucket)
+        sketch = snapshot.get('sketch')
+        target = merged['sketch']
+        if sketch and sketch['width'] == target.width and sketch['depth'] == target.depth:
+            for row, values in zip(target.table, sketch['table']):
+                for index, value in enumerate(values):
+                    row[index] += value
+        for key, entry in snapshot.get('top', {}).items():
+            texts.setdefault(key, entry['text'])
+    estimates = sorted(((merged['sketch'].estimate(key), key) for key in texts), reverse=True)[:top_k]
+    merged['top'] = {key: {'text': texts[key], 'count': count} for count, key in estimates}
+    return merged
+
+
+def _dump_snapshot(merged, bucket_seconds):
+    """
+    把_combine的结果转换为快照文件格式
+    """
+    sketch = merged['sketch']
+    return {
+        'since': merged['since'],
+        'bucketSeconds': bucket_seconds,
+        'totals': merged['totals'],
+        'buckets': {str(k): v for k, v in merged['buckets'].items()},
+        'sketch': {'width': sketch.width, 'depth': sketch.depth, 'table': sketch.table},
+        'top': merged['top']
+    }
+
+
+def _read_snapshot(path):
+    """
+    读取快照文件,不存在或损坏时返回None
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error("读取统计快照失败 %s: %s", path, e)
+        return None
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _process_alive(pid):
+    """
+    检查进程是否存活(同一主机)
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 没有权限发送信号,说明进程存在
+        return True
+    return True
+
+
+def _empty_counters():
+    return {
+        'requests': 0,
+        'errors': 0,
+        'cached': 0,
+        'latencySumMs': 0.0,
+        'answerChars': 0,
+        'latency': [0] * (len(LATENCY_BOUNDS_MS) + 1),
+        'answerLength': [0] * (len(ANSWER_LENGTH_BOUNDS) + 1)
+    }
+
+
+def _bucket_index(bounds, value):
+    for index, bound in enumerate(bounds):
+        if value <= bound:
+            return index
+    return len(bounds)
+
+
+def _add(counters, reply, latency_ms, ok, cached):
+    counters['requests'] += 1
+    if not ok:
+        counters['errors'] += 1
+    if cached:
+        counters['cached'] += 1
+    counters['latencySumMs'] += latency_ms
+    counters['latency'][_bucket_index(LATENCY_BOUNDS_MS, latency_ms)] += 1
+    # 只统计成功回复的长度
+    if ok:
+        length = len(reply or '')
+        counters['answerChars'] += length
+        counters['answerLength'][_bucket_index(ANSWER_LENGTH_BOUNDS, length)] += 1
+
+
+def _merge(target, source):
+    for field in ('requests', 'errors', 'cached', 'latencySumMs', 'answerChars'):
+        target[field] += source[field]
+    for field in ('latency', 'answerLength'):
+        target[field] = [a + b for a, b in zip(target[field], source[field])]
+
+
+def _percentile(histogram, bounds, p):
+    """
+    根据分桶直方图估算分位数(返回所在桶的上界)
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    threshold = total * p
+    cumulative = 0
+    for index, count in enumerate(histogram):
+        cumulative += count
+        if cumulative >= threshold:
+            return bounds[index] if index < len(bounds) else f">{bounds[-1]}"
+    return f">{bounds[-1]}"
+
+
+def _distribution(histogram, bounds, unit):
+    labels = [f"≤{bound}{unit}" for bound in bounds] + [f">{bounds[-1]}{unit}"]
+    return [{'label': label, 'count': count} for label, count in zip(labels, histogram)]
+
+
+def _describe(counters):
+    """
+    把计数器转换为接口输出格式
+    """
+    requests = counters['requests']
+    successes = requests - counters['errors']
+    return {
+        'requests': requests,
+        'errors': counters['errors'],
+        'errorRate': round(counters['errors'] / requests, 4) if requests else 0,
+        'cached': counters['cached'],
+        'cacheHitRate': round(counters['cached'] / requests, 4) if requests else 0,
+        'latency': {
+            'avgMs': round(counters['latencySumMs'] / requests, 1) if requests else None,
+            'p50Ms': _percentile(counters['latency'], LATENCY_BOUNDS_MS, 0.5),
+            'p95Ms': _percentile(counters['latency'], LATENCY_BOUNDS_MS, 0.95),
+            'p99Ms': _percentile(counters['latency'], LATENCY_BOUNDS_MS, 0.99),
+            'histogram': _distribution(counters['latency'], LATENCY_BOUNDS_MS, 'ms')
+        },
+        'answerLength': {
+            'avgChars': round(counters['answerChars'] / successes, 1) if successes else None,
+            'p50Chars': _percentile(counters['answerLength'], ANSWER_LENGTH_BOUNDS, 0.5),
+            'p95Chars': _percentile(counters['answerLength'], ANSWER_LENGTH_BOUNDS, 0.95),
+            'histogram': _distribution(counters['answerLength'], ANSWER_LENGTH_BOUNDS, '字')
+        }
+    }
@@ -0,0 +1,312 @@
+"""
+PDSA数字分身智能体 - 服务端对话会话
+
+功能说明:
+1. 按会话ID在服务端保存对话历史,前端每轮只需发送新问题和会话ID
+2. 内存LRU + TTL;配置写出目录后每轮对话写入磁盘,多个worker进程共享会话
+3. 按token预算裁剪历史(保留最近的若干轮),每轮发送给百炼的提示词长度有上限
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# 会话ID格式(服务端生成的uuid4十六进制串),不符合的ID视为新会话
+SESSION_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# 中日韩字符(约1字1个token)
+_CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+
+def estimate_tokens(text):
+    """
+    估算文本token数: 中日韩字符按1字1个token,其余字符按4个字符1个token
+
+    参数:
+        text (str): 文本
+
+    返回:
+        int: 估算的token数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def trim_history(turns, token_budget, max_turns=None):
+    """
+    从最近一轮开始向前保留历史,直到超出token预算或轮数上限
+
+    参数:
+        turns (list): 历史对话列表,格式: [{"user": "...", "bot": "..."}]
+        token_budget (int): token预算,0表示不按token裁剪
+        max_turns (int): 最多保留的轮数
+
+    返回:
+        list: 裁剪后的历史(保持原顺序)
+    """
+    kept = []
+    used = 0
+    for turn in reversed(turns):
+        if max_turns is not None and len(kept) >= max_turns:
+            break
+        cost = estimate_tokens(turn.get('user', '')) + estimate_tokens(turn.get('bot', ''))
+        if token_budget and used + cost > token_budget:
+            break
+        kept.append(turn)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def build_messages(history, user_message):
+    """
+    把历史和当前问题转换为百炼应用的messages参数
+
+    参数:
+        history (list): 历史对话列表
+        user_message (str): 当前问题
+
+    返回:
+        list: [{"role": "user"|"assistant", "content": "..."}]
+    """
+    messages = []
+    for turn in history:
+        messages.append({'role': 'user', 'content': turn.get('user', '')})
+        messages.append({'role': 'assistant', 'content': turn.get('bot', '')})
+    messages.append({'role': 'user', 'content': user_message})
+    return messages
+
+
+class SessionStore:
+    """
+    线程安全的会话存储
+
+    参数:
+        max_sessions (int): 内存中保留的会话数,超出时淘汰最久未使用的会话
+        ttl (float): 会话空闲多久后过期(秒)
+        token_budget (int): 发送给百炼的历史token预算
+        max_turns (int): 每个会话保留的最大轮数
+        spill_dir (str): 会话文件目录,为空时会话只保存在本进程内存中
+
+    说明:
+        配置spill_dir后每轮对话都会写入磁盘,内存只作为本进程的缓存;
+        每次访问都会读取会话文件并以较新的一份为准,
+        同一会话的请求被分到不同的gunicorn worker时历史仍然连续
+    """
+
+    def __init__(self, max_sessions=10000, ttl=86400, token_budget=2000, max_turns=20, spill_dir=None):
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self.token_budget = token_budget
+        self.max_turns = max(1, max_turns)
+        self.spill_dir = spill_dir
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._evicted = 0
+        self._spilled = 0
+        self._restored = 0
+        self._expired = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    # ----------------------------------------
+    # 读写会话
+    # ----------------------------------------
+
+    def resolve(self, session_id):
+        """
+        校验会话ID,无效或已过期时创建新会话
+
+        参数:
+            session_id (str): 客户端传入的会话ID(可为空)
+
+        返回:
+            str: 可用的会话ID
+        """
+        if session_id and SESSION_ID_PATTERN.match(session_id) and self._load(session_id) is not None:
+            return session_id
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[session_id] = {'turns': [], 'updated': time.time()}
+            self._created += 1
+            self._evict_locked()
+        return session_id
+
+    def history(self, session_id):
+        """
+        会话中按token预算裁剪后的历史
+
+        参数:
+            session_id (str): 会话ID
+
+        返回:
+            list: 历史对话列表,格式: [{"user": "...", "bot": "..."}]
+        """
+        session = self._load(session_id)
+        if session is None:
+            return []
+        with self._lock:
+            turns = list(session['turns'])
+        return trim_history(turns, self.token_budget, self.max_turns)
+
+    def append(self, session_id, user_message, bot_reply):
+        """
+        记录一轮成功的对话
+
+        参数:
+            session_id (str): 会话ID
+            user_message (str): 用户问题
+            bot_reply (str): AI回复
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = {'turns': [], 'updated': time.time()}
+                self._sessions[session_id] = session
+            session['turns'].append({'user': user_message, 'bot': bot_reply})
+            # 只保留可能被发送的轮数,单个会话占用的内存有上限
+            del session['turns'][:-self.max_turns]
+            session['updated'] = time.time()
+            self._sessions.move_to_end(session_id)
+            snapshot = dict(session, turns=list(session['turns']))
+            self._evict_locked()
+        # 在锁外写入磁盘,其他worker进程下一轮即可读到
+        self._spill(session_id, snapshot)
+
+    # ----------------------------------------
+    # 维护
+    # ----------------------------------------
+
+    def purge_expired(self):
+        """
+        清除过期会话(含磁盘上的会话文件)
+
+        返回:
+            int: 清除的会话数
+        """
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [sid for sid, session in self._sessions.items() if session['updated'] < cutoff]
+            for sid in expired:
+                del self._sessions[sid]
+            self._expired += len(expired)
+        purged = len(expired)
+        if self.spill_dir:
+            for name in os.listdir(self.spill_dir):
+                path = os.path.join(self.spill_dir, name)
+                try:
+                    if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        purged += 1
+                except OSError:
+                    continue
+        return purged
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'maxSessions': self.max_sessions,
+                'ttl': self.ttl,
+                'tokenBudget': self.token_budget,
+                'maxTurns': self.max_turns,
+                'spillEnabled': bool(self.spill_dir),
+                'created': self._created,
+                'evicted': self._evicted,
+                'spilled': self._spilled,
+                'restored': self._restored,
+                'expired': self._expired
+            }
+
+    # ----------------------------------------
+    # 内部方法
+    # ----------------------------------------
+
+    def _load(self, session_id):
+        """
+        读取会话: 内存和磁盘上的会话文件中取较新的一份;过期的会话视为不存在
+
+        说明:
+            会话文件可能由其他worker进程更新,因此内存命中时也会读取磁盘
+        """
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and session['updated'] < cutoff:
+                del self._sessions[session_id]
+                self._expired += 1
+                session = None
+
+        stored = self._read_spill(session_id)
+        if stored is None or stored.get('updated', 0) < cutoff:
+            if session is None:
+                return None
+            with self._lock:
+                if session_id in self._sessions:
+                    self._sessions.move_to_end(session_id)
+            return session
+
+        with self._lock:
+            # 读取期间其他线程可能已更新同一会话,以较新的为准
+            current = self._sessions.get(session_id)
+            if current is None or current['updated'] < stored['updated']:
+                self._sessions[session_id] = stored
+                current = stored
+                self._restored += 1
+            self._sessions.move_to_end(session_id)
+            self._evict_locked()
+        return current
+
+    def _evict_locked(self):
+        # 会话已在每轮对话时写入磁盘,淘汰时只需从内存移除
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self._evicted += 1
+
+    def _read_spill(self, session_id):
+        path = self._spill_path(session_id)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                session = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("读取会话文件失败 %s: %s", path, e)
+            return None
+        if not isinstance(session, dict) or not isinstance(session.get('turns'), list):
+            return None
+        return session
+
+    def _spill(self, session_id, session):
+        path = self._spill_path(session_id)
+        if not path:
+            return
+        # 临时文件按进程和线程区分,多个worker同时写同一会话时不会互相覆盖临时文件
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(session, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning("写出会话文件失败 %s: %s", path, e)
+            return
+        with self._lock:
+            self._spilled += 1
+
+    def _spill_path(self, session_id):
+        if not self.spill_dir or not SESSION_ID_PATTERN.match(session_id or ''):
+            return None
+        return os.path.join(self.spill_dir, f"{session_id}.json")
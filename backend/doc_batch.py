@@ -0,0 +1,223 @@
+"""
+PDSA数字分身智能体 - 批量文档导入模块
+
+功能说明:
+1. 一次提交大量URL(或站点地图),后台并发抓取网页
+2. 每个域名单独排队并限制并发抓取数,避免压垮目标站点,单个域名也不会占满抓取线程
+3. 文档生成使用独立的并发上限,避免超出百炼应用的调用限制
+4. 记录每个URL的处理状态,供批次状态接口查询
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import threading
+import uuid
+from collections import deque
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+
+
+def parse_sitemap(xml_text):
+    """
+    解析站点地图XML
+
+    参数:
+        xml_text (str): sitemap.xml内容
+
+    返回:
+        tuple: (页面URL列表, 子站点地图URL列表)
+
+    说明:
+        同时支持<urlset>页面列表和<sitemapindex>站点地图索引
+    """
+    root = ET.fromstring(xml_text.encode('utf-8') if isinstance(xml_text, str) else xml_text)
+    tag = root.tag.split('}')[-1]
+
+    locs = []
+    for element in root.iter():
+        if element.tag.split('}')[-1] == 'loc' and element.text:
+            locs.append(element.text.strip())
+
+    if tag == 'sitemapindex':
+        return [], locs
+    return locs, []
+
+
+class BatchIngestor:
+    """
+    批量文档导入执行器
+
+    参数:
+        fetch_fn (callable): 抓取函数,签名 fetch_fn(url) -> str
+        generate_fn (callable): 生成函数,签名 generate_fn(url, content, **options) -> dict
+        fetch_workers (int): 抓取线程总数
+        per_host_limit (int): 单个域名的并发抓取上限
+        generate_concurrency (int): 文档生成并发上限
+        max_batches (int): 内存中保留的批次数
+
+    说明:
+        抓取和生成分别使用独立的线程池,所有批次共享并发上限;
+        URL先进入所属域名的等待队列,域名有空闲名额时才提交到抓取线程池,
+        抓取线程不会因等待某个域名而空占;
+        某个URL抓取完成后立即进入生成队列,无需等待整个批次抓取结束
+    """
+
+    def __init__(self, fetch_fn, generate_fn, fetch_workers=16, per_host_limit=4,
+                 generate_concurrency=4, max_batches=20):
+        self.fetch_fn = fetch_fn
+        self.generate_fn = generate_fn
+        self.per_host_limit = per_host_limit
+        self.max_batches = max_batches
+        self._fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix='batch-fetch')
+        self._generate_pool = ThreadPoolExecutor(max_workers=generate_concurrency, thread_name_prefix='batch-generate')
+        self._host_queues = {}
+        self._host_active = {}
+        self._batches = {}
+        self._order = []
+        self._lock = threading.Lock()
+
+    def submit(self, urls, **options):
+        """
+        提交批量导入任务
+
+        参数:
+            urls (list): URL列表(自动去重,保持原有顺序)
+            **options: 透传给生成函数的选项(如force)
+
+        返回:
+            str: 批次ID
+        """
+        unique_urls = list(dict.fromkeys(url for url in urls if url))
+        batch_id = uuid.uuid4().hex
+        batch = {
+            'id': batch_id,
+            'createdAt': _now(),
+            'finishedAt': None,
+            'options': options,
+            'items': [
+                {'url': url, 'status': 'pending', 'filePath': None, 'error': None}
+                for url in unique_urls
+            ]
+        }
+
+        with self._lock:
+            self._batches[batch_id] = batch
+            self._order.append(batch_id)
+            # 只保留最近的批次记录
+            while len(self._order) > self.max_batches:
+                self._batches.pop(self._order.pop(0), None)
+
+            hosts = []
+            for item in batch['items']:
+                host = _host(item['url'])
+                self._host_queues.setdefault(host, deque()).append((batch, item))
+                hosts.append(host)
+            for host in dict.fromkeys(hosts):
+                self._dispatch_locked(host)
+        if not batch['items']:
+            batch['finishedAt'] = _now()
+        return batch_id
+
+    def get(self, batch_id):
+        """
+        查询批次状态
+
+        参数:
+            batch_id (str): 批次ID
+
+        返回:
+            dict|None: 批次状态(含每个URL的处理结果和汇总计数)
+        """
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return None
+            items = [dict(item) for item in batch['items']]
+            summary = {}
+            for item in items:
+                summary[item['status']] = summary.get(item['status'], 0) + 1
+            return {
+                'id': batch['id'],
+                'createdAt': batch['createdAt'],
+                'finishedAt': batch['finishedAt'],
+                'total': len(items),
+                'summary': summary,
+                'items': items
+            }
+
+    def _dispatch_locked(self, host):
+        """
+        在域名并发上限内把等待中的URL提交到抓取线程池(调用方需持有锁)
+        """
+        waiting = self._host_queues.get(host)
+        while waiting and self._host_active.get(host, 0) < self.per_host_limit:
+            self._host_active[host] = self._host_active.get(host, 0) + 1
+            self._fetch_pool.submit(self._fetch_item, *waiting.popleft())
+        if not waiting:
+            self._host_queues.pop(host, None)
+        if not self._host_active.get(host):
+            self._host_active.pop(host, None)
+
+    def _release_host(self, host):
+        """
+        归还域名的抓取名额并提交该域名的下一个URL
+        """
+        with self._lock:
+            self._host_active[host] -= 1
+            self._dispatch_locked(host)
+
+    def _set_status(self, batch, item, status, **fields):
+        """
+        更新单个URL的状态,全部结束时记录批次完成时间
+        """
+        with self._lock:
+            item['status'] = status
+            item.update(fields)
+            if all(i['status'] in ('done', 'failed') for i in batch['items']):
+                batch['finishedAt'] = _now()
+
+    def _fetch_item(self, batch, item):
+        """
+        抓取单个URL,成功后提交到生成线程池
+        """
+        url = item['url']
+        try:
+            self._set_status(batch, item, 'fetching')
+            content = self.fetch_fn(url)
+        except Exception as e:
+            self._set_status(batch, item, 'failed', error=f"网页爬取失败: {str(e)}")
+            return
+        finally:
+            self._release_host(_host(url))
+
+        self._set_status(batch, item, 'queued')
+        self._generate_pool.submit(self._generate_item, batch, item, content)
+
+    def _generate_item(self, batch, item, content):
+        """
+        为单个URL生成并保存文档
+        """
+        try:
+            self._set_status(batch, item, 'generating')
+            result = self.generate_fn(item['url'], content, **batch['options'])
+            self._set_status(batch, item, 'done', filePath=result.get('filePath'),
+                             deduplicated=bool(result.get('deduplicated')))
+        except Exception as e:
+            self._set_status(batch, item, 'failed', error=f"生成文档失败: {str(e)}")
+
+
+def _host(url):
+    """
+    URL所属域名(小写)
+    """
+    return urlparse(url).netloc.lower()
+
+
+def _now():
+    """
+    当前时间字符串
+    """
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,197 @@
+"""
+PDSA数字分身智能体 - 长文档分块生成模块
+
+功能说明:
+1. 按结构边界(标题 > 空行 > 换行 > 句末标点)将长文本切分为大小受限的分块
+2. 分块并发调用生成函数,限制最大并发数
+3. 按原始顺序依次回调已完成的分块,便于边生成边写入文件
+4. 合并分块结果时去除相邻分块重复的标题
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Markdown标题行(分块时优先在标题前切分)
+HEADING_LINE_PATTERN = re.compile(r'^#{1,6}\s+\S')
+
+# 句末标点(段落过长时在句末切分)
+SENTENCE_END_PATTERN = re.compile(r'(?<=[。！？!?；;.])\s*')
+
+
+def split_content(text, max_chars):
+    """
+    将长文本按结构边界切分为不超过max_chars的分块
+
+    参数:
+        text (str): 原始文本
+        max_chars (int): 单个分块的最大字符数
+
+    返回:
+        list: 分块文本列表(文本不超过上限时只有一个元素)
+
+    说明:
+        依次尝试在标题行、空行、换行、句末标点处切分,
+        单句仍超过上限时按字符硬切分
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    sections = _split_sections(text)
+    chunks = []
+    current = ''
+    for section in sections:
+        for piece in _fit(section, max_chars):
+            if current and len(current) + len(piece) + 1 > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_sections(text):
+    """
+    在标题行前切分,返回以标题开头的小节列表
+    """
+    sections = []
+    current = []
+    for line in text.split('\n'):
+        if HEADING_LINE_PATTERN.match(line) and current:
+            sections.append('\n'.join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append('\n'.join(current))
+    return sections
+
+
+def _fit(block, max_chars):
+    """
+    将超长块依次按空行、换行、句末标点、字符切分到不超过上限
+    """
+    if len(block) <= max_chars:
+        return [block]
+
+    for separator in ('\n\n', '\n'):
+        parts = block.split(separator)
+        if len(parts) > 1:
+            return _pack(parts, separator, max_chars)
+
+    sentences = [s for s in SENTENCE_END_PATTERN.split(block) if s]
+    if len(sentences) > 1:
+        return _pack(sentences, '', max_chars)
+
+    return [block[i:i + max_chars] for i in range(0, len(block), max_chars)]
+
+
+def _pack(parts, separator, max_chars):
+    """
+    将切分后的片段重新合并为尽量大但不超过上限的块
+    """
+    packed = []
+    current = ''
+    for part in parts:
+        for piece in _fit(part, max_chars):
+            candidate = f"{current}{separator}{piece}" if current else piece
+            if current and len(candidate) > max_chars:
+                packed.append(current)
+                current = piece
+            else:
+                current = candidate
+    if current:
+        packed.append(current)
+    return packed
+
+
+def map_chunks(chunks, fn, concurrency, on_section=None):
+    """
+    并发处理分块,并按原始顺序回调已完成的结果
+
+    参数:
+        chunks (list): 分块列表
+        fn (callable): 处理函数,签名 fn(index, chunk) -> str
+        concurrency (int): 最大并发数
+        on_section (callable): 顺序回调(可选),签名 on_section(index, result);
+                               第i块只有在前i-1块都已回调后才会回调
+
+    返回:
+        list: 按顺序排列的处理结果
+
+    异常:
+        任一分块失败时抛出该分块的异常(其余未开始的分块会被取消)
+    """
+    results = [None] * len(chunks)
+    done = [False] * len(chunks)
+    state = {'next': 0}
+    lock = threading.Lock()
+
+    def run(index):
+        result = fn(index, chunks[index])
+        with lock:
+            results[index] = result
+            done[index] = True
+            # 顺序输出所有已就绪的连续分块
+            while state['next'] < len(chunks) and done[state['next']]:
+                if on_section:
+                    on_section(state['next'], results[state['next']])
+                state['next'] += 1
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='doc-chunk') as pool:
+        futures = [pool.submit(run, index) for index in range(len(chunks))]
+        try:
+            for future in futures:
+                future.result()
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+    return results
+
+
+class SectionMerger:
+    """
+    增量合并分块生成的Markdown,去除分块开头重复上一分块的标题行
+
+    用法:
+        merger = SectionMerger()
+        for section in sections:
+            output.write(merger.add(section))
+    """
+
+    def __init__(self):
+        self._last_heading = None
+        self._started = False
+
+    def add(self, section):
+        """
+        追加一个分块
+
+        参数:
+            section (str): 分块的Markdown文本
+
+        返回:
+            str: 应追加到输出的文本(含与前一分块之间的空行)
+        """
+        lines = section.strip().split('\n')
+        while lines and HEADING_LINE_PATTERN.match(lines[0]) and lines[0].strip() == self._last_heading:
+            lines.pop(0)
+        for line in lines:
+            if HEADING_LINE_PATTERN.match(line):
+                self._last_heading = line.strip()
+
+        text = '\n'.join(lines).strip()
+        if not text:
+            return ''
+        if self._started:
+            return '\n\n' + text
+        self._started = True
+        return text
+
@@ -0,0 +1,268 @@
+"""
+PDSA数字分身智能体 - 文档去重索引
+
+功能说明:
+1. 以"来源URL + 归一化内容"的哈希为键,记录已生成的文档
+2. 相同来源再次请求时直接返回已有文档,不再调用百炼
+3. 文件名以O_CREAT|O_EXCL在docs目录中原子占用,多个worker进程之间不会冲突,生成失败时释放
+4. 索引持久化为只追加的JSON Lines日志,写入只追加一行;
+   各进程查找未命中时只读取日志中新增的行,进程重启后继续生效
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl,跳过跨进程文件锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_source(content):
+    """
+    归一化来源内容: NFKC归一化并折叠空白
+
+    参数:
+        content (str): 来源文本
+
+    返回:
+        str: 归一化后的文本
+    """
+    return WHITESPACE_PATTERN.sub(' ', unicodedata.normalize('NFKC', content or '')).strip()
+
+
+def content_key(url, content):
+    """
+    计算来源内容的去重键
+
+    参数:
+        url (str): 来源URL(直接粘贴内容时为空)
+        content (str): 来源文本
+
+    返回:
+        str: SHA256十六进制串
+    """
+    source = f"{(url or '').strip()}\n{normalize_source(content)}"
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+class DocIndex:
+    """
+    文档去重索引
+
+    参数:
+        index_path (str): 索引日志文件路径(JSON Lines)
+        docs_dir (str): 文档目录
+
+    索引日志格式(每行一条,后写入的记录覆盖同一哈希的旧记录):
+        {"key": "<内容哈希>", "fileName": "...", "url": "...", "createdAt": "..."}
+        {"key": "<内容哈希>", "deleted": true}
+
+    说明:
+        - 占用的文件名在docs目录中创建空文件占位,写入文档内容前为空文件
+        - 日志中被覆盖的行超过有效记录数时,启动时在文件锁内重写日志
+    """
+
+    def __init__(self, index_path, docs_dir):
+        self.index_path = index_path
+        self.docs_dir = docs_dir
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._offset = 0
+        self._inode = None
+        self._lines = 0
+        self._hits = 0
+        with self._lock:
+            self._compact_locked()
+
+    def lookup(self, key):
+        """
+        查找已生成的文档
+
+        参数:
+            key (str): 内容哈希
+
+        返回:
+            dict|None: 索引记录;文档文件已被删除时移除记录并返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                # 其他进程可能已记录该文档,读取日志中新增的行
+                self._tail_locked()
+                entry = self._entries.get(key)
+            if entry is None:
+                return None
+            path = os.path.join(self.docs_dir, entry['fileName'])
+            if os.path.exists(path):
+                self._hits += 1
+                return dict(entry)
+            del self._entries[key]
+        self._append({'key': key, 'deleted': True})
+        return None
+
+    def record(self, key, file_name, url=''):
+        """
+        记录新生成的文档
+
+        参数:
+            key (str): 内容哈希
+            file_name (str): docs目录下的文件名
+            url (str): 来源URL
+        """
+        entry = {
+            'fileName': file_name,
+            'url': url or '',
+            'createdAt': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        with self._lock:
+            self._entries[key] = entry
+        self._append(dict(entry, key=key))
+
+    def reserve_name(self, file_name):
+        """
+        占用文件名: 在docs目录中原子创建空文件,已存在时返回False
+
+        参数:
+            file_name (str): 候选文件名
+
+        返回:
+            bool: 是否占用成功
+        """
+        try:
+            fd = os.open(os.path.join(self.docs_dir, file_name), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        os.close(fd)
+        return True
+
+    def release_name(self, file_name):
+        """
+        释放占用但未写入内容的文件名(文档生成失败时调用)
+
+        参数:
+            file_name (str): 文件名
+        """
+        path = os.path.join(self.docs_dir, file_name)
+        try:
+            if os.path.getsize(path) == 0:
+                os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        """
+        获取索引统计信息
+
+        返回:
+            dict: 索引条目数、日志行数、命中次数
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'journalLines': self._lines,
+                'hits': self._hits
+            }
+
+    def _tail_locked(self):
+        """
+        读取日志中新增的行(调用方需持有锁);日志被重写后从头读取
+        """
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._entries = {}
+            self._offset = 0
+            self._lines = 0
+            self._inode = stat.st_ino
+        if stat.st_size == self._offset:
+            return
+        try:
+            with open(self.index_path, 'rb') as f:
+                f.seek(self._offset)
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        # 其他进程正在写入的最后一行,下次再读
+                        break
+                    self._offset += len(raw)
+                    self._lines += 1
+                    try:
+                        record = json.loads(raw)
+                    except ValueError:
+                        continue
+                    key = record.pop('key', None)
+                    if not key:
+                        continue
+                    if record.get('deleted'):
+                        self._entries.pop(key, None)
+                    else:
+                        self._entries[key] = record
+        except OSError as e:
+            logger.error("读取文档索引失败: %s", e)
+
+    def _append(self, record):
+        """
+        追加一行索引记录
+        """
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        try:
+            with self._file_lock():
+                fd = os.open(self.index_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+        except OSError as e:
+            logger.error("写入文档索引失败: %s", e)
+
+    def _compact_locked(self):
+        """
+        读取日志,被覆盖的行过多时在文件锁内重写为每个哈希一行(调用方需持有锁)
+        """
+        with self._file_lock():
+            self._tail_locked()
+            if self._lines <= max(100, 2 * len(self._entries)):
+                return
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for key, entry in self._entries.items():
+                        f.write(json.dumps(dict(entry, key=key), ensure_ascii=False) + '\n')
+                os.replace(tmp_path, self.index_path)
+            except OSError as e:
+                logger.error("压缩文档索引失败: %s", e)
+                return
+            self._inode = None
+            self._tail_locked()
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        索引日志的跨进程排他锁(无fcntl时为空操作)
+        """
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.index_path + '.lock', os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
@@ -0,0 +1,481 @@
+"""
+PDSA数字分身智能体 - 文档生成任务队列
+
+功能说明:
+1. 文档生成请求以任务形式入队,接口立即返回任务ID
+2. 固定数量的后台工作线程依次执行 抓取 -> 生成 -> 保存 流程
+3. 记录每个任务的阶段进度,供状态查询接口轮询
+4. 任务状态变化追加写入磁盘日志(JSON Lines),进程重启后恢复未完成任务
+5. 多进程部署时共享同一日志文件: 只有主进程恢复任务和压缩日志,
+   其他进程的任务状态可通过日志查询
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl,跳过跨进程文件锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 任务阶段及对应的进度百分比
+JOB_STAGES = {
+    'queued': 0,
+    'fetching': 10,
+    'generating': 40,
+    'saving': 90,
+    'done': 100,
+    'failed': 100
+}
+
+# 已结束的任务状态
+FINISHED_STATUSES = ('done', 'failed')
+
+# 日志文件超过该行数时在启动或任务结束时压缩
+JOURNAL_COMPACT_LINES = 1000
+
+
+class JobQueueFullError(Exception):
+    """
+    任务队列已满
+    """
+
+
+class DocJobQueue:
+    """
+    带磁盘日志的有界文档生成任务队列
+
+    参数:
+        handler (callable): 任务处理函数,签名 handler(params, progress) -> dict
+                            progress(stage) 用于上报当前阶段
+        journal_path (str): 任务日志文件路径
+        workers (int): 工作线程数
+        max_queued (int): 排队任务上限,超出时拒绝提交
+        max_finished (int): 内存和日志中保留的已结束任务数
+
+    说明:
+        - 任务结果中的markdown正文不写入日志,只保留文件路径,
+          重启后由调用方按路径读取
+        - 任务参数(含网页正文)只在提交记录中写入一次,进度记录不含参数,
+          读取日志时从提交记录合并
+        - 重启时处于queued/运行中阶段的任务会重新入队
+        - 任务记录中的pid为执行任务的进程,恢复时跳过仍在运行的其他进程的任务
+    """
+
+    def __init__(self, handler, journal_path, workers=2, max_queued=100, max_finished=200):
+        self.handler = handler
+        self.journal_path = journal_path
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._order = []
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._journal_lines = 0
+        self._threads = []
+        self._started = False
+        self._owner = False
+
+    # ----------------------------------------
+    # 生命周期
+    # ----------------------------------------
+
+    def start(self, resume=True):
+        """
+        启动工作线程,resume为True时恢复日志中的任务(重复调用无副作用)
+
+        参数:
+            resume (bool): 是否负责恢复任务和压缩日志(多进程部署时只有主进程为True)
+
+        返回:
+            int: 从日志恢复并重新入队的任务数
+        """
+        with self._lock:
+            start_workers = not self._started
+            take_ownership = resume and not self._owner
+            self._started = True
+            self._owner = self._owner or resume
+
+        if start_workers:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'doc-job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+        if not take_ownership:
+            return 0
+        resumed = self._replay_journal()
+        self._compact_journal()
+
+        if resumed:
+            logger.info("已从日志恢复%d个未完成任务", resumed)
+        return resumed
+
+    # ----------------------------------------
+    # 对外接口
+    # ----------------------------------------
+
+    def submit(self, params):
+        """
+        提交文档生成任务
+
+        参数:
+            params (dict): 任务参数(url/content/fileName)
+
+        返回:
+            dict: 任务快照
+
+        异常:
+            JobQueueFullError: 排队任务数达到上限
+        """
+        if not self._started:
+            self.start()
+
+        now = _now()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'stage': 'queued',
+            'progress': JOB_STAGES['queued'],
+            'params': params,
+            'result': None,
+            'error': None,
+            'createdAt': now,
+            'updatedAt': now,
+            'pid': os.getpid()
+        }
+
+        with self._lock:
+            if self._queue.qsize() >= self.max_queued:
+                raise JobQueueFullError(f"任务队列已满(上限{self.max_queued})")
+            self._jobs[job['id']] = job
+            self._order.append(job['id'])
+            snapshot = _copy_job(job)
+
+        self._append_journal(job, include_params=True)
+        self._queue.put(job['id'])
+        return snapshot
+
+    def get(self, job_id):
+        """
+        查询任务快照
+
+        参数:
+            job_id (str): 任务ID
+
+        返回:
+            dict|None: 任务快照,不存在时返回None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return _copy_job(job)
+        # 多进程部署时任务可能由其他进程执行,从共享日志中查找
+        return self._read_journal().get(job_id)
+
+    def list(self, limit=50):
+        """
+        列出最近的任务(按创建时间倒序)
+
+        参数:
+            limit (int): 返回数量上限
+
+        返回:
+            list: 任务快照列表(不含参数中的正文内容)
+        """
+        with self._lock:
+            ids = self._order[-limit:][::-1]
+            jobs = [_copy_job(self._jobs[job_id]) for job_id in ids]
+        for job in jobs:
+            job['params'] = {k: v for k, v in job['params'].items() if k != 'content'}
+            if job.get('result'):
+                job['result'] = {k: v for k, v in job['result'].items() if k != 'markdown'}
+        return jobs
+
+    def stats(self):
+        """
+        获取队列统计信息
+
+        返回:
+            dict: 各状态任务数量与队列深度
+        """
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return {
+                'workers': self.workers,
+                'queueDepth': self._queue.qsize(),
+                'maxQueued': self.max_queued,
+                'statusCounts': counts
+            }
+
+    # ----------------------------------------
+    # 工作线程
+    # ----------------------------------------
+
+    def _worker(self):
+        """
+        工作线程主循环: 取出任务并执行
+        """
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run_job(job_id)
+            except Exception as e:
+                logger.exception("任务执行异常(%s): %s", job_id, e)
+            finally:
+                self._queue.task_done()
+
+    def _run_job(self, job_id):
+        """
+        执行单个任务并记录结果
+
+        参数:
+            job_id (str): 任务ID
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in FINISHED_STATUSES:
+                return
+            params = dict(job['params'])
+
+        def progress(stage):
+            self._update(job_id, status='running', stage=stage, progress=JOB_STAGES.get(stage, 0))
+
+        try:
+            result = self.handler(params, progress)
+            self._update(job_id, status='done', stage='done', progress=JOB_STAGES['done'], result=result)
+        except Exception as e:
+            self._update(job_id, status='failed', stage='failed', progress=JOB_STAGES['failed'], error=str(e))
+
+        self._prune_finished()
+
+    def _update(self, job_id, **fields):
+        """
+        更新任务字段并写入日志
+
+        参数:
+            job_id (str): 任务ID
+            **fields: 要更新的字段
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job['updatedAt'] = _now()
+            snapshot = _copy_job(job)
+        self._append_journal(snapshot)
+
+    def _prune_finished(self):
+        """
+        移除超出保留数量的最早已结束任务,必要时压缩日志
+        """
+        with self._lock:
+            finished = [job_id for job_id in self._order if self._jobs[job_id]['status'] in FINISHED_STATUSES]
+            for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job_id]
+                self._order.remove(job_id)
+            need_compact = self._journal_lines > JOURNAL_COMPACT_LINES
+        if need_compact:
+            self._compact_journal()
+
+    # ----------------------------------------
+    # 磁盘日志
+    # ----------------------------------------
+
+    def _append_journal(self, job, include_params=False):
+        """
+        追加一条任务快照到日志
+
+        参数:
+            job (dict): 任务快照
+            include_params (bool): 是否写入任务参数(只有提交记录为True)
+        """
+        record = _journal_record(job, include_params)
+        try:
+            with self._journal_lock, self._file_lock():
+                with open(self.journal_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._journal_lines += 1
+        except Exception as e:
+            logger.error("写入任务日志失败: %s", e)
+
+    def _read_journal(self):
+        """
+        读取日志中每个任务的最新记录
+
+        返回:
+            dict: 任务ID -> 最新记录(参数取自提交记录)
+        """
+        latest = {}
+        if not os.path.exists(self.journal_path):
+            return latest
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 忽略进程崩溃时写入不完整的最后一行
+                        continue
+                    if record.get('id'):
+                        # 进度记录不含参数,沿用提交记录中的参数
+                        previous = latest.get(record['id'])
+                        if 'params' not in record:
+                            record['params'] = previous.get('params', {}) if previous else {}
+                        latest[record['id']] = record
+        except Exception as e:
+            logger.error("读取任务日志失败: %s", e)
+        return latest
+
+    def _replay_journal(self):
+        """
+        读取日志恢复任务状态,未完成的任务重新入队
+
+        返回:
+            int: 重新入队的任务数
+        """
+        latest = self._read_journal()
+        pid = os.getpid()
+        resumed = 0
+        with self._lock:
+            for job_id, job in latest.items():
+                if job_id in self._jobs:
+                    continue
+                if job['status'] not in FINISHED_STATUSES:
+                    if job.get('pid') not in (None, pid) and _process_alive(job['pid']):
+                        # 仍由其他存活进程执行,不重复执行
+                        continue
+                    job.update({
+                        'status': 'queued',
+                        'stage': 'queued',
+                        'progress': JOB_STAGES['queued'],
+                        'updatedAt': _now(),
+                        'pid': pid
+                    })
+                    self._queue.put(job_id)
+                    resumed += 1
+                self._jobs[job_id] = job
+                self._order.append(job_id)
+            self._order.sort(key=lambda job_id: self._jobs[job_id].get('createdAt', ''))
+        return resumed
+
+    def _compact_journal(self):
+        """
+        重写日志,每个任务只保留最新记录(只由负责恢复任务的进程执行)
+
+        说明:
+            合并日志文件和本进程内存中较新的记录,保留其他进程追加的任务;
+            已结束的任务只保留最近max_finished条
+        """
+        if not self._owner:
+            return
+        with self._lock:
+            own = {job_id: _copy_job(job) for job_id, job in self._jobs.items()}
+        tmp_path = self.journal_path + '.tmp'
+        try:
+            with self._journal_lock, self._file_lock():
+                latest = self._read_journal()
+                for job_id, job in own.items():
+                    if job_id not in latest or job.get('updatedAt', '') >= latest[job_id].get('updatedAt', ''):
+                        latest[job_id] = job
+                records = sorted(latest.values(), key=lambda job: job.get('updatedAt', ''))
+                finished = [job for job in records if job['status'] in FINISHED_STATUSES]
+                dropped = {job['id'] for job in finished[:max(0, len(finished) - self.max_finished)]}
+                snapshots = sorted((job for job in records if job['id'] not in dropped),
+                                   key=lambda job: job.get('createdAt', ''))
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for job in snapshots:
+                        f.write(json.dumps(_journal_record(job, include_params=True), ensure_ascii=False) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.journal_path)
+                self._journal_lines = len(snapshots)
+        except Exception as e:
+            logger.error("压缩任务日志失败: %s", e)
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        日志文件的跨进程排他锁(无fcntl时为空操作)
+        """
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.journal_path + '.lock', os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def _process_alive(pid):
+    """
+    检查进程是否存活(同一主机)
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 没有权限发送信号,说明进程存在
+        return True
+    return True
+
+
+def _now():
+    """
+    当前时间字符串
+    """
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _copy_job(job):
+    """
+    复制任务快照,避免外部修改内部状态
+    """
+    snapshot = dict(job)
+    snapshot['params'] = dict(job.get('params') or {})
+    if job.get('result'):
+        snapshot['result'] = dict(job['result'])
+    return snapshot
+
+
+def _journal_record(job, include_params=False):
+    """
+    生成写入日志的任务记录(去除markdown正文)
+
+    参数:
+        job (dict): 任务快照
+        include_params (bool): 是否保留任务参数;已结束任务的参数中不保留网页正文
+    """
+    record = _copy_job(job)
+    if not include_params:
+        record.pop('params', None)
+    elif record['status'] in FINISHED_STATUSES:
+        record['params'].pop('content', None)
+    if record.get('result'):
+        record['result'].pop('markdown', None)
+    return record
@@ -0,0 +1,377 @@
+"""
+PDSA数字分身智能体 - 本地文档检索
+
+功能说明:
+1. 按Markdown标题把docs目录下的文档切分为段落(标题路径 + 正文)
+2. 中文按相邻两字切分(bigram),英文/数字按单词切分,建立倒排索引,使用BM25打分
+3. 新文档写入后按文件增量更新索引;定期检查目录变化,其他进程生成的文档也能被索引
+4. 问题与某个FAQ标题(以问号结尾的标题)高度相似时,可直接给出该标题下的答案
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 标题中的词在段落中的权重(相当于出现次数)
+HEADING_WEIGHT = 3
+
+# 单个段落的最大字符数,超出时按空行拆分
+MAX_PASSAGE_CHARS = 1500
+
+# 不参与索引的文件(docs目录说明文档)
+EXCLUDED_FILES = {'README.md'}
+
+_HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+_FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+_TOKEN_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9][a-z0-9_.+-]*')
+_QUESTION_PATTERN = re.compile(r'[?？]\s*$')
+
+
+def tokenize(text):
+    """
+    中文按bigram切分(单个汉字保留为unigram),英文和数字按单词切分并转为小写
+
+    参数:
+        text (str): 文本
+
+    返回:
+        list: 词列表
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer((text or '').lower()):
+        word = match.group()
+        if word[0] >= '\u3400':
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.rstrip('.-'))
+    return tokens
+
+
+def similarity(a, b):
+    """
+    两段文本词集合的Dice系数(0~1),用于判断问题与FAQ标题是否为同一个问题
+    """
+    set_a, set_b = set(tokenize(a)), set(tokenize(b))
+    if not set_a or not set_b:
+        return 0.0
+    return 2 * len(set_a & set_b) / (len(set_a) + len(set_b))
+
+
+def split_passages(markdown):
+    """
+    按标题切分Markdown
+
+    参数:
+        markdown (str): Markdown文本
+
+    返回:
+        list: [{"headings": [各级标题], "text": 正文}],代码块中的#不视为标题
+    """
+    passages = []
+    headings = []
+    lines = []
+    in_fence = False
+
+    def flush():
+        text = '\n'.join(lines).strip()
+        lines.clear()
+        if not text:
+            return
+        for part in _split_long(text):
+            passages.append({'headings': list(headings), 'text': part})
+
+    for line in markdown.splitlines():
+        if _FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_PATTERN.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            del headings[level - 1:]
+            headings.extend([''] * (level - 1 - len(headings)))
+            headings.append(match.group(2).strip())
+        else:
+            lines.append(line)
+    flush()
+    return passages
+
+
+def _split_long(text):
+    """
+    超长正文按空行拆分为不超过MAX_PASSAGE_CHARS的片段
+    """
+    if len(text) <= MAX_PASSAGE_CHARS:
+        return [text]
+    parts = []
+    current = ''
+    for block in re.split(r'\n\s*\n', text):
+        if current and len(current) + len(block) + 2 > MAX_PASSAGE_CHARS:
+            parts.append(current)
+            current = block
+        else:
+            current = f"{current}\n\n{block}" if current else block
+    if current:
+        parts.append(current)
+    return parts
+
+
+class DocSearchIndex:
+    """
+    docs目录的BM25倒排索引
+
+    参数:
+        docs_dir (str): 文档目录
+        refresh_interval (float): 检查目录变化的最短间隔(秒),0表示不检查
+
+    说明:
+        首次查询时建立索引;之后按文件修改时间增量更新。
+        读取和分词在锁外进行,只在替换索引数据时短暂持有锁,更新期间检索不会被阻塞
+    """
+
+    def __init__(self, docs_dir, refresh_interval=30.0):
+        self.docs_dir = docs_dir
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._passages = {}
+        self._passage_terms = {}
+        self._postings = {}
+        self._files = {}
+        self._next_id = 0
+        self._total_length = 0
+        self._loaded = False
+        self._checked = 0.0
+        self._queries = 0
+
+    # ----------------------------------------
+    # 建立/更新索引
+    # ----------------------------------------
+
+    def refresh(self, force=False):
+        """
+        按文件修改时间同步索引(新增/修改/删除的文件)
+
+        参数:
+            force (bool): 忽略检查间隔
+
+        返回:
+            int: 重新索引或移除的文件数
+        """
+        if not self._refresh_due(force):
+            return 0
+        # 同一时间只有一个线程扫描目录;已有索引时其他线程不等待,直接使用现有索引
+        if not self._refresh_lock.acquire(blocking=force or not self._loaded):
+            return 0
+        try:
+            if not self._refresh_due(force):
+                return 0
+            with self._lock:
+                self._checked = time.monotonic()
+                known = {name: entry['mtime'] for name, entry in self._files.items()}
+
+            current = {}
+            try:
+                names = os.listdir(self.docs_dir)
+            except OSError:
+                names = []
+            for name in names:
+                if not name.endswith('.md') or name in EXCLUDED_FILES:
+                    continue
+                try:
+                    current[name] = os.path.getmtime(os.path.join(self.docs_dir, name))
+                except OSError:
+                    continue
+
+            # 在锁外读取和分词变化的文件
+            prepared = {}
+            for name, mtime in current.items():
+                if known.get(name) != mtime:
+                    prepared[name] = self._prepare(os.path.join(self.docs_dir, name))
+            removed = [name for name in known if name not in current]
+
+            with self._lock:
+                for name in removed:
+                    self._remove_file(name)
+                for name, entry in prepared.items():
+                    if entry is not None:
+                        self._install(name, *entry)
+                self._loaded = True
+            return len(removed) + len(prepared)
+        finally:
+            self._refresh_lock.release()
+
+    def add_file(self, path):
+        """
+        索引单个文档(已索引的同名文件先移除)
+
+        参数:
+            path (str): 文档路径
+        """
+        name = os.path.basename(path)
+        if not name.endswith('.md') or name in EXCLUDED_FILES:
+            return
+        entry = self._prepare(path)
+        if entry is None:
+            return
+        with self._lock:
+            self._install(name, *entry)
+
+    def _refresh_due(self, force):
+        with self._lock:
+            return force or not self._loaded or bool(
+                self.refresh_interval and time.monotonic() - self._checked >= self.refresh_interval)
+
+    def _prepare(self, path):
+        """
+        读取文档并分词(不持有锁)
+
+        返回:
+            tuple|None: (修改时间, [(段落信息, 词频Counter)]),读取失败时返回None
+        """
+        try:
+            mtime = os.path.getmtime(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                markdown = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning("读取文档失败,跳过索引 %s: %s", path, e)
+            return None
+
+        prepared = []
+        for passage in split_passages(markdown):
+            heading = ' '.join(passage['headings'])
+            counts = Counter(tokenize(passage['text']))
+            for token in tokenize(heading):
+                counts[token] += HEADING_WEIGHT
+            if not counts:
+                continue
+            title = passage['headings'][-1] if passage['headings'] else ''
+            prepared.append(({
+                'headings': [h for h in passage['headings'] if h],
+                'text': passage['text'],
+                'question': bool(_QUESTION_PATTERN.search(title)),
+                'length': sum(counts.values())
+            }, counts))
+        return mtime, prepared
+
+    def _install(self, name, mtime, prepared):
+        """
+        用预处理好的段落替换同名文件的索引(调用方需持有锁)
+        """
+        self._remove_file(name)
+        ids = []
+        for info, counts in prepared:
+            passage_id = self._next_id
+            self._next_id += 1
+            self._passages[passage_id] = dict(info, file=name)
+            self._passage_terms[passage_id] = tuple(counts)
+            for token, count in counts.items():
+                self._postings.setdefault(token, {})[passage_id] = count
+            self._total_length += info['length']
+            ids.append(passage_id)
+        self._files[name] = {'mtime': mtime, 'ids': ids}
+        logger.debug("已索引文档 %s: %d个段落", name, len(ids))
+
+    def _remove_file(self, name):
+        """
+        移除文件的索引(调用方需持有锁),只访问这些段落包含的词的倒排表
+        """
+        entry = self._files.pop(name, None)
+        if entry is None:
+            return
+        for passage_id in entry['ids']:
+            passage = self._passages.pop(passage_id)
+            self._total_length -= passage['length']
+            for token in self._passage_terms.pop(passage_id, ()):
+                postings = self._postings.get(token)
+                if postings is None:
+                    continue
+                postings.pop(passage_id, None)
+                if not postings:
+                    del self._postings[token]
+
+    # ----------------------------------------
+    # 查询
+    # ----------------------------------------
+
+    def search(self, query, limit=5):
+        """
+        BM25检索
+
+        参数:
+            query (str): 查询文本
+            limit (int): 返回的段落数
+
+        返回:
+            list: [{"file", "headings", "text", "question", "score", "coverage"}],按得分倒序,
+                  coverage为段落包含的查询词比例(0~1)
+        """
+        self.refresh()
+        terms = set(tokenize(query))
+        with self._lock:
+            self._queries += 1
+            total = len(self._passages)
+            if not terms or not total:
+                return []
+            avg_length = self._total_length / total
+            scores = {}
+            matched = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for passage_id, tf in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._passages[passage_id]['length'] / avg_length)
+                    scores[passage_id] = scores.get(passage_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    matched[passage_id] += 1
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [dict(self._passages[passage_id], score=round(score, 4),
+                         coverage=round(matched[passage_id] / len(terms), 3))
+                    for passage_id, score in ranked]
+
+    def match_faq(self, query, min_similarity=0.8, candidates=5):
+        """
+        查找与问题高度相似的FAQ段落
+
+        参数:
+            query (str): 用户问题
+            min_similarity (float): 问题与FAQ标题的最低相似度(0~1)
+            candidates (int): 参与比较的BM25候选段落数
+
+        返回:
+            dict|None: 命中的段落(附带similarity),没有足够相似的FAQ时返回None
+        """
+        best = None
+        for hit in self.search(query, candidates):
+            if not hit['question']:
+                continue
+            score = similarity(query, hit['headings'][-1])
+            if score >= min_similarity and (best is None or score > best['similarity']):
+                best = dict(hit, similarity=round(score, 3))
+        return best
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._files),
+                'passages': len(self._passages),
+                'questions': sum(1 for passage in self._passages.values() if passage['question']),
+                'terms': len(self._postings),
+                'queries': self._queries
+            }
@@ -0,0 +1,391 @@
+"""
+PDSA数字分身智能体 - 网页正文提取模块
+
+功能说明:
+1. 可插拔的HTML正文提取引擎: lxml(高性能) / bs4(原有BeautifulSoup逻辑)
+2. lxml引擎移除导航、页脚、侧边栏、Cookie提示等模板内容
+3. 自动识别<main>/<article>主内容区域
+4. 保留标题层级、列表、表格、代码块等结构,输出接近Markdown的纯文本
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import logging
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    LXML_AVAILABLE = True
+except ImportError:  # lxml为可选依赖,未安装时降级为BeautifulSoup
+    LXML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 提取逻辑版本号,修改提取规则时递增,使网页缓存中的旧提取结果失效
+EXTRACT_VERSION = '3'
+
+# 整体移除的标签(不含正文)
+DROP_TAGS = ('script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe')
+
+# 通常为模板内容的标签(包含正文时保留,如整页包在<form>中的页面)
+BOILERPLATE_TAGS = ('form', 'button', 'select', 'nav', 'footer', 'aside', 'dialog')
+
+# class/id命中以下关键词的元素视为模板内容
+BOILERPLATE_PATTERN = re.compile(
+    r'(^|[\s_-])(nav|navbar|menu|footer|sidebar|side-bar|breadcrumbs?|cookies?|consent|'
+    r'gdpr|advert|ads|share|social|related|comments?|popup|modal|subscribe|newsletter|'
+    r'toolbar|skip-link)([\s_-]|$)',
+    re.IGNORECASE
+)
+
+# 模板内容的ARIA角色
+BOILERPLATE_ROLES = ('navigation', 'banner', 'contentinfo', 'complementary', 'search', 'dialog', 'alert')
+
+# 即使class命中关键词也不移除的结构性标签
+PROTECTED_TAGS = ('html', 'body', 'main', 'article')
+
+# 包含以下元素的节点视为正文容器,不作为模板内容移除
+CONTENT_MARKERS_XPATH = './/h1 | .//main | .//article | .//*[@role="main"]'
+
+# 模板内容最多占全文的比例,超过时视为正文容器(如 class="layout has-sidebar" 的页面外层)
+BOILERPLATE_MAX_RATIO = 0.5
+
+# lxml提取结果少于该字符数时与bs4结果比较,取较长者
+MIN_EXTRACT_CHARS = 200
+
+# 块级标签: 前后换行
+BLOCK_TAGS = frozenset((
+    'address', 'article', 'aside', 'blockquote', 'body', 'dd', 'details', 'dialog', 'div', 'dl', 'dt',
+    'fieldset', 'figcaption', 'figure', 'footer', 'form', 'header', 'hr', 'html', 'main', 'nav', 'p',
+    'section', 'summary', 'table', 'tbody', 'thead', 'tfoot', 'caption'
+))
+
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+LIST_TAGS = ('ul', 'ol')
+
+# 主内容区域至少占全文的比例,低于该比例时使用整个<body>
+MAIN_CONTENT_MIN_RATIO = 0.25
+
+XML_DECLARATION_PATTERN = re.compile(r'^\s*<\?xml[^>]*\?>', re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def available_engines():
+    """
+    当前环境可用的提取引擎
+
+    返回:
+        list: 引擎名称列表
+    """
+    return ['lxml', 'bs4'] if LXML_AVAILABLE else ['bs4']
+
+
+def resolve_engine(engine='auto'):
+    """
+    解析实际使用的提取引擎
+
+    参数:
+        engine (str): auto/lxml/bs4,auto时优先使用lxml
+
+    返回:
+        str: 实际引擎名称(lxml不可用时降级为bs4)
+    """
+    if engine in ('auto', 'lxml') and LXML_AVAILABLE:
+        return 'lxml'
+    return 'bs4'
+
+
+def extract_version(engine='auto'):
+    """
+    提取结果版本标识(引擎 + 规则版本),用于网页缓存失效判断
+
+    参数:
+        engine (str): 引擎配置
+
+    返回:
+        str: 版本标识
+    """
+    return f"{resolve_engine(engine)}-{EXTRACT_VERSION}"
+
+
+def extract_text(html, engine='auto'):
+    """
+    从HTML中提取正文文本
+
+    参数:
+        html (str): 网页HTML
+        engine (str): auto/lxml/bs4
+
+    返回:
+        str: 提取的文本内容
+
+    说明:
+        lxml引擎解析失败,或提取结果为空/过短(可能误删了正文)时降级为bs4引擎
+    """
+    if resolve_engine(engine) == 'lxml':
+        try:
+            text = extract_text_lxml(html)
+        except Exception as e:
+            logger.warning("lxml正文提取失败,降级使用BeautifulSoup: %s", e)
+        else:
+            if len(text) >= MIN_EXTRACT_CHARS:
+                return text
+            fallback = extract_text_bs4(html)
+            if len(fallback) > len(text):
+                logger.debug("lxml提取结果过短(%d字符),使用BeautifulSoup结果(%d字符)", len(text), len(fallback))
+                return fallback
+            return text
+    return extract_text_bs4(html)
+
+
+def looks_like_html(text):
+    """
+    粗略判断文本是否为HTML(用于管理员直接粘贴的内容)
+
+    参数:
+        text (str): 文本内容
+
+    返回:
+        bool: 是否包含HTML文档结构标签
+    """
+    head = text[:2048].lower()
+    return any(marker in head for marker in ('<html', '<body', '<!doctype html', '<div', '<article', '<p>'))
+
+
+# ========================================
+# bs4引擎(原有逻辑)
+# ========================================
+
+def extract_text_bs4(html):
+    """
+    使用BeautifulSoup提取文本(与原fetch_web_content逻辑一致)
+
+    参数:
+        html (str): 网页HTML
+
+    返回:
+        str: 清理空白后的文本内容
+    """
+    # 解析HTML
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # 移除script和style标签
+    for script in soup(["script", "style"]):
+        script.decompose()
+
+    # 提取文本内容
+    text = soup.get_text()
+
+    # 清理空白字符
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+# ========================================
+# lxml引擎
+# ========================================
+
+def extract_text_lxml(html):
+    """
+    使用lxml提取正文,去除模板内容并保留结构
+
+    参数:
+        html (str): 网页HTML
+
+    返回:
+        str: 结构化文本(标题以#开头,列表项以-开头,表格单元格以|分隔)
+    """
+    # lxml不接受带编码声明的unicode字符串
+    html = XML_DECLARATION_PATTERN.sub('', html, count=1)
+    if not html.strip():
+        return ''
+
+    doc = lxml.html.document_fromstring(html)
+    _drop_boilerplate(doc)
+
+    root = _select_main_content(doc)
+    lines = []
+    _render_block(root, lines, 0)
+
+    # 合并连续空行
+    output = []
+    for line in lines:
+        if line or (output and output[-1]):
+            output.append(line)
+    return '\n'.join(output).strip()
+
+
+def _drop_boilerplate(doc):
+    """
+    移除脚本、导航、页脚、Cookie提示等非正文元素
+
+    说明:
+        只移除不含正文的元素: 包含<h1>/<main>/<article>或超过全文一半文本的元素
+        即使class/标签命中模板规则也保留
+    """
+    for element in doc.xpath('|'.join(f'//{tag}' for tag in DROP_TAGS)):
+        element.drop_tree()
+
+    body = doc.find('body')
+    body_length = len(_inline_text(body if body is not None else doc))
+
+    def drop(element):
+        if element.getparent() is None or _holds_content(element, body_length):
+            return
+        element.drop_tree()
+
+    for element in doc.xpath('|'.join(f'//{tag}' for tag in BOILERPLATE_TAGS)):
+        drop(element)
+
+    for element in doc.xpath('//*[@class or @id or @role or @hidden or @aria-hidden]'):
+        if not isinstance(element.tag, str) or element.tag in PROTECTED_TAGS:
+            continue
+        role = (element.get('role') or '').lower()
+        marker = f"{element.get('class', '')} {element.get('id', '')}"
+        if (role in BOILERPLATE_ROLES
+                or element.get('hidden') is not None
+                or element.get('aria-hidden') == 'true'
+                or BOILERPLATE_PATTERN.search(marker)):
+            drop(element)
+
+    # 页面级<header>通常是站点导航,文章内的<header>保留
+    for element in doc.xpath('//header[not(ancestor::article) and not(ancestor::main)]'):
+        drop(element)
+
+
+def _holds_content(element, body_length):
+    """
+    元素是否为正文容器(包含页面标题/主内容区域,或占全文大部分文本)
+    """
+    if element.xpath(CONTENT_MARKERS_XPATH):
+        return True
+    return body_length > 0 and len(_inline_text(element)) > body_length * BOILERPLATE_MAX_RATIO
+
+
+def _select_main_content(doc):
+    """
+    选择主内容区域: 文本最多的<main>/<article>/[role=main],占比过低时使用<body>
+    """
+    body = doc.find('body')
+    if body is None:
+        body = doc
+    body_length = len(_inline_text(body))
+
+    candidates = doc.xpath('//main | //article | //*[@role="main"]')
+    if not candidates or body_length == 0:
+        return body
+
+    best = max(candidates, key=lambda element: len(_inline_text(element)))
+    if len(_inline_text(best)) >= body_length * MAIN_CONTENT_MIN_RATIO:
+        return best
+    return body
+
+
+def _inline_text(element):
+    """
+    元素的全部文本,空白折叠为单个空格
+    """
+    return WHITESPACE_PATTERN.sub(' ', element.text_content()).strip()
+
+
+def _render_block(element, lines, depth):
+    """
+    渲染块级元素: 内联内容合并为一行,遇到块级子元素时换行递归
+    """
+    buffer = [element.text or '']
+
+    for child in element:
+        tag = child.tag if isinstance(child.tag, str) else None
+        if tag is None:
+            # 注释等节点只保留尾随文本
+            buffer.append(child.tail or '')
+            continue
+
+        if tag == 'br':
+            _flush(buffer, lines)
+            buffer = [child.tail or '']
+        elif tag in HEADING_TAGS or tag in LIST_TAGS or tag in BLOCK_TAGS or tag in ('pre', 'li', 'tr'):
+            _flush(buffer, lines)
+            _render_element(child, lines, depth)
+            buffer = [child.tail or '']
+        else:
+            buffer.append(_inline_content(child))
+            buffer.append(child.tail or '')
+
+    _flush(buffer, lines)
+
+
+def _render_element(element, lines, depth):
+    """
+    按标签类型渲染单个块级元素
+    """
+    tag = element.tag
+    if tag in HEADING_TAGS:
+        text = _inline_text(element)
+        if text:
+            lines.append('')
+            lines.append('#' * HEADING_TAGS[tag] + ' ' + text)
+    elif tag in LIST_TAGS:
+        for index, item in enumerate(element.iterchildren('li'), start=1):
+            _render_list_item(item, lines, depth, f"{index}." if tag == 'ol' else '-')
+    elif tag == 'li':
+        _render_list_item(element, lines, depth, '-')
+    elif tag == 'pre':
+        text = element.text_content().strip('\n')
+        if text.strip():
+            lines.append('```')
+            lines.extend(text.splitlines())
+            lines.append('```')
+    elif tag == 'tr':
+        cells = [_inline_text(cell) for cell in element.iterchildren('td', 'th')]
+        if any(cells):
+            lines.append('| ' + ' | '.join(cells) + ' |')
+    elif tag == 'hr':
+        lines.append('')
+    else:
+        if tag in ('p', 'blockquote', 'table', 'section', 'article'):
+            lines.append('')
+        _render_block(element, lines, depth)
+
+
+def _render_list_item(item, lines, depth, bullet):
+    """
+    渲染列表项,嵌套列表按层级缩进
+    """
+    buffer = [item.text or '']
+    nested = []
+    for child in item:
+        if not isinstance(child.tag, str):
+            buffer.append(child.tail or '')
+        elif child.tag in LIST_TAGS:
+            nested.append(child)
+            buffer.append(child.tail or '')
+        else:
+            buffer.append(_inline_content(child))
+            buffer.append(child.tail or '')
+
+    text = WHITESPACE_PATTERN.sub(' ', ''.join(buffer)).strip()
+    if text:
+        lines.append('  ' * depth + bullet + ' ' + text)
+    for child in nested:
+        _render_element(child, lines, depth + 1)
+
+
+def _inline_content(element):
+    """
+    内联元素的文本(不含尾随文本)
+    """
+    return element.text_content() if element.tag != 'img' else (element.get('alt') or '')
+
+
+def _flush(buffer, lines):
+    """
+    将累积的内联文本输出为一行
+    """
+    text = WHITESPACE_PATTERN.sub(' ', ''.join(buffer)).strip()
+    if text:
+        lines.append(text)
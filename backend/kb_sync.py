@@ -0,0 +1,557 @@
+"""
+PDSA数字分身智能体 - 知识库同步
+
+功能说明:
+1. 记录docs目录下每个文档的内容哈希和同步状态,只上传新增/修改的文档,删除已移除的文档
+2. 文件大小和修改时间未变化时不重新计算哈希,全量扫描数百个文档的开销很小
+3. 变化的文档按批次处理,批次内并发上传,失败的上传按指数退避重试;每批结束后保存状态
+4. 文档写入后延迟一段时间再同步,短时间内生成的多个文档合并为一次同步
+5. 上传器为可替换接口: 内置本地目录和HTTP两种实现,可离线测试,也可接入其他知识库服务
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import abc
+import hashlib
+import importlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+
+import requests
+
+from resilience import UpstreamError
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl,跳过跨进程同步锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 不同步的文件(docs目录说明文档)
+EXCLUDED_FILES = {'README.md'}
+
+
+# ========================================
+# 上传器
+# ========================================
+
+class Uploader(abc.ABC):
+    """
+    知识库上传器接口
+
+    说明:
+        upload/delete失败时抛出UpstreamError(retryable表示是否可以重试),其他异常均视为可重试;
+        实现须是线程安全的(同一批次的文档并发上传);
+        upload/delete为抽象方法,没有全部实现的子类在创建实例时即抛出TypeError
+    """
+
+    name = 'base'
+
+    @abc.abstractmethod
+    def upload(self, file_name, content, metadata):
+        """
+        上传(或覆盖)一个文档
+
+        参数:
+            file_name (str): 文档文件名
+            content (bytes): 文档内容
+            metadata (dict): {"contentHash": "...", "size": 1234}
+
+        返回:
+            str: 远端文档ID(删除时传回)
+        """
+
+    @abc.abstractmethod
+    def delete(self, file_name, remote_id):
+        """
+        删除远端文档(文档不存在时视为成功)
+        """
+
+
+class LocalDirUploader(Uploader):
+    """
+    本地目录上传器: 把文档复制到目标目录(离线测试或挂载的共享目录)
+
+    参数:
+        target_dir (str): 目标目录
+    """
+
+    name = 'local'
+
+    def __init__(self, target_dir):
+        self.target_dir = target_dir
+        os.makedirs(target_dir, exist_ok=True)
+
+    def upload(self, file_name, content, metadata):
+        path = os.path.join(self.target_dir, file_name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return file_name
+
+    def delete(self, file_name, remote_id):
+        try:
+            os.remove(os.path.join(self.target_dir, remote_id or file_name))
+        except FileNotFoundError:
+            pass
+
+
+class HttpUploader(Uploader):
+    """
+    HTTP上传器: PUT {endpoint}/{文件名} 上传,DELETE {endpoint}/{远端ID} 删除
+
+    参数:
+        endpoint (str): 文档集合地址
+        token (str): Bearer令牌(可选)
+        timeout (float): 请求超时(秒)
+
+    说明:
+        响应JSON中的id字段作为远端文档ID(没有时使用文件名);
+        429和5xx视为可重试错误,其他4xx不重试
+    """
+
+    name = 'http'
+
+    def __init__(self, endpoint, token=None, timeout=30.0):
+        self.endpoint = endpoint.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        if token:
+            self.session.headers['Authorization'] = f"Bearer {token}"
+
+    def upload(self, file_name, content, metadata):
+        response = self.session.put(
+            f"{self.endpoint}/{quote(file_name)}",
+            data=content,
+            headers={
+                'Content-Type': 'text/markdown; charset=utf-8',
+                'X-Content-Hash': metadata['contentHash']
+            },
+            timeout=self.timeout
+        )
+        self._check(response)
+        try:
+            return str(response.json().get('id') or file_name)
+        except ValueError:
+            return file_name
+
+    def delete(self, file_name, remote_id):
+        response = self.session.delete(f"{self.endpoint}/{quote(remote_id or file_name)}", timeout=self.timeout)
+        if response.status_code != 404:
+            self._check(response)
+
+    def _check(self, response):
+        if response.status_code >= 400:
+            raise UpstreamError(
+                f"知识库接口返回{response.status_code}: {response.text[:200]}",
+                retryable=response.status_code == 429 or response.status_code >= 500
+            )
+
+
+def create_uploader(kind, **options):
+    """
+    按配置创建上传器
+
+    参数:
+        kind (str): local / http / "模块名:类名"(自定义上传器,构造参数为options)
+        **options: local: target_dir; http: endpoint, token, timeout
+
+    返回:
+        Uploader: 上传器实例
+
+    异常:
+        TypeError: 自定义上传器不是Uploader的子类
+    """
+    if kind == 'local':
+        return LocalDirUploader(options['target_dir'])
+    if kind == 'http':
+        if not options.get('endpoint'):
+            raise ValueError("HTTP上传器需要配置endpoint")
+        return HttpUploader(options['endpoint'], options.get('token'), options.get('timeout', 30.0))
+    module_name, _, class_name = kind.partition(':')
+    if not class_name:
+        raise ValueError(f"未知的上传器: {kind}")
+    uploader_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(uploader_class, type) and issubclass(uploader_class, Uploader)):
+        raise TypeError(f"自定义上传器须继承kb_sync.Uploader: {kind}")
+    return uploader_class(**options)
+
+
+# ========================================
+# 同步
+# ========================================
+
+def file_hash(path):
+    """
+    文件内容的SHA256
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class KnowledgeBaseSync:
+    """
+    docs目录到知识库的增量同步
+
+    参数:
+        docs_dir (str): 文档目录
+        state_path (str): 同步状态文件路径
+        uploader (Uploader): 上传器
+        batch_size (int): 每批处理的文档数
+        workers (int): 批次内的并发上传数
+        max_attempts (int): 单个文档的最多尝试次数(含首次)
+        backoff_base (float): 重试退避基数(秒)
+        debounce (float): 文档写入后等待多久再同步(秒),期间的新文档合并到同一次同步
+
+    状态文件格式:
+        {"files": {"<文件名>": {"hash", "size", "mtime", "syncedHash", "remoteId",
+                               "status": "pending|synced|failed|deleted", "error", "attempts", "syncedAt"}}}
+
+    说明:
+        多进程部署时通过文件锁保证同一时间只有一个进程在同步,同步前重新读取状态文件
+    """
+
+    def __init__(self, docs_dir, state_path, uploader, batch_size=20, workers=4,
+                 max_attempts=3, backoff_base=1.0, debounce=10.0):
+        self.docs_dir = docs_dir
+        self.state_path = state_path
+        self.uploader = uploader
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._timer = None
+        self._files = self._load()
+        self._last_run = None
+        self._totals = {'uploaded': 0, 'deleted': 0, 'failed': 0, 'retries': 0}
+
+    # ----------------------------------------
+    # 对外接口
+    # ----------------------------------------
+
+    def schedule(self, file_path=None):
+        """
+        文档更新回调: 延迟debounce秒后在后台同步(等待期间的多次调用合并为一次)
+
+        参数:
+            file_path (str): 更新的文档路径(仅用于日志)
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self._run_scheduled)
+            self._timer.daemon = True
+            self._timer.start()
+        if file_path:
+            logger.debug("文档%s已变化,%.0f秒后同步知识库", os.path.basename(file_path), self.debounce)
+
+    def sync(self, force=False):
+        """
+        扫描docs目录并同步变化的文档
+
+        参数:
+            force (bool): 忽略已同步的哈希,重新上传所有文档
+
+        返回:
+            dict: 本次同步结果 {"scanned", "uploaded", "deleted", "failed", "unchanged", "batches", "seconds"}
+                  已有同步在进行中时返回 {"skipped": true}
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return {'skipped': True}
+        lock_fd = self._acquire_file_lock()
+        if lock_fd is False:
+            self._sync_lock.release()
+            return {'skipped': True}
+        started = time.monotonic()
+        try:
+            with self._lock:
+                self._files = self._load()
+            scanned = self._scan()
+            with self._lock:
+                uploads = [name for name, entry in self._files.items()
+                           if entry['status'] != 'deleted' and (force or entry['hash'] != entry.get('syncedHash'))]
+                deletions = [name for name, entry in self._files.items() if entry['status'] == 'deleted']
+            changes = [('upload', name) for name in sorted(uploads)] + [('delete', name) for name in sorted(deletions)]
+
+            result = {'scanned': scanned, 'uploaded': 0, 'deleted': 0, 'failed': 0,
+                      'unchanged': scanned - len(uploads), 'batches': 0}
+            if changes:
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='kb-sync') as pool:
+                    for i in range(0, len(changes), self.batch_size):
+                        batch = changes[i:i + self.batch_size]
+                        for outcome in pool.map(lambda change: self._apply(*change), batch):
+                            result[outcome] += 1
+                        result['batches'] += 1
+                        # 每批结束后保存状态,中断后只需处理剩余的文档
+                        self._save()
+            else:
+                self._save()
+
+            result['seconds'] = round(time.monotonic() - started, 3)
+            with self._lock:
+                for key in ('uploaded', 'deleted', 'failed'):
+                    self._totals[key] += result[key]
+                self._last_run = dict(result, finishedAt=_now())
+            if changes:
+                logger.info("知识库同步完成: 上传%d, 删除%d, 失败%d, 未变化%d",
+                            result['uploaded'], result['deleted'], result['failed'], result['unchanged'])
+            return result
+        finally:
+            self._release_file_lock(lock_fd)
+            self._sync_lock.release()
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for entry in self._files.values():
+                counts[entry['status']] = counts.get(entry['status'], 0) + 1
+            return {
+                'uploader': self.uploader.name,
+                'files': sum(1 for entry in self._files.values() if entry['status'] != 'deleted'),
+                'statusCounts': counts,
+                'pending': sum(1 for entry in self._files.values()
+                               if entry['status'] == 'deleted' or entry['hash'] != entry.get('syncedHash')),
+                'syncing': self._sync_lock.locked(),
+                'scheduled': self._timer is not None and self._timer.is_alive(),
+                'lastRun': self._last_run,
+                'totals': dict(self._totals)
+            }
+
+    def files(self, status=None, limit=200):
+        """
+        文档同步状态列表
+
+        参数:
+            status (str): 只返回该状态的文档(可选)
+            limit (int): 最多返回条数
+
+        返回:
+            list: [{"fileName", "status", "syncedAt", "attempts", "error"}],按文件名排序
+        """
+        with self._lock:
+            items = [
+                {
+                    'fileName': name,
+                    'status': entry['status'],
+                    'syncedAt': entry.get('syncedAt'),
+                    'attempts': entry.get('attempts', 0),
+                    'error': entry.get('error')
+                }
+                for name, entry in sorted(self._files.items())
+                if status is None or entry['status'] == status
+            ]
+        return items[:limit]
+
+    def close(self):
+        """
+        取消等待中的延迟同步(进程退出前调用,未同步的文档由下次同步处理)
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    # ----------------------------------------
+    # 内部方法
+    # ----------------------------------------
+
+    def _run_scheduled(self):
+        with self._lock:
+            self._timer = None
+        try:
+            result = self.sync()
+            if result.get('skipped'):
+                # 其他同步正在进行,稍后再同步本次的变化
+                self.schedule()
+        except Exception as e:
+            logger.error("知识库同步失败: %s", e)
+
+    def _scan(self):
+        """
+        对比docs目录和状态记录: 大小或修改时间变化的文件重新计算哈希,已删除的文件标记为deleted
+
+        返回:
+            int: 扫描到的文档数
+        """
+        current = {}
+        try:
+            names = os.listdir(self.docs_dir)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith('.md') or name in EXCLUDED_FILES:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.docs_dir, name))
+            except OSError:
+                continue
+            if not stat.st_size:
+                # 空文件为生成中文档占用的文件名,写入内容后再同步
+                continue
+            current[name] = (stat.st_size, stat.st_mtime)
+
+        with self._lock:
+            known = {name: dict(entry) for name, entry in self._files.items()}
+
+        updates = {}
+        for name, (size, mtime) in current.items():
+            entry = known.get(name)
+            if entry and entry['status'] != 'deleted' and entry['size'] == size and entry['mtime'] == mtime:
+                continue
+            try:
+                digest = file_hash(os.path.join(self.docs_dir, name))
+            except OSError:
+                continue
+            entry = entry or {'syncedHash': None, 'remoteId': None, 'attempts': 0, 'syncedAt': None}
+            entry.update(hash=digest, size=size, mtime=mtime)
+            entry['status'] = 'synced' if digest == entry.get('syncedHash') else 'pending'
+            entry['error'] = None
+            updates[name] = entry
+
+        with self._lock:
+            self._files.update(updates)
+            for name, entry in self._files.items():
+                if name not in current and entry['status'] != 'deleted':
+                    if entry.get('syncedHash') is None:
+                        entry['status'] = 'removed'
+                    else:
+                        entry['status'] = 'deleted'
+            # 从未上传过的已删除文档直接移除记录
+            for name in [name for name, entry in self._files.items() if entry['status'] == 'removed']:
+                del self._files[name]
+        return len(current)
+
+    def _apply(self, action, name):
+        """
+        上传或删除单个文档(带重试)
+
+        返回:
+            str: uploaded / deleted / failed
+        """
+        with self._lock:
+            entry = dict(self._files[name])
+        try:
+            if action == 'upload':
+                with open(os.path.join(self.docs_dir, name), 'rb') as f:
+                    content = f.read()
+                digest = hashlib.sha256(content).hexdigest()
+                remote_id, attempts = self._with_retry(
+                    lambda: self.uploader.upload(name, content, {'contentHash': digest, 'size': len(content)}))
+                fields = {'status': 'synced', 'syncedHash': digest, 'hash': digest, 'remoteId': remote_id}
+                outcome = 'uploaded'
+            else:
+                _, attempts = self._with_retry(lambda: self.uploader.delete(name, entry.get('remoteId')))
+                fields = None
+                outcome = 'deleted'
+        except FileNotFoundError:
+            # 同步期间文件被删除,下次同步时处理
+            return 'failed'
+        except Exception as e:
+            logger.warning("知识库同步失败(%s %s): %s", action, name, e)
+            with self._lock:
+                if name in self._files:
+                    self._files[name].update(error=str(e), attempts=self._files[name].get('attempts', 0) + 1)
+                    if self._files[name]['status'] != 'deleted':
+                        self._files[name]['status'] = 'failed'
+            return 'failed'
+
+        with self._lock:
+            if fields is None:
+                self._files.pop(name, None)
+            elif name in self._files:
+                self._files[name].update(fields, error=None, attempts=attempts, syncedAt=_now())
+        return outcome
+
+    def _with_retry(self, operation):
+        """
+        执行操作,可重试的错误按带随机抖动的指数退避重试
+
+        返回:
+            tuple: (操作返回值, 尝试次数)
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return operation(), attempt
+            except UpstreamError as e:
+                if not e.retryable or attempt >= self.max_attempts:
+                    raise
+            except Exception:
+                if attempt >= self.max_attempts:
+                    raise
+            with self._lock:
+                self._totals['retries'] += 1
+            time.sleep(random.uniform(0, self.backoff_base * (2 ** (attempt - 1))))
+
+    def _load(self):
+        """
+        读取状态文件,不存在或损坏时返回空状态
+        """
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('files', {})
+        except Exception as e:
+            logger.error("读取知识库同步状态失败: %s", e)
+            return {}
+
+    def _save(self):
+        """
+        原子写入状态文件
+        """
+        with self._lock:
+            state = {'files': self._files}
+            tmp_path = f"{self.state_path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False)
+                os.replace(tmp_path, self.state_path)
+            except Exception as e:
+                logger.error("写入知识库同步状态失败: %s", e)
+
+    def _acquire_file_lock(self):
+        """
+        非阻塞获取跨进程同步锁
+
+        返回:
+            int|None|False: 锁文件描述符;无fcntl时为None;其他进程正在同步时为False
+        """
+        if fcntl is None:
+            return None
+        fd = os.open(f"{self.state_path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        return fd
+
+    def _release_file_lock(self, fd):
+        if fd is not None and fd is not False:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def _now():
+    """
+    当前时间字符串
+    """
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -0,0 +1,122 @@
+"""
+PDSA数字分身智能体 - 后台任务主进程选举
+
+功能说明:
+1. 多个服务进程(gunicorn多worker)通过文件锁选出唯一的主进程
+2. 定时清理、日志维护、任务恢复等后台任务只在主进程中运行
+3. 未当选的进程定期重试,主进程退出(锁随之释放)后自动接替
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl,只能单进程运行,直接视为主进程
+    fcntl = None
+
+
+class LeaderElection:
+    """
+    基于fcntl.flock的主进程选举
+
+    参数:
+        lock_path (str): 锁文件路径(所有进程须使用同一路径)
+        retry_interval (float): 未当选时的重试间隔(秒)
+
+    说明:
+        锁由操作系统在进程退出时自动释放,不会因进程崩溃而残留
+    """
+
+    def __init__(self, lock_path, retry_interval=10.0):
+        self.lock_path = lock_path
+        self.retry_interval = retry_interval
+        self.is_leader = False
+        self._fd = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, on_elected):
+        """
+        参与选举: 立即尝试一次,未当选时在后台线程中定期重试
+
+        参数:
+            on_elected (callable): 当选后调用一次(首次尝试成功时在当前线程调用)
+
+        返回:
+            bool: 首次尝试是否当选
+        """
+        if self.try_acquire():
+            on_elected()
+            return True
+
+        def campaign():
+            while not self._stop.wait(self.retry_interval):
+                if self.try_acquire():
+                    on_elected()
+                    return
+
+        self._thread = threading.Thread(target=campaign, name='leader-election', daemon=True)
+        self._thread.start()
+        return False
+
+    def try_acquire(self):
+        """
+        非阻塞地尝试获取锁
+
+        返回:
+            bool: 是否成为主进程
+        """
+        with self._lock:
+            if self.is_leader:
+                return True
+            if fcntl is None:
+                self.is_leader = True
+                return True
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            # 锁文件内容记录当前主进程PID,便于排查
+            os.ftruncate(fd, 0)
+            os.write(fd, str(os.getpid()).encode('ascii'))
+            self._fd = fd
+            self.is_leader = True
+            return True
+
+    def release(self):
+        """
+        停止重试并释放锁(进程退出前调用,使其他进程尽快接替)
+        """
+        self._stop.set()
+        with self._lock:
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+                self._fd = None
+            self.is_leader = False
+
+    def status(self):
+        """
+        选举状态
+
+        返回:
+            dict: 当前进程PID、是否为主进程、锁文件中记录的主进程PID
+        """
+        leader_pid = None
+        try:
+            with open(self.lock_path, 'r', encoding='ascii') as f:
+                leader_pid = int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            pass
+        return {
+            'pid': os.getpid(),
+            'isLeader': self.is_leader,
+            'leaderPid': leader_pid
+        }
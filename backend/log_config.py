@@ -0,0 +1,74 @@
+"""
+PDSA数字分身智能体 - 运行日志配置
+
+功能说明:
+1. 统一使用标准库logging输出运行日志,级别由LOG_LEVEL控制
+2. 同一代码位置的日志按时间窗口限流,避免异常风暴刷屏
+3. 被限流的条数在该位置下一条日志中汇总提示
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import logging
+import threading
+import time
+
+LOG_FORMAT = '%(asctime)s [%(levelname)s] %(name)s: %(message)s'
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    按代码位置限流的日志过滤器
+
+    参数:
+        max_records (int): 每个时间窗口内同一位置最多输出的条数(0表示不限流)
+        window (float): 时间窗口(秒)
+    """
+
+    def __init__(self, max_records=20, window=60.0):
+        super().__init__()
+        self.max_records = max_records
+        self.window = window
+        self._lock = threading.Lock()
+        self._sites = {}
+
+    def filter(self, record):
+        if not self.max_records:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site['start'] >= self.window:
+                suppressed = site['suppressed'] if site else 0
+                site = self._sites[key] = {'start': now, 'count': 0, 'suppressed': 0}
+                if suppressed:
+                    record.msg = f"{record.msg} (此前{int(self.window)}秒内已抑制{suppressed}条相同位置的日志)"
+            if site['count'] >= self.max_records:
+                site['suppressed'] += 1
+                return False
+            site['count'] += 1
+            return True
+
+
+def setup_logging(level='INFO', max_records=20, window=60.0):
+    """
+    配置根日志记录器(重复调用只更新级别和限流参数)
+
+    参数:
+        level (str): 日志级别 DEBUG/INFO/WARNING/ERROR
+        max_records (int): 同一代码位置每个时间窗口最多输出的条数
+        window (float): 限流时间窗口(秒)
+    """
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+
+    handler = next((h for h in root.handlers if getattr(h, '_pdsa_handler', False)), None)
+    if handler is None:
+        handler = logging.StreamHandler()
+        handler._pdsa_handler = True
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(handler)
+
+    handler.filters = [RateLimitFilter(max_records, window)]
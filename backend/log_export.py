@@ -0,0 +1,109 @@
+"""
+PDSA数字分身智能体 - 对话日志流式导出
+
+功能说明:
+1. 将日志记录逐条编码为NDJSON或CSV,以生成器形式输出
+2. 输出按块合并,避免每条记录一次网络写入
+3. 可选gzip压缩输出流
+4. 内存占用只与单个输出块大小有关,与日志总量无关
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import csv
+import io
+import json
+import zlib
+
+# 支持的导出格式 -> (Content-Type, 文件扩展名)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson; charset=utf-8', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv')
+}
+
+# CSV列
+CSV_COLUMNS = ['seq', 'time', 'type', 'user', 'bot', 'file']
+
+# 单个输出块的目标大小(字节)
+CHUNK_SIZE = 64 * 1024
+
+
+def match_keywords(record, keywords):
+    """
+    检查记录是否包含全部关键词(不区分大小写)
+
+    参数:
+        record (dict): 日志记录
+        keywords (list): 小写关键词列表
+
+    返回:
+        bool: 是否匹配
+    """
+    if not keywords:
+        return True
+    text = '\n'.join(record.get(field) or '' for field in ('user', 'bot', 'file')).lower()
+    return all(keyword in text for keyword in keywords)
+
+
+def iter_export(records, fmt='ndjson', keyword='', record_type=''):
+    """
+    将日志记录编码为导出格式
+
+    参数:
+        records (iterable): 日志记录(通常为LogStore.iter_records()生成器)
+        fmt (str): ndjson/csv
+        keyword (str): 关键词过滤,空格分隔的多个词需同时包含
+        record_type (str): 记录类型过滤 chat/error/doc
+
+    返回:
+        generator: UTF-8编码的字节块
+    """
+    keywords = [k.lower() for k in (keyword or '').split()]
+    buffer = io.StringIO()
+    writer = None
+
+    if fmt == 'csv':
+        # BOM: 便于Excel正确识别UTF-8中文
+        buffer.write('\ufeff')
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+
+    for record in records:
+        if record_type and record.get('type') != record_type:
+            continue
+        if not match_keywords(record, keywords):
+            continue
+
+        if writer:
+            writer.writerow([record.get(column, '') for column in CSV_COLUMNS])
+        else:
+            buffer.write(json.dumps(record, ensure_ascii=False))
+            buffer.write('\n')
+
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_stream(chunks, level=6):
+    """
+    以gzip格式流式压缩字节块
+
+    参数:
+        chunks (iterable): 原始字节块
+        level (int): 压缩级别
+
+    返回:
+        generator: gzip字节块
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,342 @@
+"""
+PDSA数字分身智能体 - 对话日志检索索引
+
+功能说明:
+1. 使用SQLite FTS5为对话日志建立本地全文索引(trigram分词,支持中文子串检索)
+2. 作为日志存储的监听器增量写入索引,在日志写入线程中执行,不占用对话请求路径
+3. 启动时从日志段补齐缺失的记录
+4. 支持关键词、记录类型、时间范围过滤,按序号倒序的游标分页
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+# 关键词长度不足3个字符时trigram索引无法使用,退化为LIKE匹配
+TRIGRAM_MIN_CHARS = 3
+
+# 时间范围内没有记录时使用的序号下界(保证查询结果为空)
+_NO_MATCH_SEQ = 2 ** 62
+
+# 支持的时间参数格式(第二项为"是否只有日期")
+TIME_FORMATS = (
+    ('%Y-%m-%d %H:%M:%S', False),
+    ('%Y-%m-%dT%H:%M:%S', False),
+    ('%Y-%m-%d %H:%M', False),
+    ('%Y-%m-%dT%H:%M', False),
+    ('%Y-%m-%d', True),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    seq INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    time TEXT,
+    type TEXT,
+    user TEXT,
+    bot TEXT,
+    file TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_records_ts ON records(ts);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+    user, bot, file, content='records', content_rowid='seq', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS records_ai AFTER INSERT ON records BEGIN
+    INSERT INTO records_fts(rowid, user, bot, file) VALUES (new.seq, new.user, new.bot, new.file);
+END;
+CREATE TRIGGER IF NOT EXISTS records_ad AFTER DELETE ON records BEGIN
+    INSERT INTO records_fts(records_fts, rowid, user, bot, file) VALUES ('delete', old.seq, old.user, old.bot, old.file);
+END;
+"""
+
+
+class SearchQueryError(ValueError):
+    """
+    检索参数错误(接口返回400)
+    """
+
+
+def parse_time_bound(value, end=False):
+    """
+    解析时间范围参数为时间戳
+
+    参数:
+        value (str): 时间字符串,支持日期或日期+时间
+        end (bool): 是否为结束时间;只给日期时结束时间取当天结束
+
+    返回:
+        float|None: 时间戳,未提供时返回None
+
+    异常:
+        SearchQueryError: 格式无法识别
+    """
+    if not value:
+        return None
+    for fmt, date_only in TIME_FORMATS:
+        try:
+            parsed = datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+        if end and date_only:
+            parsed += timedelta(days=1)
+        return parsed.timestamp()
+    raise SearchQueryError(f"无法识别的时间格式: {value}")
+
+
+class LogSearchIndex:
+    """
+    对话日志全文索引
+
+    参数:
+        db_path (str): SQLite数据库文件路径
+
+    说明:
+        每个线程使用独立连接,数据库使用WAL模式,写入索引时不阻塞查询
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.tokenizer = 'trigram' if _trigram_supported() else 'unicode61'
+        with self._write_lock:
+            self._conn().executescript(SCHEMA.format(tokenizer=self.tokenizer))
+
+    # ----------------------------------------
+    # 写入
+    # ----------------------------------------
+
+    def add(self, records):
+        """
+        写入一批日志记录(作为日志存储监听器调用,重复的序号会被忽略)
+
+        参数:
+            records (list): 带seq字段的日志记录
+        """
+        rows = [
+            (r['seq'], r.get('ts') or 0, r.get('time'), r.get('type', 'chat'),
+             r.get('user') or '', r.get('bot') or '', r.get('file') or '')
+            for r in records if r.get('seq') is not None
+        ]
+        if not rows:
+            return
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO records(seq, ts, time, type, user, bot, file) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+
+    def sync_from(self, store, batch_size=1000):
+        """
+        从日志存储补齐上次同步之后的记录(启动时在后台线程调用)
+
+        参数:
+            store (LogStore): 日志存储
+            batch_size (int): 每批写入条数
+
+        返回:
+            int: 本次扫描的记录数
+        """
+        start_seq = int(self._get_meta('synced_seq') or 0) + 1
+        batch = []
+        scanned = 0
+        last_seq = start_seq - 1
+        for record in store.iter_records(start_seq=start_seq):
+            batch.append(record)
+            last_seq = max(last_seq, record.get('seq', 0))
+            if len(batch) >= batch_size:
+                self.add(batch)
+                scanned += len(batch)
+                batch = []
+        self.add(batch)
+        scanned += len(batch)
+        self._set_meta('synced_seq', last_seq)
+        return scanned
+
+    def delete_range(self, first_seq, last_seq):
+        """
+        删除序号范围内的记录(日志段按保留策略被清理时调用)
+
+        参数:
+            first_seq (int): 起始序号(含)
+            last_seq (int): 结束序号(含)
+        """
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute("DELETE FROM records WHERE seq BETWEEN ? AND ?", (first_seq, last_seq))
+
+    def clear(self):
+        """
+        清空索引(日志被清空时调用)
+        """
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute("DROP TABLE IF EXISTS records_fts")
+                conn.execute("DROP TABLE IF EXISTS records")
+            conn.executescript(SCHEMA.format(tokenizer=self.tokenizer))
+
+    # ----------------------------------------
+    # 查询
+    # ----------------------------------------
+
+    def search(self, keyword='', record_type='', start=None, end=None, cursor=None, limit=20):
+        """
+        检索日志
+
+        参数:
+            keyword (str): 关键词,空格分隔的多个词需同时匹配
+            record_type (str): 记录类型 chat/error/doc(可选)
+            start (float): 起始时间戳(含)
+            end (float): 结束时间戳(不含)
+            cursor (str): 分页游标(上一页返回的nextCursor)
+            limit (int): 每页条数
+
+        返回:
+            dict: {"items": [...], "nextCursor": str|None, "tookMs": float}
+        """
+        started = time.perf_counter()
+        conditions = []
+        params = []
+
+        match_terms = []
+        for term in (keyword or '').split():
+            if self.tokenizer == 'trigram' and len(term) < TRIGRAM_MIN_CHARS:
+                like = f"%{_escape_like(term)}%"
+                conditions.append("(r.user LIKE ? ESCAPE '\\' OR r.bot LIKE ? ESCAPE '\\' OR r.file LIKE ? ESCAPE '\\')")
+                params.extend([like, like, like])
+            else:
+                match_terms.append('"' + term.replace('"', '""') + '"')
+
+        if record_type:
+            conditions.append("r.type = ?")
+            params.append(record_type)
+        if start is not None:
+            conditions.append("r.ts >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("r.ts < ?")
+            params.append(end)
+
+        # 序号与时间同向递增: 把时间范围换算为序号范围,使全文索引可以按rowid倒序逐条扫描并提前结束
+        low_seq, high_seq = self._seq_bounds(start, end)
+        if cursor:
+            try:
+                high_seq = min(high_seq, int(cursor)) if high_seq is not None else int(cursor)
+            except ValueError:
+                raise SearchQueryError("无效的分页游标")
+        if match_terms:
+            seq_column = 'f.rowid'
+            sql = ("SELECT r.seq, r.ts, r.time, r.type, r.user, r.bot, r.file "
+                   "FROM records_fts f JOIN records r ON r.seq = f.rowid")
+            conditions.insert(0, "records_fts MATCH ?")
+            params.insert(0, ' AND '.join(match_terms))
+        else:
+            seq_column = 'r.seq'
+            sql = "SELECT r.seq, r.ts, r.time, r.type, r.user, r.bot, r.file FROM records r"
+        if low_seq is not None:
+            conditions.append(f"{seq_column} >= ?")
+            params.append(low_seq)
+        if high_seq is not None:
+            conditions.append(f"{seq_column} < ?")
+            params.append(high_seq)
+
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {seq_column} DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._conn().execute(sql, params).fetchall()
+        items = [
+            {'seq': row[0], 'ts': row[1], 'time': row[2], 'type': row[3],
+             'user': row[4], 'bot': row[5], 'file': row[6]}
+            for row in rows[:limit]
+        ]
+        next_cursor = str(items[-1]['seq']) if len(rows) > limit else None
+        return {
+            'items': items,
+            'nextCursor': next_cursor,
+            'tookMs': round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    def stats(self):
+        """
+        获取索引统计信息
+
+        返回:
+            dict: 已索引记录数、最大序号、分词器
+        """
+        count, max_seq = self._conn().execute("SELECT COUNT(*), MAX(seq) FROM records").fetchone()
+        return {
+            'indexedRecords': count,
+            'maxSeq': max_seq,
+            'tokenizer': self.tokenizer
+        }
+
+    # ----------------------------------------
+    # 内部实现
+    # ----------------------------------------
+
+    def _conn(self):
+        """
+        当前线程的数据库连接
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _seq_bounds(self, start, end):
+        """
+        根据时间范围查出序号范围(走ts索引,只读取边界上的一条记录)
+
+        返回:
+            tuple: (最小序号(含)|None, 最大序号(不含)|None)
+        """
+        conn = self._conn()
+        low_seq = high_seq = None
+        if start is not None:
+            row = conn.execute("SELECT seq FROM records WHERE ts >= ? ORDER BY ts LIMIT 1", (start,)).fetchone()
+            low_seq = row[0] if row else _NO_MATCH_SEQ
+        if end is not None:
+            row = conn.execute("SELECT seq FROM records WHERE ts < ? ORDER BY ts DESC LIMIT 1", (end,)).fetchone()
+            high_seq = row[0] + 1 if row else 0
+        return low_seq, high_seq
+
+    def _get_meta(self, key):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, str(value)))
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _trigram_supported():
+    """
+    检查当前SQLite是否支持trigram分词器(SQLite 3.34+)
+    """
+    try:
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize='trigram')")
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
@@ -0,0 +1,749 @@
+"""
+PDSA数字分身智能体 - 结构化对话日志存储
+
+功能说明:
+1. 日志记录以JSON Lines格式追加写入,每条记录一行
+2. 按大小上限切分为多个段文件(segment),写满后自动切换到新段
+3. 旁路清单文件(manifest.json)实时维护记录数、字节数、各类型计数和最后写入时间,
+   状态查询只读清单,不扫描日志内容
+4. 每条记录分配递增序号(seq),便于索引和分页
+5. 写入后通知监听器(搜索索引、统计分析等),监听器异常不影响写入
+6. 轮转: 段文件达到大小上限或存在时间超过间隔后封存,不再追加
+7. 归档: 封存的段在后台压缩为gzip/zstd,压缩后仍可按顺序读取
+8. 清理: 按最长保留时间或总占用空间删除最旧的封存段
+9. 迁移: 旧版纯文本日志(chat_logs.txt)流式分批导入,清单中记录导入进度,重复执行不会重复导入
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl,跳过跨进程文件锁
+    fcntl = None
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:  # zstandard为可选依赖,未安装时只支持gzip压缩
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = re.compile(r'^seg-(\d{8})\.jsonl(\.gz|\.zst)?$')
+
+# 归档压缩格式 -> 文件扩展名
+ARCHIVE_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.lock'
+
+# 旧版文本日志的条目: [ERROR] 前缀(可选) + [时间] + 用户/AI两段 + "---"分隔行
+# 回复中可能含有"---"行,因此分隔行之后必须是下一条目的开头或文件结尾
+LEGACY_HEADER_PATTERN = re.compile(r'^[^\n]*\[\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\]\r?\n?$')
+LEGACY_ENTRY_PATTERN = re.compile(
+    r'^(?P<prefix>[^\n]*?)\[(?P<time>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]\n'
+    r'用户: (?P<user>.*?)\nAI: (?P<bot>.*?)\n---\n'
+    r'(?=\n*(?:[^\n]*?\[\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\]\n用户: |\Z))',
+    re.M | re.S
+)
+
+
+def segment_name(number):
+    """
+    段文件名
+
+    参数:
+        number (int): 段编号
+
+    返回:
+        str: 如 seg-00000001.jsonl
+    """
+    return f"seg-{number:08d}.jsonl"
+
+
+def parse_legacy_log(text):
+    """
+    解析旧版文本日志
+
+    参数:
+        text (str): chat_logs.txt的内容,格式:
+            [时间戳]
+            用户: 问题内容
+            AI: 回复内容
+            ---
+
+    返回:
+        list: 记录字典列表,字段与log_chat写入的结构化记录一致
+    """
+    records = []
+    for match in LEGACY_ENTRY_PATTERN.finditer(text.replace('\r\n', '\n')):
+        user = match.group('user')
+        is_error = user == '[ERROR]' or match.group('prefix').strip() == '[ERROR]'
+        try:
+            ts = datetime.strptime(match.group('time'), '%Y-%m-%d %H:%M:%S').timestamp()
+        except ValueError:
+            continue
+        records.append({
+            'type': 'error' if is_error else 'chat',
+            'user': '' if user == '[ERROR]' else user,
+            'bot': match.group('bot'),
+            'ts': ts,
+            'time': match.group('time')
+        })
+    return records
+
+
+def _iter_legacy_entries(f):
+    """
+    逐行读取旧版日志,按条目切分
+
+    参数:
+        f: 以二进制方式打开的文件
+
+    返回:
+        generator: (条目文本, 下一条目在文件中的字节偏移)
+
+    说明:
+        "---"行之后紧跟"[时间]"行和"用户: "行才视为新条目的开始,
+        回复中的"---"行不会切断条目
+    """
+    lines = []
+    last_line = ''
+    header_offset = f.tell()
+    header_closed = False
+    prev_is_header = False
+    while True:
+        offset = f.tell()
+        raw = f.readline()
+        if not raw:
+            break
+        line = raw.decode('utf-8', errors='replace')
+        if line.startswith('用户: ') and prev_is_header and header_closed and len(lines) > 1:
+            yield ''.join(lines[:-1]), header_offset
+            lines = lines[-1:]
+        # 记录本行之前的条目是否以"---"结束,供下一行判断本行是否为新条目的标题
+        header_closed = last_line.strip() == '---'
+        prev_is_header = bool(LEGACY_HEADER_PATTERN.match(line))
+        header_offset = offset
+        lines.append(line)
+        if line.strip():
+            last_line = line
+    if lines:
+        yield ''.join(lines), f.tell()
+
+
+def _iter_legacy_batches(f, batch_size):
+    """
+    按批解析旧版日志
+
+    返回:
+        generator: (记录列表, 已处理到的字节偏移)
+    """
+    batch = []
+    offset = f.tell()
+    for text, offset in _iter_legacy_entries(f):
+        batch.extend(parse_legacy_log(text))
+        if len(batch) >= batch_size:
+            yield batch, offset
+            batch = []
+    if batch:
+        yield batch, offset
+
+
+def available_codecs():
+    """
+    当前环境可用的归档压缩格式
+
+    返回:
+        list: 压缩格式名称列表
+    """
+    return ['gzip', 'zstd'] if ZSTD_AVAILABLE else ['gzip']
+
+
+class LogStore:
+    """
+    分段追加的结构化日志存储
+
+    参数:
+        log_dir (str): 日志目录
+        segment_max_bytes (int): 单个段文件的大小上限
+        durability (str): flush(交给操作系统) / fsync(每批落盘)
+
+    清单格式:
+        {
+            "nextSeq": 下一条记录序号,
+            "totalRecords": 总记录数,
+            "totalBytes": 总字节数,
+            "typeCounts": {"chat": n, "error": n, "doc": n},
+            "lastWrite": "YYYY-mm-dd HH:MM:SS",
+            "lastSegment": 最近创建的段编号,
+            "segments": [{"name", "records", "bytes", "rawBytes", "typeCounts", "sealed", "codec",
+                          "firstTs", "lastTs", "firstSeq", "lastSeq"}]
+        }
+        bytes为磁盘占用(压缩后大小),rawBytes为压缩前大小
+
+    说明:
+        追加写入时持有跨进程文件锁,并在锁内重新读取清单,多个工作进程可共享同一目录
+    """
+
+    def __init__(self, log_dir, segment_max_bytes=16 * 1024 * 1024, durability='flush'):
+        self.log_dir = log_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.durability = durability
+        self.manifest_path = os.path.join(log_dir, MANIFEST_NAME)
+        self.lock_path = os.path.join(log_dir, LOCK_NAME)
+        self.lock = threading.RLock()
+        self.listeners = []
+
+        if not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+
+        with self.lock:
+            self._manifest = self._read_manifest()
+
+    # ----------------------------------------
+    # 写入
+    # ----------------------------------------
+
+    def append(self, records):
+        """
+        追加一批记录(作为异步日志写入器的输出端调用)
+
+        参数:
+            records (list): 记录字典列表,缺少ts/time字段时自动补充
+
+        返回:
+            list: 已分配seq的记录列表
+        """
+        if not records:
+            return []
+
+        with self.lock, self._file_lock():
+            manifest = self._read_manifest()
+            written = self._append_locked(manifest, records)
+            self._write_manifest(manifest)
+            self._manifest = manifest
+
+        self._notify(written)
+        return written
+
+    def import_legacy(self, path, batch_size=1000):
+        """
+        一次性导入旧版文本日志,导入后把原文件重命名为 *.imported
+
+        参数:
+            path (str): 旧版日志文件路径
+            batch_size (int): 每批写入的记录数
+
+        返回:
+            int: 本次导入的记录数(文件不存在或已导入过时为0)
+
+        说明:
+            - 应在开始写入新日志之前调用,导入的旧记录序号小于之后写入的记录,
+              保持"序号与时间同向递增"(日志检索按此换算时间范围)
+            - 整个导入过程持有跨进程文件锁,多个worker同时启动时只有一个进程导入
+            - 逐行流式读取,按批写入;每批写入后在清单中记录已读取的文件偏移,
+              进程中途退出后从该偏移继续,不会重复导入
+        """
+        if not os.path.exists(path):
+            return 0
+        import_key = f"legacy:{os.path.abspath(path)}"
+        imported = 0
+        with self.lock, self._file_lock():
+            manifest = self._read_manifest()
+            state = manifest.get('imports', {}).get(import_key) or {}
+            if not state.get('done'):
+                with open(path, 'rb') as f:
+                    f.seek(state.get('offset', 0))
+                    for records, offset in _iter_legacy_batches(f, batch_size):
+                        written = self._append_locked(manifest, records)
+                        manifest.setdefault('imports', {})[import_key] = {'offset': offset, 'done': False}
+                        self._write_manifest(manifest)
+                        self._manifest = manifest
+                        self._notify(written)
+                        imported += len(written)
+                manifest.setdefault('imports', {})[import_key] = {'offset': os.path.getsize(path), 'done': True}
+                self._write_manifest(manifest)
+                self._manifest = manifest
+        try:
+            os.replace(path, path + '.imported')
+        except OSError as e:
+            logger.warning("重命名旧版日志文件失败 %s: %s", path, e)
+        return imported
+
+    def clear(self):
+        """
+        删除所有段文件并重置清单(保留seq序号连续递增)
+        """
+        with self.lock, self._file_lock():
+            manifest = self._read_manifest()
+            for segment in manifest['segments']:
+                path = os.path.join(self.log_dir, segment['name'])
+                if os.path.exists(path):
+                    os.remove(path)
+            fresh = _empty_manifest()
+            fresh['nextSeq'] = manifest['nextSeq']
+            fresh['lastSegment'] = manifest.get('lastSegment', 0)
+            self._write_manifest(fresh)
+            self._manifest = fresh
+
+    # ----------------------------------------
+    # 轮转、归档与清理
+    # ----------------------------------------
+
+    def rotate(self, max_age_seconds=None):
+        """
+        封存当前段,之后的记录写入新段
+
+        参数:
+            max_age_seconds (float): 只在当前段第一条记录早于该时长时封存(可选,用于按时间间隔轮转)
+
+        返回:
+            bool: 是否封存了段
+        """
+        with self.lock, self._file_lock():
+            manifest = self._read_manifest()
+            if not manifest['segments']:
+                return False
+            active = manifest['segments'][-1]
+            if active.get('sealed') or not active['records']:
+                return False
+            if max_age_seconds is not None and time.time() - active['firstTs'] < max_age_seconds:
+                return False
+            active['sealed'] = True
+            self._write_manifest(manifest)
+            self._manifest = manifest
+            return True
+
+    def compress_sealed(self, codec='gzip'):
+        """
+        压缩所有已封存但未压缩的段(在后台线程调用)
+
+        参数:
+            codec (str): gzip/zstd,zstd不可用时使用gzip
+
+        返回:
+            dict: {"segments": 压缩段数, "rawBytes": 压缩前字节数, "bytes": 压缩后字节数}
+
+        说明:
+            封存的段不再写入,压缩在锁外进行;完成后在锁内替换清单中的段信息,
+            其他进程已抢先压缩同一段时丢弃本次结果
+        """
+        if codec not in available_codecs():
+            codec = 'gzip'
+        result = {'segments': 0, 'rawBytes': 0, 'bytes': 0}
+        for segment in self.segments():
+            if not segment.get('sealed') or segment.get('codec'):
+                continue
+
+            src = os.path.join(self.log_dir, segment['name'])
+            archive_name = segment['name'] + ARCHIVE_EXTENSIONS[codec]
+            tmp_path = os.path.join(self.log_dir, f"{archive_name}.{os.getpid()}.tmp")
+            try:
+                _compress_file(src, tmp_path, codec)
+            except FileNotFoundError:
+                continue
+
+            with self.lock, self._file_lock():
+                manifest = self._read_manifest()
+                current = next((m for m in manifest['segments'] if m['name'] == segment['name']), None)
+                if current is None:
+                    os.remove(tmp_path)
+                    continue
+                compressed_size = os.path.getsize(tmp_path)
+                os.replace(tmp_path, os.path.join(self.log_dir, archive_name))
+                manifest['totalBytes'] += compressed_size - current['bytes']
+                current['name'] = archive_name
+                current['codec'] = codec
+                current['bytes'] = compressed_size
+                self._write_manifest(manifest)
+                self._manifest = manifest
+                os.remove(src)
+
+            result['segments'] += 1
+            result['rawBytes'] += current.get('rawBytes', 0)
+            result['bytes'] += compressed_size
+        return result
+
+    def prune(self, max_age_seconds=0, max_total_bytes=0):
+        """
+        从最旧的封存段开始删除,直到满足保留条件(不会删除正在写入的段)
+
+        参数:
+            max_age_seconds (float): 最长保留时间,段内最后一条记录超过该时长即删除(0表示不限)
+            max_total_bytes (int): 总占用空间上限(0表示不限)
+
+        返回:
+            list: 被删除的段元数据
+        """
+        if not max_age_seconds and not max_total_bytes:
+            return []
+        removed = []
+        with self.lock, self._file_lock():
+            manifest = self._read_manifest()
+            now = time.time()
+            while manifest['segments'] and manifest['segments'][0].get('sealed'):
+                oldest = manifest['segments'][0]
+                expired = max_age_seconds and oldest['lastTs'] is not None and now - oldest['lastTs'] > max_age_seconds
+                oversize = max_total_bytes and manifest['totalBytes'] > max_total_bytes
+                if not expired and not oversize:
+                    break
+                path = os.path.join(self.log_dir, oldest['name'])
+                if os.path.exists(path):
+                    os.remove(path)
+                manifest['segments'].pop(0)
+                manifest['totalRecords'] -= oldest['records']
+                manifest['totalBytes'] -= oldest['bytes']
+                for record_type, count in oldest.get('typeCounts', {}).items():
+                    manifest['typeCounts'][record_type] = max(0, manifest['typeCounts'].get(record_type, 0) - count)
+                removed.append(oldest)
+            if removed:
+                self._write_manifest(manifest)
+                self._manifest = manifest
+        return removed
+
+    # ----------------------------------------
+    # 查询
+    # ----------------------------------------
+
+    def stats(self):
+        """
+        读取统计信息(只读清单,不扫描日志)
+
+        返回:
+            dict: 清单副本
+        """
+        with self.lock:
+            self._manifest = self._read_manifest()
+            return json.loads(json.dumps(self._manifest))
+
+    def segments(self):
+        """
+        段文件元数据列表(按写入顺序)
+
+        返回:
+            list: 段元数据副本
+        """
+        return self.stats()['segments']
+
+    def iter_records(self, start_seq=None, start_ts=None, end_ts=None):
+        """
+        按写入顺序遍历记录(逐行读取,内存占用与日志大小无关,透明读取已压缩的段)
+
+        参数:
+            start_seq (int): 只返回seq大于等于该值的记录(可选),会跳过更早的段
+            start_ts (float): 只返回时间戳大于等于该值的记录(可选)
+            end_ts (float): 只返回时间戳小于该值的记录(可选)
+
+        返回:
+            generator: 记录字典
+
+        说明:
+            按段元数据中的序号/时间范围跳过整段,不打开无关的段文件
+        """
+        for segment in self.segments():
+            if start_seq is not None and segment.get('lastSeq') is not None and segment['lastSeq'] < start_seq:
+                continue
+            if start_ts is not None and segment.get('lastTs') is not None and segment['lastTs'] < start_ts:
+                continue
+            if end_ts is not None and segment.get('firstTs') is not None and segment['firstTs'] >= end_ts:
+                continue
+            f = self._open_segment(segment['name'])
+            if f is None:
+                continue
+            with f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if start_seq is not None and record.get('seq', 0) < start_seq:
+                        continue
+                    ts = record.get('ts', 0)
+                    if (start_ts is not None and ts < start_ts) or (end_ts is not None and ts >= end_ts):
+                        continue
+                    yield record
+
+    # ----------------------------------------
+    # 内部实现
+    # ----------------------------------------
+
+    def _append_locked(self, manifest, records):
+        """
+        把记录写入当前段并更新清单(调用方需持有锁,并负责写回清单)
+
+        返回:
+            list: 已分配seq的记录列表
+        """
+        if not records:
+            return []
+        segments = manifest['segments']
+        # 没有段或最后一段已封存时开始新段
+        if not segments or segments[-1].get('sealed'):
+            segments.append(self._next_segment_meta(manifest))
+
+        written = []
+        buffer = []
+        active = segments[-1]
+        for record in records:
+            record = dict(record)
+            record.setdefault('ts', time.time())
+            record.setdefault('time', datetime.fromtimestamp(record['ts']).strftime('%Y-%m-%d %H:%M:%S'))
+            record['seq'] = manifest['nextSeq']
+            manifest['nextSeq'] += 1
+
+            line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+            # 当前段写满时切换到新段
+            if active['bytes'] + sum(len(b) for b in buffer) + len(line) > self.segment_max_bytes \
+                    and (active['records'] or buffer):
+                self._write_segment(active, buffer)
+                buffer = []
+                active['sealed'] = True
+                active = self._next_segment_meta(manifest)
+                segments.append(active)
+
+            buffer.append(line)
+            self._account(manifest, active, record, len(line))
+            written.append(record)
+
+        self._write_segment(active, buffer)
+        manifest['lastWrite'] = written[-1]['time']
+        return written
+
+    def _notify(self, records):
+        """
+        通知监听器新写入的记录
+        """
+        for listener in self.listeners:
+            try:
+                listener(records)
+            except Exception as e:
+                logger.error("日志监听器执行失败(%s): %s", getattr(listener, '__name__', listener), e)
+
+    def _open_segment(self, name):
+        """
+        以文本方式打开段文件(自动解压);段在读取前刚被压缩时改为打开归档文件
+
+        返回:
+            file|None: 文件对象,段已被删除时返回None
+        """
+        base = SEGMENT_PATTERN.match(name)
+        candidates = [name] + [f"seg-{base.group(1)}.jsonl{ext}" for ext in ARCHIVE_EXTENSIONS.values()]
+        for candidate in candidates:
+            path = os.path.join(self.log_dir, candidate)
+            try:
+                if candidate.endswith('.gz'):
+                    return gzip.open(path, 'rt', encoding='utf-8')
+                if candidate.endswith('.zst'):
+                    if not ZSTD_AVAILABLE:
+                        continue
+                    return _open_zstd_text(path)
+                return open(path, 'r', encoding='utf-8')
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _account(self, manifest, segment, record, size):
+        """
+        更新段与清单的计数
+        """
+        segment['records'] += 1
+        segment['bytes'] += size
+        segment['rawBytes'] = segment.get('rawBytes', 0) + size
+        record_type = record.get('type', 'chat')
+        type_counts = segment.setdefault('typeCounts', {})
+        type_counts[record_type] = type_counts.get(record_type, 0) + 1
+        segment['lastTs'] = record['ts']
+        segment['lastSeq'] = record['seq']
+        if segment['firstTs'] is None:
+            segment['firstTs'] = record['ts']
+            segment['firstSeq'] = record['seq']
+
+        manifest['totalRecords'] += 1
+        manifest['totalBytes'] += size
+        manifest['typeCounts'][record_type] = manifest['typeCounts'].get(record_type, 0) + 1
+
+    def _write_segment(self, segment, lines):
+        """
+        一次写入追加到段文件
+        """
+        if not lines:
+            return
+        path = os.path.join(self.log_dir, segment['name'])
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b''.join(lines))
+            if self.durability == 'fsync':
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _next_segment_meta(self, manifest):
+        """
+        创建下一个段的元数据(段编号持续递增,清理或清空后不会复用)
+        """
+        last = manifest['segments'][-1]['name'] if manifest['segments'] else None
+        number = max(manifest.get('lastSegment', 0), _segment_number(last) if last else 0) + 1
+        manifest['lastSegment'] = number
+        return self._new_segment_meta(number)
+
+    def _new_segment_meta(self, number):
+        return {
+            'name': segment_name(number),
+            'records': 0,
+            'bytes': 0,
+            'rawBytes': 0,
+            'typeCounts': {},
+            'sealed': False,
+            'codec': None,
+            'firstTs': None,
+            'lastTs': None,
+            'firstSeq': None,
+            'lastSeq': None
+        }
+
+    def _read_manifest(self):
+        """
+        读取清单,不存在或损坏时根据段文件重建
+        """
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning("读取日志清单失败,重建清单: %s", e)
+        return self._rebuild_manifest()
+
+    def _write_manifest(self, manifest):
+        """
+        原子写入清单
+        """
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+            if self.durability == 'fsync':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _rebuild_manifest(self):
+        """
+        扫描段文件重建清单(仅在清单丢失或损坏时执行)
+        """
+        manifest = _empty_manifest()
+        names = sorted(
+            (name for name in os.listdir(self.log_dir) if SEGMENT_PATTERN.match(name)),
+            key=_segment_number
+        )
+        for name in names:
+            segment = self._new_segment_meta(_segment_number(name))
+            segment['name'] = name
+            f = self._open_segment(name)
+            if f is None:
+                continue
+            with f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._account(manifest, segment, record, len(line.encode('utf-8')))
+                    manifest['nextSeq'] = max(manifest['nextSeq'], record.get('seq', 0) + 1)
+                    manifest['lastWrite'] = record.get('time', manifest['lastWrite'])
+            codec = next((c for c, ext in ARCHIVE_EXTENSIONS.items() if name.endswith(ext)), None)
+            if codec:
+                # 归档段: 磁盘占用取压缩后文件大小
+                disk_size = os.path.getsize(os.path.join(self.log_dir, name))
+                manifest['totalBytes'] += disk_size - segment['bytes']
+                segment['bytes'] = disk_size
+                segment['codec'] = codec
+                segment['sealed'] = True
+            manifest['segments'].append(segment)
+            manifest['lastSegment'] = _segment_number(name)
+        # 除最后一段外都视为已封存
+        for segment in manifest['segments'][:-1]:
+            segment['sealed'] = True
+        return manifest
+
+    def _file_lock(self):
+        """
+        跨进程文件锁上下文
+        """
+        return _FileLock(self.lock_path)
+
+
+class _FileLock:
+    """
+    基于fcntl.flock的跨进程排他锁(无fcntl时为空操作)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl:
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o644)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+
+def _compress_file(src, dst, codec):
+    """
+    流式压缩文件(内存占用与文件大小无关)
+    """
+    with open(src, 'rb') as fin:
+        if codec == 'zstd':
+            with open(dst, 'wb') as fout:
+                zstandard.ZstdCompressor(level=10).copy_stream(fin, fout)
+        else:
+            with gzip.open(dst, 'wb', compresslevel=9) as fout:
+                while True:
+                    block = fin.read(1024 * 1024)
+                    if not block:
+                        break
+                    fout.write(block)
+
+
+def _open_zstd_text(path):
+    """
+    以文本方式流式读取zstd文件
+    """
+    raw = open(path, 'rb')
+    reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return io.TextIOWrapper(reader, encoding='utf-8')
+
+
+def _segment_number(name):
+    match = SEGMENT_PATTERN.match(name)
+    return int(match.group(1)) if match else 0
+
+
+def _empty_manifest():
+    return {
+        'nextSeq': 1,
+        'totalRecords': 0,
+        'totalBytes': 0,
+        'typeCounts': {},
+        'lastWrite': None,
+        'lastSegment': 0,
+        'segments': []
+    }
@@ -0,0 +1,217 @@
+"""
+PDSA数字分身智能体 - 异步日志写入模块
+
+功能说明:
+1. 请求线程只把日志记录放入有界内存队列,不在请求路径上打开/写入文件
+2. 后台写入线程按刷新间隔批量取出记录,合并为一次写入
+3. 队列满时的背压策略: sync(调用方直接写入) / block(等待) / drop(丢弃并计数)
+4. 输出端可替换(如分段结构化日志存储 log_store.LogStore.append)
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 支持的背压策略
+OVERFLOW_POLICIES = ('sync', 'block', 'drop')
+
+# 关闭时标记
+_STOP = object()
+
+
+class AsyncLogWriter:
+    """
+    后台批量日志写入器
+
+    参数:
+        sink (callable): 输出端,签名 sink(records),在写入线程中调用
+        max_queue (int): 内存队列容量
+        flush_interval (float): 批量刷新间隔(秒)
+        max_batch (int): 单批最多记录数
+        overflow (str): 队列满时的背压策略 sync/block/drop
+        block_timeout (float): block策略下的最长等待时间(秒),超时后丢弃
+
+    说明:
+        sink需自行保证线程安全(sync策略下调用方线程会直接调用sink)
+    """
+
+    def __init__(self, sink, max_queue=10000, flush_interval=0.2, max_batch=1000,
+                 overflow='sync', block_timeout=1.0):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.overflow = overflow if overflow in OVERFLOW_POLICIES else 'sync'
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._enqueued = 0
+        self._written = 0
+        self._batches = 0
+        self._dropped = 0
+        self._overflow_sync = 0
+        self._errors = 0
+        self._last_write_ms = 0.0
+
+    def start(self):
+        """
+        启动后台写入线程(重复调用无副作用)
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+
+    def write(self, record):
+        """
+        提交一条日志记录(不阻塞请求线程,除非使用block策略且队列已满)
+
+        参数:
+            record: 日志记录,类型由sink决定
+
+        返回:
+            bool: 是否成功提交(drop策略下队列满时返回False)
+        """
+        if self._closed:
+            self._write_batch([record])
+            return True
+
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow == 'sync':
+                # 队列已满: 退化为调用方直接写入,保证不丢日志
+                with self._lock:
+                    self._overflow_sync += 1
+                self._write_batch([record])
+                return True
+            if self.overflow == 'block':
+                try:
+                    self._queue.put(record, timeout=self.block_timeout)
+                except queue.Full:
+                    self._count_dropped()
+                    return False
+            else:
+                self._count_dropped()
+                return False
+
+        with self._lock:
+            self._enqueued += 1
+        return True
+
+    def flush(self, timeout=5.0):
+        """
+        等待队列中的记录全部写出
+
+        参数:
+            timeout (float): 最长等待时间(秒)
+
+        返回:
+            bool: 是否在超时前写完
+        """
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=5.0):
+        """
+        写出剩余记录并停止写入线程(进程退出时调用)
+
+        参数:
+            timeout (float): 最长等待时间(秒)
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self):
+        """
+        获取写入统计信息
+
+        返回:
+            dict: 入队/写出/丢弃数量、批次数、当前队列深度、最近一批写入耗时
+        """
+        with self._lock:
+            return {
+                'queueDepth': self._queue.qsize(),
+                'queueCapacity': self._queue.maxsize,
+                'enqueued': self._enqueued,
+                'written': self._written,
+                'batches': self._batches,
+                'dropped': self._dropped,
+                'overflowSync': self._overflow_sync,
+                'errors': self._errors,
+                'lastWriteMs': round(self._last_write_ms, 3),
+                'overflowPolicy': self.overflow
+            }
+
+    def _count_dropped(self):
+        with self._lock:
+            self._dropped += 1
+
+    def _run(self):
+        """
+        写入线程主循环: 攒批 -> 一次写出
+        """
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                self._queue.task_done()
+                return
+
+            batch = [record]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            # 在刷新间隔内继续收集记录,直到达到单批上限
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write_batch(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        """
+        调用输出端写入一批记录,失败时记录错误但不中断写入线程
+        """
+        started = time.perf_counter()
+        try:
+            self.sink(batch)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            logger.error("日志记录失败: %s", e)
+            return
+        with self._lock:
+            self._written += len(batch)
+            self._batches += 1
+            self._last_write_ms = (time.perf_counter() - started) * 1000
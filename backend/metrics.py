@@ -0,0 +1,295 @@
+"""
+PDSA数字分身智能体 - 运行指标
+
+功能说明:
+1. 计数器(Counter)、仪表(Gauge)、直方图(Histogram),支持标签
+2. 按Prometheus文本格式(0.0.4)输出,供 /metrics 接口抓取
+3. 仪表支持回调取值,抓取时读取队列深度等实时状态
+4. 不依赖第三方库,指标更新只做加锁的内存计数
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# 默认耗时分桶(秒): 覆盖毫秒级接口到分钟级的文档生成
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Registry:
+    """
+    指标注册表
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        输出Prometheus文本格式
+
+        返回:
+            str: 所有指标的文本表示
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    """
+    带标签指标的公共实现: 每组标签值对应一个子指标
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        registry.register(self)
+
+    def labels(self, **labels):
+        """
+        获取指定标签值的子指标
+
+        参数:
+            **labels: 标签值,必须与labelnames一致
+
+        返回:
+            子指标对象
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        lines = []
+        for key, child in children:
+            lines.extend(self._child_samples(_format_labels(zip(self.labelnames, key)), child))
+        return lines
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"指标{self.name}需要标签: {self.labelnames}")
+        return self._children[()]
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _child_samples(self, labels, child):
+        raise NotImplementedError
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        with self.lock:
+            self.value = value
+
+    def set_function(self, function):
+        """
+        抓取时调用function()取值(用于队列深度等已有统计)
+        """
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return float('nan')
+        return self.value
+
+    @contextmanager
+    def track_inprogress(self):
+        """
+        进行中计数: 进入时加1,退出时减1
+        """
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Counter(_Metric):
+    """
+    只增不减的计数器
+    """
+
+    kind = 'counter'
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def set_function(self, function):
+        """
+        抓取时调用function()取值(用于模块内已有的累计计数)
+        """
+        self._default().set_function(function)
+
+    def _new_child(self):
+        return _Value()
+
+    def _child_samples(self, labels, child):
+        return [f"{self.name}{labels} {_format_value(child.get())}"]
+
+
+class Gauge(_Metric):
+    """
+    可增可减的仪表
+    """
+
+    kind = 'gauge'
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+    def track_inprogress(self):
+        return self._default().track_inprogress()
+
+    def _new_child(self):
+        return _Value()
+
+    def _child_samples(self, labels, child):
+        return [f"{self.name}{labels} {_format_value(child.get())}"]
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.sum += value
+            self.count += 1
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+                    break
+
+    @contextmanager
+    def time(self):
+        """
+        记录代码块耗时(秒)
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    """
+    分桶直方图(累计桶计数 + 总和 + 总数)
+
+    参数:
+        buckets (tuple): 桶上界(升序),自动追加+Inf
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _child_samples(self, labels, child):
+        with child.lock:
+            counts = list(child.counts)
+            total, count = child.sum, child.count
+        lines = []
+        cumulative = 0
+        base = labels[1:-1] if labels else ''
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else _format_value(bound)
+            bucket_labels = f'{{{base},le="{le}"}}' if base else f'{{le="{le}"}}'
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def _format_labels(pairs):
+    pairs = list(pairs)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if value != value:
+        return 'NaN'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
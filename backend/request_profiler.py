@@ -0,0 +1,373 @@
+"""
+PDSA数字分身智能体 - 请求性能剖析
+
+功能说明:
+1. 按采样率或指定请求头选择部分请求进行剖析,未开启时只做一次布尔判断
+2. 记录请求内各阶段耗时(解析 -> 百炼调用 -> 日志 -> 序列化等)
+3. 被剖析的请求同时使用cProfile记录函数耗时,并按固定间隔采样调用栈
+4. 只保留耗时最长的N条记录,可下载为pstats文件或火焰图折叠栈格式
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import cProfile
+import heapq
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# 未处于剖析中的请求使用的空上下文(可重复使用)
+_NULL_SPAN = nullcontext()
+
+# 火焰图调用栈的最大深度
+MAX_STACK_DEPTH = 128
+
+
+class RequestTrace:
+    """
+    单个请求的剖析记录
+
+    参数:
+        method (str): 请求方法
+        path (str): 请求路径
+        reason (str): 被选中的原因 sampled/header
+        profile (bool): 是否启用cProfile
+    """
+
+    def __init__(self, method, path, reason, profile=True):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status = None
+        self.reason = reason
+        self.thread_id = threading.get_ident()
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.stacks = {}
+        self.samples = 0
+        self.stats = None
+        self._depth = 0
+        self._profiler = cProfile.Profile() if profile else None
+
+    def start(self):
+        if self._profiler is not None:
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # 当前线程已有其他分析器在运行,只记录阶段耗时
+                self._profiler = None
+
+    def finish(self, status=None):
+        """
+        结束剖析并整理函数耗时统计
+        """
+        self.duration = time.perf_counter() - self.started
+        self.status = status
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.create_stats()
+            self.stats = self._profiler.stats
+            self._profiler = None
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        depth = self._depth
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth = depth
+            self.spans.append({
+                'name': name,
+                'depth': depth,
+                'startMs': round((started - self.started) * 1000, 3),
+                'durationMs': round((time.perf_counter() - started) * 1000, 3)
+            })
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'route': self.route,
+            'status': self.status,
+            'reason': self.reason,
+            'time': datetime.fromtimestamp(self.started_at).strftime('%Y-%m-%d %H:%M:%S'),
+            'durationMs': round((self.duration or 0) * 1000, 3),
+            'spans': sorted(self.spans, key=lambda span: span['startMs']),
+            'profiled': self.stats is not None,
+            'stackSamples': self.samples
+        }
+
+    def top_functions(self, limit=30, sort='cumulative'):
+        """
+        函数耗时排行(pstats文本输出)
+
+        参数:
+            limit (int): 输出的函数数量
+            sort (str): 排序字段 cumulative/tottime/calls
+
+        返回:
+            str|None: pstats文本,未启用cProfile时返回None
+        """
+        if self.stats is None:
+            return None
+        output = io.StringIO()
+        stats = pstats.Stats(_StatsSource(self.stats), stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def pstats_bytes(self):
+        """
+        pstats文件内容(可用 python -m pstats 或 snakeviz 打开)
+        """
+        if self.stats is None:
+            return None
+        return marshal.dumps(self.stats)
+
+    def collapsed_stacks(self):
+        """
+        火焰图折叠栈格式(每行"帧1;帧2;... 采样次数",可直接交给flamegraph.pl/speedscope)
+        """
+        stacks = sorted(list(self.stacks.items()), key=lambda item: item[1], reverse=True)
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+
+class _StatsSource:
+    """
+    让pstats.Stats直接读取内存中的统计字典
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class RequestProfiler:
+    """
+    请求剖析器
+
+    参数:
+        sample_rate (float): 请求采样比例(0~1),0表示不采样
+        max_traces (int): 保留耗时最长的剖析记录条数
+        token (str): 请求头触发剖析所需的口令,为空时不允许请求头触发
+        sample_interval (float): 调用栈采样间隔(秒)
+        header (str): 触发剖析的请求头名称
+
+    说明:
+        sample_rate为0且未配置token时完全关闭,begin()只做一次判断即返回
+    """
+
+    def __init__(self, sample_rate=0.0, max_traces=20, token='', sample_interval=0.005,
+                 header='X-PDSA-Profile'):
+        self.sample_rate = sample_rate
+        self.max_traces = max_traces
+        self.token = token
+        self.sample_interval = sample_interval
+        self.header = header
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._traces = []
+        self._counter = itertools.count()
+        self._active = {}
+        self._wakeup = threading.Event()
+        self._sampler = None
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or bool(self.token)
+
+    def configure(self, sample_rate=None, max_traces=None):
+        """
+        更新采样率和保留条数
+
+        参数:
+            sample_rate (float): 请求采样比例(0~1)
+            max_traces (int): 保留条数
+        """
+        if sample_rate is not None:
+            self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        if max_traces is not None:
+            with self._lock:
+                self.max_traces = max(1, int(max_traces))
+                while len(self._traces) > self.max_traces:
+                    heapq.heappop(self._traces)
+
+    # ----------------------------------------
+    # 请求生命周期
+    # ----------------------------------------
+
+    def authorized(self, headers):
+        """
+        请求头中是否带有正确的口令(未配置口令时始终为False)
+
+        参数:
+            headers: 请求头(支持get方法)
+
+        返回:
+            bool: 口令是否正确
+        """
+        if not self.token:
+            return False
+        value = (headers.get(self.header) or '').encode('utf-8')
+        return hmac.compare_digest(value, self.token.encode('utf-8'))
+
+    def begin(self, method, path, headers):
+        """
+        请求开始时调用,按采样率或请求头决定是否剖析
+
+        参数:
+            method (str): 请求方法
+            path (str): 请求路径
+            headers: 请求头(支持get方法)
+
+        返回:
+            RequestTrace|None: 剖析记录,未选中时返回None
+        """
+        if not self.enabled:
+            return None
+        reason = None
+        if self.authorized(headers):
+            reason = 'header'
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            reason = 'sampled'
+        if reason is None:
+            return None
+
+        trace = RequestTrace(method, path, reason)
+        self._local.trace = trace
+        with self._lock:
+            self._active[trace.thread_id] = trace
+        self._ensure_sampler()
+        trace.start()
+        return trace
+
+    def end(self, trace, status=None):
+        """
+        请求结束时调用,保存耗时最长的记录
+
+        参数:
+            trace (RequestTrace): begin()返回的剖析记录
+            status (int): 响应状态码
+        """
+        trace.finish(status)
+        self._local.trace = None
+        with self._lock:
+            self._active.pop(trace.thread_id, None)
+            entry = (trace.duration, next(self._counter), trace)
+            if len(self._traces) < self.max_traces:
+                heapq.heappush(self._traces, entry)
+            elif trace.duration > self._traces[0][0]:
+                heapq.heapreplace(self._traces, entry)
+
+    def span(self, name):
+        """
+        记录一个阶段的耗时(当前请求未被剖析时为空操作)
+
+        参数:
+            name (str): 阶段名称 parse/upstream/log/serialize等
+
+        返回:
+            上下文管理器
+        """
+        trace = getattr(self._local, 'trace', None)
+        if trace is None:
+            return _NULL_SPAN
+        return trace.span(name)
+
+    # ----------------------------------------
+    # 查询
+    # ----------------------------------------
+
+    def traces(self):
+        """
+        剖析记录列表(按耗时倒序)
+        """
+        with self._lock:
+            entries = sorted(self._traces, key=lambda entry: entry[0], reverse=True)
+        return [entry[2].summary() for entry in entries]
+
+    def get(self, trace_id):
+        with self._lock:
+            for _, _, trace in self._traces:
+                if trace.id == trace_id:
+                    return trace
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._traces = []
+
+    def settings(self):
+        return {
+            'enabled': self.enabled,
+            'sampleRate': self.sample_rate,
+            'maxTraces': self.max_traces,
+            'headerEnabled': bool(self.token),
+            'header': self.header,
+            'sampleIntervalMs': round(self.sample_interval * 1000, 3)
+        }
+
+    # ----------------------------------------
+    # 调用栈采样
+    # ----------------------------------------
+
+    def _ensure_sampler(self):
+        self._wakeup.set()
+        if self._sampler is not None:
+            return
+        with self._lock:
+            if self._sampler is not None:
+                return
+            self._sampler = threading.Thread(target=self._sample_loop, name='request-profiler', daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self):
+        """
+        只在有请求被剖析时采样,空闲时阻塞等待
+        """
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                active = dict(self._active)
+                if not active:
+                    self._wakeup.clear()
+                    continue
+            frames = sys._current_frames()
+            for thread_id, trace in active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stack = _collapse(frame)
+                    trace.stacks[stack] = trace.stacks.get(stack, 0) + 1
+                    trace.samples += 1
+            del frames
+            time.sleep(self.sample_interval)
+
+
+def _collapse(frame):
+    """
+    把调用栈转换为折叠格式(根在前)
+    """
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
@@ -0,0 +1,413 @@
+"""
+PDSA数字分身智能体 - 上游调用容错
+
+功能说明:
+1. 单次调用截止时间: 超时后立即返回,不再等待SDK自身的超时
+2. 带随机抖动的指数退避重试,重试次数受全局重试预算限制,避免故障时放大流量
+3. 熔断器: 连续失败达到阈值后快速失败,冷却后放行少量探测请求判断是否恢复
+4. 对冲请求(可选): 首个请求超过近期p95延迟仍未返回时,再发一个请求,取先成功的结果
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# 熔断器状态
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class UpstreamError(Exception):
+    """
+    上游调用失败
+
+    参数:
+        message (str): 错误信息
+        retryable (bool): 是否可以重试(限流、服务端错误、网络错误为True)
+    """
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class CircuitOpenError(UpstreamError):
+    """
+    熔断器打开,调用被直接拒绝
+    """
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name}熔断中,{retry_after:.0f}秒后重试", retryable=False)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(UpstreamError):
+    """
+    调用超过截止时间
+    """
+
+    def __init__(self, seconds):
+        super().__init__(f"上游调用超时({seconds:.0f}秒)", retryable=False)
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    参数:
+        name (str): 名称(用于错误信息和健康检查)
+        failure_threshold (int): 连续失败多少次后打开
+        open_seconds (float): 打开后多久进入半开状态
+        half_open_max (int): 半开状态下同时放行的探测请求数
+
+    说明:
+        半开状态下探测成功则关闭,探测失败则重新打开并重新计时
+    """
+
+    def __init__(self, name, failure_threshold=5, open_seconds=30.0, half_open_max=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max = half_open_max
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._opens = 0
+        self._rejected = 0
+
+    def allow(self):
+        """
+        判断是否放行本次调用,不放行时抛出CircuitOpenError
+
+        返回:
+            bool: 是否为半开状态下的探测请求
+        """
+        with self._lock:
+            if self._state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, remaining)
+                self._state = HALF_OPEN
+                self._probes = 0
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_max:
+                    self._rejected += 1
+                    raise CircuitOpenError(self.name, self.open_seconds)
+                self._probes += 1
+                return True
+            return False
+
+    def record_success(self, probe=False):
+        with self._lock:
+            if probe:
+                self._probes = max(0, self._probes - 1)
+            self._failures = 0
+            self._state = CLOSED
+
+    def record_failure(self, probe=False):
+        with self._lock:
+            if probe:
+                self._probes = max(0, self._probes - 1)
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._opens += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self, probe=False):
+        """
+        调用被取消(结果未知)时归还探测名额,不改变熔断状态
+        """
+        if probe:
+            with self._lock:
+                self._probes = max(0, self._probes - 1)
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def status(self):
+        """
+        熔断器状态(供健康检查接口使用)
+        """
+        state = self.state
+        with self._lock:
+            retry_after = max(0.0, self._opened_at + self.open_seconds - time.monotonic()) if state == OPEN else 0.0
+            return {
+                'state': state,
+                'consecutiveFailures': self._failures,
+                'retryAfter': round(retry_after, 1),
+                'opens': self._opens,
+                'rejected': self._rejected
+            }
+
+
+class RetryBudget:
+    """
+    全局重试预算: 时间窗口内的重试次数不超过请求数的ratio倍(至少允许min_retries次)
+
+    参数:
+        ratio (float): 重试数占请求数的比例上限
+        window (float): 统计窗口(秒)
+        min_retries (int): 窗口内始终允许的最少重试次数(低流量时仍可重试)
+    """
+
+    def __init__(self, ratio=0.2, window=10.0, min_retries=3):
+        self.ratio = ratio
+        self.window = window
+        self.min_retries = min_retries
+        self._lock = threading.Lock()
+        self._requests = deque()
+        self._retries = deque()
+        self._exhausted = 0
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._requests.append(now)
+            self._trim(now)
+
+    def try_spend(self):
+        """
+        申请一次重试(对冲请求同样消耗预算)
+
+        返回:
+            bool: 预算是否允许
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._retries) >= max(self.min_retries, self.ratio * len(self._requests)):
+                self._exhausted += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def stats(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                'requests': len(self._requests),
+                'retries': len(self._retries),
+                'limit': max(self.min_retries, int(self.ratio * len(self._requests))),
+                'exhausted': self._exhausted
+            }
+
+    def _trim(self, now):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+
+class LatencyTracker:
+    """
+    最近N次成功调用的延迟,用于计算对冲阈值
+
+    参数:
+        size (int): 保留的样本数
+    """
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p, min_samples=20):
+        """
+        分位数(样本不足时返回None)
+        """
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class ResilientCaller:
+    """
+    带截止时间、重试、熔断和对冲的上游调用器
+
+    参数:
+        name (str): 名称
+        breaker (CircuitBreaker): 熔断器
+        budget (RetryBudget): 重试预算(可多个调用器共享)
+        executor (ThreadPoolExecutor): 执行上游调用的线程池(同时限制并发调用数)
+        deadline (float): 单次调用(含重试)的截止时间(秒)
+        max_attempts (int): 最多尝试次数(含首次)
+        backoff_base (float): 退避基数(秒)
+        backoff_max (float): 单次退避上限(秒)
+        hedge (bool): 是否启用对冲请求
+        hedge_percentile (float): 对冲阈值使用的延迟分位数
+
+    说明:
+        上游调用在线程池中执行,超过截止时间后调用方立即返回;
+        还在线程池中排队的调用被取消,已发出的请求在后台自然结束,
+        通过on_abandon回调交给调用方继续计入并发名额,直到真正结束
+    """
+
+    def __init__(self, name, breaker, budget, executor, deadline=30.0, max_attempts=3,
+                 backoff_base=0.2, backoff_max=2.0, hedge=False, hedge_percentile=0.95):
+        self.name = name
+        self.breaker = breaker
+        self.budget = budget
+        self.executor = executor
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self._retries = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._timeouts = 0
+        self._cancelled = 0
+        self._abandoned = 0
+
+    def call(self, attempt, on_abandon=None):
+        """
+        执行上游调用
+
+        参数:
+            attempt (callable): 单次调用函数,成功返回结果,失败抛出异常
+                                (UpstreamError.retryable为False时不重试)
+            on_abandon (callable): 可选,调用方不再等待但仍在执行的调用(Future)逐个传入,
+                                   用于继续占用准入名额(如Slot.hold)
+
+        返回:
+            attempt()的返回值
+
+        异常:
+            CircuitOpenError: 熔断中
+            DeadlineExceeded: 超过截止时间
+            UpstreamError/其他异常: 最后一次调用的错误
+        """
+        deadline = time.monotonic() + self.deadline
+        self.budget.record_request()
+        attempts = 0
+        while True:
+            probe = self.breaker.allow()
+            attempts += 1
+            try:
+                result = self._attempt(attempt, deadline, on_abandon)
+            except UpstreamError as e:
+                if e.retryable or isinstance(e, DeadlineExceeded):
+                    self.breaker.record_failure(probe)
+                else:
+                    # 参数错误等不代表上游故障,不计入熔断
+                    self.breaker.record_success(probe)
+                if not e.retryable:
+                    raise
+                error = e
+            except Exception as e:
+                self.breaker.record_failure(probe)
+                error = e
+            else:
+                self.breaker.record_success(probe)
+                return result
+
+            backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempts)))
+            if (attempts >= self.max_attempts or time.monotonic() + backoff >= deadline
+                    or not self.budget.try_spend()):
+                raise error
+            with self._lock:
+                self._retries += 1
+            time.sleep(backoff)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'retries': self._retries,
+                'hedges': self._hedges,
+                'hedgeWins': self._hedge_wins,
+                'timeouts': self._timeouts,
+                'cancelled': self._cancelled,
+                'abandonedInFlight': self._abandoned,
+                'p95Seconds': self.latency.percentile(0.95)
+            }
+
+    def _attempt(self, attempt, deadline, on_abandon=None):
+        """
+        执行一次调用(必要时附带一个对冲请求),等待不超过截止时间
+        """
+        started = time.monotonic()
+        futures = {self.executor.submit(attempt): 'primary'}
+
+        hedge_after = self.latency.percentile(self.hedge_percentile) if self.hedge else None
+        if hedge_after is not None:
+            done, _ = wait(futures, timeout=min(hedge_after, max(0.0, deadline - time.monotonic())))
+            if not done and time.monotonic() < deadline and self.budget.try_spend():
+                with self._lock:
+                    self._hedges += 1
+                futures[self.executor.submit(attempt)] = 'hedge'
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                self.latency.add(time.monotonic() - started)
+                if futures[future] == 'hedge':
+                    with self._lock:
+                        self._hedge_wins += 1
+                # 对冲中落败的另一个请求不再需要
+                self._abandon([f for f in futures if not f.done()], on_abandon)
+                return result
+        if error is not None and not pending:
+            raise error
+        self._abandon(pending, on_abandon)
+        with self._lock:
+            self._timeouts += 1
+        raise DeadlineExceeded(self.deadline)
+
+    def _abandon(self, futures, on_abandon):
+        """
+        放弃等待的调用: 还在排队的直接取消,已开始的交给on_abandon并计数到结束
+        """
+        for future in futures:
+            if future.cancel():
+                with self._lock:
+                    self._cancelled += 1
+                continue
+            with self._lock:
+                self._abandoned += 1
+            future.add_done_callback(self._abandoned_done)
+            if on_abandon is not None:
+                on_abandon(future)
+
+    def _abandoned_done(self, future):
+        with self._lock:
+            self._abandoned -= 1
+
+
+def create_executor(max_workers, name='upstream'):
+    """
+    创建执行上游调用的线程池
+    """
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
@@ -0,0 +1,149 @@
+"""
+PDSA数字分身智能体 - 生产环境启动器
+
+功能说明:
+1. 使用gunicorn多进程/多线程运行服务,替代Flask开发服务器
+2. worker类型可选: gthread(线程) / gevent(协程,适合大量等待百炼响应的长连接) / sync
+3. 收到SIGTERM后停止接收新请求,等待进行中的请求完成(最长SERVER_GRACEFUL_TIMEOUT秒)
+4. 定时清理等后台任务通过文件锁只在一个worker中运行(见leader.py)
+
+使用方法:
+    python serve.py                                  # 使用.env中的SERVER_*配置
+    python serve.py --workers 2 --threads 32
+    python serve.py --worker-class gevent --worker-connections 1000
+
+说明:
+    需要安装gunicorn(gevent模式还需要安装gevent),仅支持Linux/macOS;
+    Windows下请使用 python app.py 运行
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 支持的worker类型
+WORKER_CLASSES = ('gthread', 'gevent', 'sync')
+
+
+def build_options(args):
+    """
+    生成gunicorn配置
+
+    参数:
+        args (Namespace): 命令行参数
+
+    返回:
+        dict: gunicorn配置项
+    """
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'worker_class': args.worker_class,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': args.keepalive,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10 if args.max_requests else 0,
+        # 不预加载应用: 后台线程和主进程锁必须在worker进程中创建
+        'preload_app': False,
+        'accesslog': '-' if args.access_log else None,
+        'errorlog': '-',
+        'worker_exit': _worker_exit,
+    }
+    if args.worker_class == 'gthread':
+        options['threads'] = args.threads
+    elif args.worker_class == 'gevent':
+        options['worker_connections'] = args.worker_connections
+    return options
+
+
+def _worker_exit(server, worker):
+    """
+    worker退出时写出队列中的日志和统计快照,并释放后台任务主进程锁,使其他worker尽快接替
+    """
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.shutdown_background_services()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='PDSA生产环境启动器')
+    parser.add_argument('--host', default=os.getenv('SERVER_HOST', '0.0.0.0'), help='监听地址')
+    parser.add_argument('--port', type=int, default=int(os.getenv('SERVER_PORT', os.getenv('FLASK_PORT', 5000))),
+                        help='监听端口')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SERVER_WORKERS', 1)),
+                        help='worker进程数')
+    parser.add_argument('--worker-class', choices=WORKER_CLASSES,
+                        default=os.getenv('SERVER_WORKER_CLASS', 'gthread'), help='worker类型')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('SERVER_THREADS', 16)),
+                        help='每个worker的线程数(gthread)')
+    parser.add_argument('--worker-connections', type=int,
+                        default=int(os.getenv('SERVER_WORKER_CONNECTIONS', 1000)),
+                        help='每个worker的最大并发连接数(gevent)')
+    parser.add_argument('--timeout', type=int, default=int(os.getenv('SERVER_TIMEOUT', 300)),
+                        help='worker无响应超时(秒),需大于最长的文档生成/流式对话时间')
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.getenv('SERVER_GRACEFUL_TIMEOUT', 30)),
+                        help='停止时等待进行中请求完成的时间(秒)')
+    parser.add_argument('--keepalive', type=int, default=int(os.getenv('SERVER_KEEPALIVE', 5)),
+                        help='keep-alive连接保持时间(秒)')
+    parser.add_argument('--max-requests', type=int, default=int(os.getenv('SERVER_MAX_REQUESTS', 0)),
+                        help='worker处理该数量请求后重启(0表示不重启)')
+    parser.add_argument('--access-log', action='store_true',
+                        default=os.getenv('SERVER_ACCESS_LOG', 'false').lower() == 'true',
+                        help='输出访问日志')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("❌ 未安装gunicorn: pip install gunicorn (Windows下请使用 python app.py)")
+        return 1
+    if args.worker_class == 'gevent':
+        try:
+            import gevent  # noqa: F401
+        except ImportError:
+            print("❌ gevent模式需要安装gevent: pip install gevent")
+            return 1
+
+    class PDSAServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            # 在worker进程中导入应用(gevent模式下此时已完成monkey patch)
+            sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+            from app import create_app
+            return create_app()
+
+    print("=" * 60)
+    print("🤖 PDSA数字分身智能体 - 生产模式")
+    print("=" * 60)
+    print(f"📌 监听地址: {args.host}:{args.port}")
+    concurrency = (f"{args.threads}线程" if args.worker_class == 'gthread'
+                   else f"{args.worker_connections}连接" if args.worker_class == 'gevent' else '单线程')
+    print(f"📌 worker: {args.workers} × {args.worker_class}({concurrency})")
+    print("=" * 60)
+
+    PDSAServer(build_options(args)).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
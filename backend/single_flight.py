@@ -0,0 +1,108 @@
+"""
+PDSA数字分身智能体 - 请求合并模块
+
+功能说明:
+1. 相同键的并发调用只执行一次,其余调用等待并共享结果
+2. 执行失败时所有等待者收到同一个异常
+3. 统计实际执行次数与被合并的请求数
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import threading
+
+
+class _Call:
+    """
+    一次进行中的调用,保存结果供等待者读取
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    单飞(single-flight)请求合并器
+
+    用法:
+        flight = SingleFlight()
+        reply = flight.do(key, lambda: expensive_call())
+
+    说明:
+        - 第一个到达的调用成为执行者(leader),真正执行函数
+        - 执行期间到达的同键调用阻塞等待,直接复用执行者的结果
+        - 执行结束后立即移除该键,之后的调用会重新执行
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._executions = 0
+        self._coalesced = 0
+        self._max_waiters = 0
+
+    def do(self, key, fn):
+        """
+        执行或加入一次调用
+
+        参数:
+            key (str): 合并键,相同键的并发调用会被合并
+            fn (callable): 无参函数,仅由执行者调用
+
+        返回:
+            fn的返回值
+
+        异常:
+            fn抛出的异常会原样抛给执行者和所有等待者
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._coalesced += 1
+                self._max_waiters = max(self._max_waiters, call.waiters)
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """
+        获取合并统计信息
+
+        返回:
+            dict: 统计信息
+        """
+        with self._lock:
+            total = self._executions + self._coalesced
+            return {
+                'inFlight': len(self._calls),
+                'executions': self._executions,
+                'coalesced': self._coalesced,
+                'coalescedRate': round(self._coalesced / total, 4) if total else 0.0,
+                'maxWaiters': self._max_waiters
+            }
@@ -0,0 +1,710 @@
+"""
+PDSA数字分身智能体 - 增量站点抓取
+
+功能说明:
+1. 从种子URL或站点地图出发,沿同站链接抓取页面(限制抓取深度和页面数)
+2. 遵守robots.txt(含Crawl-delay),同一域名的请求之间保持礼貌间隔
+3. 多线程并发抓取,复用共享抓取器的连接池;文档生成使用独立的并发上限
+4. 按正文指纹判断页面是否变化,只有变化的页面才重新生成文档;
+   已是最新的页面使用条件请求,服务器返回304时不再下载和解析
+5. 待抓取队列和页面状态持久化到状态文件,中断的抓取在重启后从断点继续
+
+作者: PDSA Team
+版本: v1.0
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from html.parser import HTMLParser
+from urllib import robotparser
+from urllib.parse import urldefrag, urljoin, urlparse, urlunparse
+
+import requests
+
+from doc_index import normalize_source
+from web_fetcher import decode_body
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl,跳过跨进程抓取锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 不抓取的资源扩展名(图片、压缩包、二进制文档等)
+SKIPPED_EXTENSIONS = (
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.css', '.js', '.json', '.xml',
+    '.pdf', '.zip', '.gz', '.tar', '.rar', '.7z', '.exe', '.dmg', '.msi', '.apk',
+    '.mp3', '.mp4', '.mov', '.avi', '.woff', '.woff2', '.ttf'
+)
+
+# robots.txt中Crawl-delay的上限(秒),避免异常配置使抓取停滞
+MAX_CRAWL_DELAY = 60.0
+
+# 状态文件最短写入间隔(秒)
+SAVE_INTERVAL = 5.0
+
+# 抓取状态
+RUNNING = 'running'
+
+
+class CrawlerBusyError(Exception):
+    """
+    已有抓取正在运行(本进程或其他进程)
+    """
+
+
+def normalize_url(url):
+    """
+    规范化URL: 去除片段、小写协议和域名、去除默认端口、空路径补为/
+
+    参数:
+        url (str): URL
+
+    返回:
+        str|None: 规范化后的URL,非http(s)链接返回None
+    """
+    url, _ = urldefrag((url or '').strip())
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    if scheme not in ('http', 'https') or not parsed.hostname:
+        return None
+    netloc = parsed.hostname.lower()
+    if parsed.port and (scheme, parsed.port) not in (('http', 80), ('https', 443)):
+        netloc = f"{netloc}:{parsed.port}"
+    return urlunparse((scheme, netloc, parsed.path or '/', parsed.params, parsed.query, ''))
+
+
+def url_scope(url):
+    """
+    URL所在的抓取范围: (域名, 目录前缀),只跟随同一域名且位于该目录下的链接
+
+    例如 https://docs.qoder.com/zh/user-guide/chat 的范围为 ("docs.qoder.com", "/zh/user-guide/")
+    """
+    parsed = urlparse(url)
+    return parsed.netloc, parsed.path[:parsed.path.rfind('/') + 1] or '/'
+
+
+class _LinkParser(HTMLParser):
+    """
+    收集<a href>链接和<base href>
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.base = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            attrs = dict(attrs)
+            href = attrs.get('href')
+            if href and 'nofollow' not in (attrs.get('rel') or '').lower():
+                self.links.append(href)
+        elif tag == 'base' and self.base is None:
+            self.base = dict(attrs).get('href')
+
+
+def extract_links(html, base_url):
+    """
+    提取页面中的链接
+
+    参数:
+        html (str): 网页HTML
+        base_url (str): 页面URL(用于解析相对链接)
+
+    返回:
+        list: 规范化后的http(s)链接(去重,保持页面中的顺序)
+    """
+    parser = _LinkParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        logger.debug("链接解析中断(%s): %s", base_url, e)
+    base = urljoin(base_url, parser.base) if parser.base else base_url
+    links = []
+    for href in parser.links:
+        url = normalize_url(urljoin(base, href))
+        if url and not urlparse(url).path.lower().endswith(SKIPPED_EXTENSIONS):
+            links.append(url)
+    return list(dict.fromkeys(links))
+
+
+def content_fingerprint(text):
+    """
+    正文指纹: 归一化空白后的SHA256(排版空白变化不视为内容变化)
+    """
+    return hashlib.sha256(normalize_source(text).encode('utf-8')).hexdigest()
+
+
+class RobotsCache:
+    """
+    按域名缓存的robots.txt规则
+
+    参数:
+        fetcher (WebFetcher): 抓取器
+        user_agent (str): 匹配robots.txt规则使用的爬虫名称
+        ttl (float): 规则缓存时间(秒)
+
+    说明:
+        按RFC 9309处理: robots.txt返回4xx时视为无限制,5xx或网络错误时视为全部禁止
+        (本轮抓取内不再重试,下次缓存过期后重新获取)
+    """
+
+    def __init__(self, fetcher, user_agent, ttl=3600.0):
+        self.fetcher = fetcher
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self._parsers = {}
+        self._lock = threading.Lock()
+
+    def allowed(self, url):
+        return self._parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url):
+        """
+        robots.txt声明的Crawl-delay(秒),未声明时返回None
+        """
+        delay = self._parser(url).crawl_delay(self.user_agent)
+        return min(float(delay), MAX_CRAWL_DELAY) if delay is not None else None
+
+    def _parser(self, url):
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        now = time.monotonic()
+        with self._lock:
+            entry = self._parsers.get(origin)
+            if entry and now - entry[1] < self.ttl:
+                return entry[0]
+
+        parser = robotparser.RobotFileParser(f"{origin}/robots.txt")
+        try:
+            _, body = self.fetcher.get_bytes(parser.url)
+            parser.parse(body.decode('utf-8', errors='replace').splitlines())
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else 500
+            if 400 <= status < 500:
+                parser.allow_all = True
+            else:
+                parser.disallow_all = True
+        except Exception as e:
+            logger.warning("robots.txt获取失败,暂停抓取该站点(%s): %s", origin, e)
+            parser.disallow_all = True
+
+        with self._lock:
+            self._parsers[origin] = (parser, now)
+        return parser
+
+
+class HostThrottle:
+    """
+    同一域名的请求间隔控制: 每个请求的开始时间与上一个请求至少相隔delay秒
+    """
+
+    def __init__(self):
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host, delay, stop_event=None):
+        """
+        等待轮到该域名的下一个请求
+
+        返回:
+            bool: 是否可以发起请求(等待期间抓取被停止时返回False)
+        """
+        now = time.monotonic()
+        with self._lock:
+            start = max(now, self._next.get(host, 0.0))
+            self._next[host] = start + delay
+        if start <= now:
+            return True
+        if stop_event is not None:
+            return not stop_event.wait(start - now)
+        time.sleep(start - now)
+        return True
+
+
+class SiteCrawler:
+    """
+    增量站点抓取器
+
+    参数:
+        fetcher (WebFetcher): 共享抓取器(连接池)
+        extract_fn (callable): 正文提取函数,签名 extract_fn(html) -> str
+        generate_fn (callable): 文档生成函数,签名 generate_fn(url, text) -> dict(含filePath)
+        state_path (str): 状态文件路径
+        sitemap_fn (callable): 站点地图展开函数,签名 sitemap_fn(sitemap_url, max_urls) -> list
+        workers (int): 并发抓取线程数
+        generate_workers (int): 文档生成并发数
+        delay (float): 同一域名的最小请求间隔(秒),robots.txt的Crawl-delay更大时以其为准
+        user_agent (str): 匹配robots.txt规则的爬虫名称
+        respect_robots (bool): 是否遵守robots.txt
+
+    状态文件格式:
+        {
+            "crawl": {"id", "status", "seeds", "sitemaps", "scopes", "maxDepth", "maxPages",
+                      "force", "startedAt", "finishedAt", "counts", "error"},
+            "frontier": [[url, depth], ...],  # 未完成的页面(含正在处理的页面)
+            "seen": [url, ...],               # 本轮已入队的页面
+            "pages": {url: {"fingerprint", "generatedFingerprint", "etag", "lastModified",
+                            "links", "fileName", "status", "error", "crawledAt", "changedAt"}}
+        }
+
+    说明:
+        页面生成成功后才记录generatedFingerprint,生成中断的页面仍留在frontier中,
+        恢复后重新抓取;pages跨多轮抓取保留,用于判断页面是否变化
+    """
+
+    def __init__(self, fetcher, extract_fn, generate_fn, state_path, sitemap_fn=None, workers=4,
+                 generate_workers=2, delay=1.0, user_agent='PDSA-Crawler', respect_robots=True):
+        self.fetcher = fetcher
+        self.extract_fn = extract_fn
+        self.generate_fn = generate_fn
+        self.state_path = state_path
+        self.sitemap_fn = sitemap_fn
+        self.workers = max(1, workers)
+        self.generate_workers = max(1, generate_workers)
+        self.delay = delay
+        self.respect_robots = respect_robots
+        self.robots = RobotsCache(fetcher, user_agent)
+        self.throttle = HostThrottle()
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_fd = None
+        self._crawl = None
+        self._pages = {}
+        self._frontier = deque()
+        self._inflight = {}
+        self._seen = set()
+        self._last_save = 0.0
+        self._load_state()
+
+    # ----------------------------------------
+    # 对外接口
+    # ----------------------------------------
+
+    def start(self, seeds=None, sitemaps=None, max_depth=2, max_pages=200, force=False):
+        """
+        开始新一轮抓取(在后台线程中运行)
+
+        参数:
+            seeds (list): 种子URL
+            sitemaps (list): 站点地图地址,其中的页面作为种子
+            max_depth (int): 从种子出发跟随链接的最大层数(0表示只抓取种子)
+            max_pages (int): 本轮最多抓取的页面数
+            force (bool): 忽略指纹,所有页面都重新生成文档
+
+        返回:
+            dict: 抓取状态
+
+        异常:
+            CrawlerBusyError: 已有抓取正在运行
+            ValueError: 没有有效的种子
+        """
+        seeds = [url for url in (normalize_url(seed) for seed in seeds or []) if url]
+        sitemaps = [url for url in (normalize_url(sitemap) for sitemap in sitemaps or []) if url]
+        if not seeds and not sitemaps:
+            raise ValueError("请提供种子URL或站点地图地址")
+
+        self._acquire_ownership()
+        with self._lock:
+            self._crawl = {
+                'id': uuid.uuid4().hex,
+                'status': RUNNING,
+                'seeds': seeds,
+                'sitemaps': sitemaps,
+                'scopes': sorted({url_scope(url) for url in seeds + sitemaps}),
+                'maxDepth': max(0, int(max_depth)),
+                'maxPages': max(1, int(max_pages)),
+                'force': bool(force),
+                'startedAt': _now(),
+                'finishedAt': None,
+                'counts': {},
+                'error': None,
+                'pid': os.getpid()
+            }
+            self._frontier = deque()
+            self._inflight = {}
+            self._seen = set()
+            for url in seeds:
+                self._enqueue_locked(url, 0)
+        self._run_in_background(expand_sitemaps=True)
+        return self.status()
+
+    def resume(self, include_stopped=False):
+        """
+        继续上次中断的抓取(服务重启后由后台任务主进程调用)
+
+        参数:
+            include_stopped (bool): 是否同时继续被手动停止的抓取
+
+        返回:
+            bool: 是否恢复了抓取
+        """
+        if self.running:
+            return False
+        resumable = (RUNNING, 'stopped') if include_stopped else (RUNNING,)
+        with self._lock:
+            self._load_state()
+            crawl = self._crawl
+            if not crawl or crawl['status'] not in resumable or not self._frontier:
+                return False
+        try:
+            self._acquire_ownership()
+        except CrawlerBusyError:
+            return False
+        with self._lock:
+            crawl['status'] = RUNNING
+            crawl['finishedAt'] = None
+        logger.info("恢复中断的抓取 %s: 剩余%d个页面", crawl['id'], len(self._frontier))
+        self._run_in_background(expand_sitemaps=False)
+        return True
+
+    def stop(self):
+        """
+        停止当前抓取: 不再发起新的请求,正在处理的页面完成后结束
+
+        返回:
+            bool: 是否有正在运行的抓取
+        """
+        if not self.running:
+            return False
+        self._stop.set()
+        return True
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self):
+        """
+        抓取状态(本进程没有运行抓取时读取状态文件,可查看其他进程中的抓取)
+
+        返回:
+            dict: {"crawl", "pending", "inflight", "pages", "runningHere"}
+        """
+        if not self.running:
+            with self._lock:
+                self._load_state()
+        with self._lock:
+            return {
+                'crawl': dict(self._crawl) if self._crawl else None,
+                'pending': len(self._frontier),
+                'inflight': len(self._inflight),
+                'pages': len(self._pages),
+                'runningHere': self.running
+            }
+
+    def pages(self, limit=100):
+        """
+        最近抓取的页面状态
+
+        返回:
+            list: [{"url", "status", "fileName", "crawledAt", "changedAt", "error"}]
+        """
+        with self._lock:
+            items = [
+                {
+                    'url': url,
+                    'status': page.get('status'),
+                    'fileName': page.get('fileName'),
+                    'crawledAt': page.get('crawledAt'),
+                    'changedAt': page.get('changedAt'),
+                    'error': page.get('error')
+                }
+                for url, page in self._pages.items()
+            ]
+        items.sort(key=lambda item: item['crawledAt'] or '', reverse=True)
+        return items[:limit]
+
+    # ----------------------------------------
+    # 抓取流程
+    # ----------------------------------------
+
+    def _run_in_background(self, expand_sitemaps):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(expand_sitemaps,), name='site-crawler', daemon=True)
+        self._thread.start()
+
+    def _run(self, expand_sitemaps):
+        """
+        调度循环: 按广度优先从frontier取页面交给抓取线程,全部完成后结束
+        """
+        crawl = self._crawl
+        fetch_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='crawl-fetch')
+        generate_pool = ThreadPoolExecutor(max_workers=self.generate_workers, thread_name_prefix='crawl-generate')
+        slots = threading.Semaphore(self.workers + self.generate_workers)
+        idle = threading.Condition(self._lock)
+        try:
+            if expand_sitemaps and crawl['sitemaps'] and self.sitemap_fn:
+                for sitemap in crawl['sitemaps']:
+                    try:
+                        urls = self.sitemap_fn(sitemap, crawl['maxPages'])
+                    except Exception as e:
+                        logger.error("站点地图抓取失败(%s): %s", sitemap, e)
+                        self._count('sitemapErrors')
+                        continue
+                    with self._lock:
+                        for url in urls:
+                            url = normalize_url(url)
+                            if url:
+                                self._enqueue_locked(url, 0)
+            self._save(force=True)
+
+            while not self._stop.is_set():
+                slots.acquire()
+                with idle:
+                    while not self._frontier and self._inflight and not self._stop.is_set():
+                        idle.wait(1.0)
+                    if self._stop.is_set() or not self._frontier:
+                        slots.release()
+                        break
+                    url, depth = self._frontier.popleft()
+                    self._inflight[url] = depth
+
+                def finish(url=url):
+                    with idle:
+                        self._inflight.pop(url, None)
+                        idle.notify_all()
+                    slots.release()
+                    self._save()
+
+                fetch_pool.submit(self._process, url, depth, generate_pool, finish)
+
+            fetch_pool.shutdown(wait=True)
+            generate_pool.shutdown(wait=True)
+            with self._lock:
+                crawl['status'] = 'stopped' if self._stop.is_set() else 'done'
+                crawl['finishedAt'] = _now()
+            logger.info("抓取%s结束(%s): %s", crawl['id'], crawl['status'], crawl['counts'])
+        except Exception as e:
+            logger.exception("抓取%s异常终止", crawl['id'])
+            with self._lock:
+                crawl['status'] = 'failed'
+                crawl['error'] = str(e)
+                crawl['finishedAt'] = _now()
+            fetch_pool.shutdown(wait=False)
+            generate_pool.shutdown(wait=False)
+        finally:
+            self._save(force=True)
+            self._release_ownership()
+
+    def _process(self, url, depth, generate_pool, finish):
+        """
+        抓取单个页面: robots检查 -> 礼貌等待 -> 条件请求 -> 提取正文和链接 -> 按指纹决定是否生成文档
+        """
+        handed_off = False
+        try:
+            if self._stop.is_set():
+                self._requeue(url, depth)
+                return
+            if self.respect_robots and not self.robots.allowed(url):
+                self._record(url, 'robots_disallowed')
+                return
+            delay = self.delay
+            if self.respect_robots:
+                delay = max(delay, self.robots.crawl_delay(url) or 0.0)
+            if not self.throttle.wait(urlparse(url).netloc, delay, self._stop):
+                self._requeue(url, depth)
+                return
+
+            with self._lock:
+                page = dict(self._pages.get(url) or {})
+            force = self._crawl['force']
+            up_to_date = page.get('fingerprint') and page.get('fingerprint') == page.get('generatedFingerprint')
+            headers = {}
+            if up_to_date and not force:
+                if page.get('etag'):
+                    headers['If-None-Match'] = page['etag']
+                if page.get('lastModified'):
+                    headers['If-Modified-Since'] = page['lastModified']
+
+            response, body = self.fetcher.get_bytes(url, headers=headers)
+            self._count('fetched')
+            if response.status_code == 304:
+                self._count('notModified')
+                self._enqueue_links(page.get('links') or [], depth)
+                self._record(url, 'unchanged')
+                return
+
+            content_type = response.headers.get('Content-Type', '').lower()
+            if content_type and 'html' not in content_type:
+                self._record(url, 'skipped', error=f"非HTML页面({content_type.split(';')[0]})")
+                return
+
+            html = decode_body(body, response)
+            text = self.extract_fn(html)
+            links = [link for link in extract_links(html, normalize_url(response.url) or url)
+                     if self._in_scope(link)]
+            fingerprint = content_fingerprint(text)
+            self._record(url, None, fingerprint=fingerprint, links=links,
+                         etag=response.headers.get('ETag'),
+                         lastModified=response.headers.get('Last-Modified'))
+            self._enqueue_links(links, depth)
+
+            if not text.strip():
+                self._record(url, 'empty')
+            elif fingerprint == page.get('generatedFingerprint') and not force:
+                self._record(url, 'unchanged')
+            else:
+                generate_pool.submit(self._generate, url, text, fingerprint, finish)
+                handed_off = True
+        except Exception as e:
+            logger.warning("页面抓取失败(%s): %s", url, e)
+            self._record(url, 'failed', error=f"网页爬取失败: {str(e)}")
+        finally:
+            if not handed_off:
+                finish()
+
+    def _generate(self, url, text, fingerprint, finish):
+        """
+        为内容变化的页面生成文档,成功后记录已生成的指纹
+        """
+        try:
+            if self._stop.is_set():
+                with self._lock:
+                    depth = self._inflight.get(url, 0)
+                self._requeue(url, depth)
+                return
+            result = self.generate_fn(url, text)
+            file_name = os.path.basename(result.get('filePath') or '') or None
+            self._record(url, 'changed', generatedFingerprint=fingerprint, fileName=file_name,
+                         changedAt=_now())
+        except Exception as e:
+            logger.warning("页面文档生成失败(%s): %s", url, e)
+            self._record(url, 'failed', error=f"生成文档失败: {str(e)}")
+        finally:
+            finish()
+
+    # ----------------------------------------
+    # 内部方法
+    # ----------------------------------------
+
+    def _in_scope(self, url):
+        parsed = urlparse(url)
+        return any(parsed.netloc == host and parsed.path.startswith(prefix)
+                   for host, prefix in self._crawl['scopes'])
+
+    def _requeue(self, url, depth):
+        """
+        抓取已停止: 页面放回frontier,恢复时重新抓取
+        """
+        with self._lock:
+            self._frontier.appendleft((url, depth))
+
+    def _enqueue_links(self, links, depth):
+        if depth >= self._crawl['maxDepth']:
+            return
+        with self._lock:
+            for link in links:
+                if self._in_scope(link):
+                    self._enqueue_locked(link, depth + 1)
+
+    def _enqueue_locked(self, url, depth):
+        if url in self._seen or len(self._seen) >= self._crawl['maxPages']:
+            return
+        self._seen.add(url)
+        self._frontier.append((url, depth))
+
+    def _record(self, url, status, error=None, **fields):
+        """
+        更新页面状态(status为None时只更新字段),并累加本轮计数
+        """
+        with self._lock:
+            page = self._pages.setdefault(url, {})
+            page.update(fields)
+            if status is not None:
+                page['status'] = status
+                page['error'] = error
+                page['crawledAt'] = _now()
+                counts = self._crawl['counts']
+                counts[status] = counts.get(status, 0) + 1
+
+    def _count(self, name):
+        with self._lock:
+            counts = self._crawl['counts']
+            counts[name] = counts.get(name, 0) + 1
+
+    def _save(self, force=False):
+        """
+        原子写入状态文件(距上次写入不足SAVE_INTERVAL秒时跳过,force为True时立即写入)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_save < SAVE_INTERVAL:
+                return
+            self._last_save = now
+            state = {
+                'crawl': self._crawl,
+                'frontier': [[url, depth] for url, depth in self._inflight.items()]
+                            + [[url, depth] for url, depth in self._frontier],
+                'seen': sorted(self._seen),
+                'pages': self._pages
+            }
+            tmp_path = f"{self.state_path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False)
+                os.replace(tmp_path, self.state_path)
+            except Exception as e:
+                logger.error("写入抓取状态失败: %s", e)
+
+    def _load_state(self):
+        """
+        读取状态文件(调用方需持有锁或在初始化中调用),不存在或损坏时为空状态
+        """
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.error("读取抓取状态失败: %s", e)
+            return
+        self._crawl = state.get('crawl')
+        self._pages = state.get('pages') or {}
+        self._frontier = deque((url, depth) for url, depth in state.get('frontier') or [])
+        self._inflight = {}
+        self._seen = set(state.get('seen') or [])
+        if self._crawl:
+            self._crawl['scopes'] = [tuple(scope) for scope in self._crawl.get('scopes') or []]
+
+    def _acquire_ownership(self):
+        """
+        获取跨进程抓取锁,保证同一时间只有一个抓取在运行
+        """
+        if self.running:
+            raise CrawlerBusyError("抓取正在运行中")
+        if fcntl is None or self._lock_fd is not None:
+            return
+        fd = os.open(f"{self.state_path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            raise CrawlerBusyError("抓取正在其他进程中运行")
+        self._lock_fd = fd
+
+    def _release_ownership(self):
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+def _now():
+    """
+    当前时间字符串
+    """
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -5,6 +5,7 @@ const API_BASE_URL = window.location.origin;
 const webUrlInput = document.getElementById('webUrl');
 const webContentInput = document.getElementById('webContent');
 const fileNameInput = document.getElementById('fileName');
+const forceRegenerateInput = document.getElementById('forceRegenerate');
 const generateBtn = document.getElementById('generateBtn');
 const btnText = document.getElementById('btnText');
 const btnLoading = document.getElementById('btnLoading');
@@ -18,6 +19,20 @@ const errorMessage = document.getElementById('errorMessage');
 // 生成按钮点击事件
 generateBtn.addEventListener('click', handleGenerate);
 
+// 任务阶段提示文本
+const JOB_STAGE_TEXT = {
+    queued: '⏳ 排队中...',
+    fetching: '⏳ 抓取网页中...',
+    generating: '⏳ AI整理中...',
+    saving: '⏳ 保存文档中...'
+};
+
+// 任务状态轮询间隔(毫秒)
+const JOB_POLL_INTERVAL = 1500;
+
+// 进行中任务ID的本地存储键,页面刷新后继续跟踪
+const PENDING_JOB_KEY = 'pdsa.pendingDocJob';
+
 async function handleGenerate() {
     // 获取输入内容
     const url = webUrlInput.value.trim();
@@ -35,8 +50,8 @@ async function handleGenerate() {
     hideResults();
 
     try {
-        // 调用后端API
-        const response = await fetch(`${API_BASE_URL}/api/admin/generate-doc`, {
+        // 提交后台任务,立即返回任务ID
+        const response = await fetch(`${API_BASE_URL}/api/admin/generate-doc/jobs`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -44,25 +59,73 @@ async function handleGenerate() {
             body: JSON.stringify({
                 url: url || null,
                 content: content || null,
-                fileName: fileName || null
+                fileName: fileName || null,
+                force: forceRegenerateInput.checked
             })
         });
 
         const data = await response.json();
 
-        if (data.success) {
-            showResult(data);
-        } else {
+        if (!data.success) {
             showError(data.error || '生成失败,请重试');
+            setLoading(false);
+            return;
         }
+
+        localStorage.setItem(PENDING_JOB_KEY, data.jobId);
+        await waitForJob(data.jobId);
     } catch (error) {
         console.error('请求失败:', error);
         showError('网络错误,请检查后端服务是否正常运行');
+        setLoading(false);
+    }
+}
+
+async function waitForJob(jobId) {
+    // 轮询任务状态直到完成或失败
+    try {
+        while (true) {
+            const response = await fetch(`${API_BASE_URL}/api/admin/generate-doc/jobs/${jobId}`);
+            const data = await response.json();
+
+            if (!data.success) {
+                localStorage.removeItem(PENDING_JOB_KEY);
+                showError(data.error || '任务不存在');
+                return;
+            }
+
+            const job = data.job;
+            if (job.status === 'done') {
+                localStorage.removeItem(PENDING_JOB_KEY);
+                showResult(job.result);
+                return;
+            }
+            if (job.status === 'failed') {
+                localStorage.removeItem(PENDING_JOB_KEY);
+                showError(job.error || '生成失败,请重试');
+                return;
+            }
+
+            btnLoading.textContent = `${JOB_STAGE_TEXT[job.stage] || JOB_STAGE_TEXT.queued} ${job.progress}%`;
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+        }
+    } catch (error) {
+        console.error('查询任务状态失败:', error);
+        showError('网络错误,请检查后端服务是否正常运行');
     } finally {
         setLoading(false);
     }
 }
 
+function resumePendingJob() {
+    // 页面刷新前有未完成的任务时继续跟踪
+    const jobId = localStorage.getItem(PENDING_JOB_KEY);
+    if (jobId) {
+        setLoading(true);
+        waitForJob(jobId);
+    }
+}
+
 function setLoading(isLoading) {
     generateBtn.disabled = isLoading;
     if (isLoading) {
@@ -71,6 +134,7 @@ function setLoading(isLoading) {
     } else {
         btnText.style.display = 'inline-block';
         btnLoading.style.display = 'none';
+        btnLoading.textContent = JOB_STAGE_TEXT.queued;
     }
 }
 
@@ -79,7 +143,9 @@ function showResult(data) {
     resultSection.style.display = 'block';
     
     filePath.textContent = data.filePath;
-    createTime.textContent = data.createTime;
+    createTime.textContent = data.deduplicated
+        ? `${data.createTime}（内容未变化，复用已有文档）`
+        : data.createTime;
     markdownPreview.textContent = data.markdown;
     
     // 滚动到结果区域
@@ -104,3 +170,580 @@ function hideResults() {
 webUrlInput.addEventListener('input', hideResults);
 webContentInput.addEventListener('input', hideResults);
 fileNameInput.addEventListener('input', hideResults);
+
+// ========================================
+// 批量导入
+// ========================================
+const batchUrlsInput = document.getElementById('batchUrls');
+const sitemapUrlInput = document.getElementById('sitemapUrl');
+const batchBtn = document.getElementById('batchBtn');
+const batchBtnText = document.getElementById('batchBtnText');
+const batchBtnLoading = document.getElementById('batchBtnLoading');
+const batchStatus = document.getElementById('batchStatus');
+const batchSummary = document.getElementById('batchSummary');
+const batchItems = document.getElementById('batchItems');
+
+// 批量导入状态文本
+const BATCH_STATUS_TEXT = {
+    pending: '等待中',
+    fetching: '抓取中',
+    queued: '等待生成',
+    generating: '生成中',
+    done: '成功',
+    failed: '失败'
+};
+
+batchBtn.addEventListener('click', handleBatch);
+
+async function handleBatch() {
+    const urls = batchUrlsInput.value.split('\n').map(url => url.trim()).filter(url => url);
+    const sitemap = sitemapUrlInput.value.trim();
+
+    if (urls.length === 0 && !sitemap) {
+        showError('请输入URL列表或站点地图地址');
+        return;
+    }
+
+    setBatchLoading(true);
+    hideResults();
+
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/admin/generate-doc/batch`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                urls: urls,
+                sitemap: sitemap || null
+            })
+        });
+
+        const data = await response.json();
+
+        if (!data.success) {
+            showError(data.error || '批量导入失败');
+            return;
+        }
+
+        await waitForBatch(data.batchId);
+    } catch (error) {
+        console.error('批量导入失败:', error);
+        showError('网络错误,请检查后端服务是否正常运行');
+    } finally {
+        setBatchLoading(false);
+    }
+}
+
+async function waitForBatch(batchId) {
+    // 轮询批次状态直到全部URL处理结束
+    while (true) {
+        const response = await fetch(`${API_BASE_URL}/api/admin/generate-doc/batch/${batchId}`);
+        const data = await response.json();
+
+        if (!data.success) {
+            showError(data.error || '批次不存在');
+            return;
+        }
+
+        renderBatch(data.batch);
+        if (data.batch.finishedAt) {
+            return;
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+    }
+}
+
+function renderBatch(batch) {
+    const summary = batch.summary || {};
+    const finished = (summary.done || 0) + (summary.failed || 0);
+    batchSummary.textContent = `进度 ${finished}/${batch.total}，成功 ${summary.done || 0}，失败 ${summary.failed || 0}`;
+
+    batchItems.innerHTML = '';
+    batch.items.forEach(item => {
+        const row = document.createElement('tr');
+
+        const urlCell = document.createElement('td');
+        urlCell.textContent = item.url;
+
+        const statusCell = document.createElement('td');
+        statusCell.textContent = BATCH_STATUS_TEXT[item.status] || item.status;
+        statusCell.className = `status-${item.status}`;
+
+        const resultCell = document.createElement('td');
+        resultCell.textContent = item.filePath || item.error || '-';
+
+        row.appendChild(urlCell);
+        row.appendChild(statusCell);
+        row.appendChild(resultCell);
+        batchItems.appendChild(row);
+    });
+
+    batchStatus.style.display = 'block';
+}
+
+function setBatchLoading(isLoading) {
+    batchBtn.disabled = isLoading;
+    batchBtnText.style.display = isLoading ? 'none' : 'inline-block';
+    batchBtnLoading.style.display = isLoading ? 'inline-block' : 'none';
+}
+
+// ========================================
+// 站点抓取
+// ========================================
+const crawlSeedsInput = document.getElementById('crawlSeeds');
+const crawlSitemapInput = document.getElementById('crawlSitemap');
+const crawlDepthInput = document.getElementById('crawlDepth');
+const crawlStartBtn = document.getElementById('crawlStartBtn');
+const crawlResumeBtn = document.getElementById('crawlResumeBtn');
+const crawlStopBtn = document.getElementById('crawlStopBtn');
+const crawlRefreshBtn = document.getElementById('crawlRefreshBtn');
+const crawlStatus = document.getElementById('crawlStatus');
+const crawlSummary = document.getElementById('crawlSummary');
+const crawlPages = document.getElementById('crawlPages');
+
+// 抓取状态文本
+const CRAWL_STATUS_TEXT = {
+    running: '抓取中',
+    done: '已完成',
+    stopped: '已停止',
+    failed: '失败'
+};
+
+// 页面状态文本
+const CRAWL_PAGE_STATUS_TEXT = {
+    changed: '已更新',
+    unchanged: '未变化',
+    empty: '无正文',
+    skipped: '已跳过',
+    robots_disallowed: 'robots禁止',
+    failed: '失败'
+};
+
+let crawlPollTimer = null;
+
+crawlStartBtn.addEventListener('click', () => {
+    const seeds = crawlSeedsInput.value.split('\n').map(url => url.trim()).filter(url => url);
+    const sitemap = crawlSitemapInput.value.trim();
+    requestCrawler('POST', {
+        seeds: seeds,
+        sitemaps: sitemap ? [sitemap] : [],
+        maxDepth: parseInt(crawlDepthInput.value, 10) || 0
+    });
+});
+crawlResumeBtn.addEventListener('click', () => requestCrawler('POST', { resume: true }));
+crawlStopBtn.addEventListener('click', () => requestCrawler('DELETE'));
+crawlRefreshBtn.addEventListener('click', () => requestCrawler('GET'));
+
+async function requestCrawler(method, body) {
+    try {
+        const options = { method: method };
+        if (body) {
+            options.headers = { 'Content-Type': 'application/json' };
+            options.body = JSON.stringify(body);
+        }
+        const response = await fetch(`${API_BASE_URL}/api/admin/crawler`, options);
+        const data = await response.json();
+
+        if (!data.success) {
+            showError(data.error || '站点抓取操作失败');
+            return;
+        }
+
+        renderCrawler(data);
+    } catch (error) {
+        console.error('站点抓取操作失败:', error);
+        showError('网络错误,请检查后端服务是否正常运行');
+    }
+}
+
+function renderCrawler(data) {
+    const crawl = data.status.crawl;
+    if (!crawl) {
+        crawlStatus.style.display = 'none';
+        return;
+    }
+
+    const counts = crawl.counts || {};
+    crawlSummary.textContent = `${CRAWL_STATUS_TEXT[crawl.status] || crawl.status}（开始于 ${crawl.startedAt}）：` +
+        `已抓取 ${counts.fetched || 0}，更新 ${counts.changed || 0}，未变化 ${counts.unchanged || 0}，` +
+        `失败 ${counts.failed || 0}，待抓取 ${data.status.pending + data.status.inflight}`;
+
+    crawlPages.innerHTML = '';
+    data.pages.forEach(page => {
+        const row = document.createElement('tr');
+
+        const urlCell = document.createElement('td');
+        urlCell.textContent = page.url;
+
+        const statusCell = document.createElement('td');
+        statusCell.textContent = CRAWL_PAGE_STATUS_TEXT[page.status] || page.status || '-';
+        statusCell.className = `status-${page.status === 'changed' ? 'done' : page.status}`;
+
+        const resultCell = document.createElement('td');
+        resultCell.textContent = page.error || (page.fileName ? `docs/${page.fileName}` : '-');
+
+        row.appendChild(urlCell);
+        row.appendChild(statusCell);
+        row.appendChild(resultCell);
+        crawlPages.appendChild(row);
+    });
+
+    crawlStatus.style.display = 'block';
+
+    // 抓取进行中时定期刷新
+    clearTimeout(crawlPollTimer);
+    if (crawl.status === 'running') {
+        crawlPollTimer = setTimeout(() => requestCrawler('GET'), JOB_POLL_INTERVAL);
+    }
+}
+
+// ========================================
+// 知识库同步
+// ========================================
+const kbSyncBtn = document.getElementById('kbSyncBtn');
+const kbSyncRefreshBtn = document.getElementById('kbSyncRefreshBtn');
+const kbSyncCards = document.getElementById('kbSyncCards');
+const kbSyncHint = document.getElementById('kbSyncHint');
+const kbSyncFiles = document.getElementById('kbSyncFiles');
+
+// 文档同步状态文本
+const KB_SYNC_STATUS_TEXT = {
+    pending: '待同步',
+    synced: '已同步',
+    failed: '失败',
+    deleted: '待删除'
+};
+
+kbSyncBtn.addEventListener('click', () => loadKbSync('POST'));
+kbSyncRefreshBtn.addEventListener('click', () => loadKbSync('GET'));
+
+async function loadKbSync(method) {
+    try {
+        const options = { method: method };
+        if (method === 'POST') {
+            options.headers = { 'Content-Type': 'application/json' };
+            options.body = JSON.stringify({ force: false });
+        }
+        const response = await fetch(`${API_BASE_URL}/api/admin/kb-sync`, options);
+        const data = await response.json();
+
+        if (!data.success) {
+            kbSyncHint.textContent = data.error || '获取知识库同步状态失败';
+            return;
+        }
+
+        renderKbSync(data);
+        // 同步进行中时定期刷新
+        if (method === 'POST' || data.stats.syncing) {
+            setTimeout(() => loadKbSync('GET'), JOB_POLL_INTERVAL);
+        }
+    } catch (error) {
+        console.error('获取知识库同步状态失败:', error);
+    }
+}
+
+function renderKbSync(data) {
+    const stats = data.stats;
+    const counts = stats.statusCounts || {};
+    const cards = [
+        ['文档数', stats.files],
+        ['已同步', counts.synced || 0],
+        ['待同步', stats.pending],
+        ['失败', counts.failed || 0],
+        ['累计上传', stats.totals.uploaded],
+        ['累计重试', stats.totals.retries]
+    ];
+    kbSyncCards.innerHTML = '';
+    cards.forEach(([label, value]) => {
+        const card = document.createElement('div');
+        card.className = 'analytics-card';
+        const labelDiv = document.createElement('div');
+        labelDiv.className = 'analytics-card-label';
+        labelDiv.textContent = label;
+        const valueDiv = document.createElement('div');
+        valueDiv.className = 'analytics-card-value';
+        valueDiv.textContent = value;
+        card.appendChild(labelDiv);
+        card.appendChild(valueDiv);
+        kbSyncCards.appendChild(card);
+    });
+
+    const lastRun = stats.lastRun;
+    kbSyncHint.textContent = stats.syncing
+        ? `正在同步(上传器: ${stats.uploader})...`
+        : lastRun
+            ? `上次同步 ${lastRun.finishedAt}: 上传 ${lastRun.uploaded}，删除 ${lastRun.deleted}，失败 ${lastRun.failed}，未变化 ${lastRun.unchanged}(上传器: ${stats.uploader})`
+            : `本进程尚未执行同步(上传器: ${stats.uploader})`;
+
+    kbSyncFiles.innerHTML = '';
+    data.files.forEach(file => {
+        const row = document.createElement('tr');
+        [
+            file.fileName,
+            KB_SYNC_STATUS_TEXT[file.status] || file.status,
+            file.syncedAt || '-',
+            file.error || '-'
+        ].forEach((text, index) => {
+            const cell = document.createElement('td');
+            cell.textContent = text;
+            if (index === 1) {
+                cell.className = `status-${file.status === 'synced' ? 'done' : file.status}`;
+            }
+            row.appendChild(cell);
+        });
+        kbSyncFiles.appendChild(row);
+    });
+}
+
+// ========================================
+// 对话统计
+// ========================================
+const analyticsHoursSelect = document.getElementById('analyticsHours');
+const analyticsRefreshBtn = document.getElementById('analyticsRefreshBtn');
+const analyticsCards = document.getElementById('analyticsCards');
+const analyticsSeries = document.getElementById('analyticsSeries');
+const analyticsTopQuestions = document.getElementById('analyticsTopQuestions');
+const analyticsLatency = document.getElementById('analyticsLatency');
+const analyticsAnswerLength = document.getElementById('analyticsAnswerLength');
+
+analyticsRefreshBtn.addEventListener('click', loadAnalytics);
+analyticsHoursSelect.addEventListener('change', loadAnalytics);
+
+async function loadAnalytics() {
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/admin/analytics?hours=${analyticsHoursSelect.value}`);
+        const data = await response.json();
+
+        if (!data.success) {
+            showError(data.error || '获取统计失败');
+            return;
+        }
+
+        renderAnalytics(data.analytics);
+    } catch (error) {
+        console.error('获取统计失败:', error);
+    }
+}
+
+function renderAnalytics(analytics) {
+    const stats = analytics.window;
+    const formatRate = rate => `${(rate * 100).toFixed(1)}%`;
+    const formatValue = (value, unit) => (value === null || value === undefined ? '-' : `${value}${unit}`);
+
+    const cards = [
+        ['请求数', stats.requests],
+        ['失败率', formatRate(stats.errorRate)],
+        ['缓存命中率', formatRate(stats.cacheHitRate)],
+        ['平均耗时', formatValue(stats.latency.avgMs, ' ms')],
+        ['P95耗时', formatValue(stats.latency.p95Ms, ' ms')],
+        ['平均回复长度', formatValue(stats.answerLength.avgChars, ' 字')],
+        ['累计请求', analytics.totals.requests]
+    ];
+    analyticsCards.innerHTML = '';
+    cards.forEach(([label, value]) => {
+        const card = document.createElement('div');
+        card.className = 'analytics-card';
+        const labelDiv = document.createElement('div');
+        labelDiv.className = 'analytics-card-label';
+        labelDiv.textContent = label;
+        const valueDiv = document.createElement('div');
+        valueDiv.className = 'analytics-card-value';
+        valueDiv.textContent = value;
+        card.appendChild(labelDiv);
+        card.appendChild(valueDiv);
+        analyticsCards.appendChild(card);
+    });
+
+    // 每小时请求数柱状图(红色部分为失败请求)
+    const maxRequests = Math.max(1, ...analytics.series.map(point => point.requests));
+    analyticsSeries.innerHTML = '';
+    analytics.series.forEach(point => {
+        const bar = document.createElement('div');
+        bar.className = point.errors ? 'analytics-bar has-errors' : 'analytics-bar';
+        bar.style.height = `${(point.requests / maxRequests) * 100}%`;
+        bar.style.setProperty('--error-ratio', `${(point.errors / Math.max(1, point.requests)) * 100}%`);
+        bar.title = `${point.time}  请求 ${point.requests}，失败 ${point.errors}，缓存 ${point.cached}`;
+        analyticsSeries.appendChild(bar);
+    });
+
+    renderRows(analyticsTopQuestions, analytics.topQuestions.map(item => [item.question, item.count]));
+    renderRows(analyticsLatency, stats.latency.histogram.map(item => [item.label, item.count]));
+    renderRows(analyticsAnswerLength, stats.answerLength.histogram.map(item => [item.label, item.count]));
+}
+
+function renderRows(tbody, rows) {
+    tbody.innerHTML = '';
+    rows.forEach(cells => {
+        const row = document.createElement('tr');
+        cells.forEach(value => {
+            const cell = document.createElement('td');
+            cell.textContent = value;
+            row.appendChild(cell);
+        });
+        tbody.appendChild(row);
+    });
+}
+
+// ========================================
+// 流量控制
+// ========================================
+const admissionRefreshBtn = document.getElementById('admissionRefreshBtn');
+const admissionChatCards = document.getElementById('admissionChatCards');
+const admissionDocCards = document.getElementById('admissionDocCards');
+const admissionHint = document.getElementById('admissionHint');
+
+admissionRefreshBtn.addEventListener('click', loadAdmission);
+
+async function loadAdmission() {
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/admin/admission`);
+        const data = await response.json();
+
+        if (!data.success) {
+            showError(data.error || '获取流量控制状态失败');
+            return;
+        }
+
+        renderAdmissionPool(admissionChatCards, data.pools.chat);
+        renderAdmissionPool(admissionDocCards, data.pools.doc);
+        const rateLimit = data.rateLimit;
+        admissionHint.textContent = rateLimit.enabled
+            ? `每个客户端每分钟最多 ${rateLimit.ratePerMinute} 次对话(突发 ${rateLimit.burst} 次),已限流 ${rateLimit.limited} 次`
+            : '未启用按客户端限流';
+    } catch (error) {
+        console.error('获取流量控制状态失败:', error);
+    }
+}
+
+function renderAdmissionPool(container, pool) {
+    const formatSeconds = value => (value === null || value === undefined ? '-' : `${Math.round(value * 1000)} ms`);
+    const cards = [
+        ['进行中', `${pool.active} / ${pool.limit}`],
+        ['排队中', pool.maxQueue === null ? pool.queued : `${pool.queued} / ${pool.maxQueue}`],
+        ['平均等待', formatSeconds(pool.avgWaitSeconds)],
+        ['P95等待', formatSeconds(pool.p95WaitSeconds)],
+        ['平均占用', formatSeconds(pool.avgHoldSeconds)],
+        ['已准入', pool.admitted],
+        ['已拒绝(429)', pool.rejected.queue_full + (pool.rejected.client_queue_full || 0) + pool.rejected.wait_timeout]
+    ];
+    container.innerHTML = '';
+    cards.forEach(([label, value]) => {
+        const card = document.createElement('div');
+        card.className = 'analytics-card';
+        const labelDiv = document.createElement('div');
+        labelDiv.className = 'analytics-card-label';
+        labelDiv.textContent = label;
+        const valueDiv = document.createElement('div');
+        valueDiv.className = 'analytics-card-value';
+        valueDiv.textContent = value;
+        card.appendChild(labelDiv);
+        card.appendChild(valueDiv);
+        container.appendChild(card);
+    });
+}
+
+// ========================================
+// 请求剖析
+// ========================================
+const profileSampleRateSelect = document.getElementById('profileSampleRate');
+const profileRefreshBtn = document.getElementById('profileRefreshBtn');
+const profileClearBtn = document.getElementById('profileClearBtn');
+const profileHint = document.getElementById('profileHint');
+const profileTraces = document.getElementById('profileTraces');
+
+profileRefreshBtn.addEventListener('click', () => loadProfiling('GET'));
+profileClearBtn.addEventListener('click', () => loadProfiling('DELETE'));
+profileSampleRateSelect.addEventListener('change', () => loadProfiling('POST', {
+    sampleRate: parseFloat(profileSampleRateSelect.value)
+}));
+
+// 修改剖析设置需要PROFILE_TOKEN,输入一次后在本标签页内保存
+let profileHeader = 'X-PDSA-Profile';
+
+async function loadProfiling(method, body, retried = false) {
+    try {
+        const options = { method, headers: {} };
+        if (body) {
+            options.headers['Content-Type'] = 'application/json';
+            options.body = JSON.stringify(body);
+        }
+        const token = sessionStorage.getItem('pdsaProfileToken');
+        if (method !== 'GET' && token) {
+            options.headers[profileHeader] = token;
+        }
+        const response = await fetch(`${API_BASE_URL}/api/admin/profiling`, options);
+        if (response.status === 403 && method !== 'GET' && !retried) {
+            const input = prompt('请输入PROFILE_TOKEN');
+            if (input) {
+                sessionStorage.setItem('pdsaProfileToken', input);
+                return loadProfiling(method, body, true);
+            }
+        }
+        const data = await response.json();
+
+        if (!data.success) {
+            showError(data.error || '获取剖析记录失败');
+            return;
+        }
+
+        renderProfiling(data.settings, data.traces);
+    } catch (error) {
+        console.error('获取剖析记录失败:', error);
+    }
+}
+
+function renderProfiling(settings, traces) {
+    profileHeader = settings.header || profileHeader;
+    const option = [...profileSampleRateSelect.options].find(item => parseFloat(item.value) === settings.sampleRate);
+    if (option) {
+        profileSampleRateSelect.value = option.value;
+    }
+    profileHint.textContent = settings.headerEnabled
+        ? `也可以在单个请求上携带请求头 ${settings.header} 触发剖析`
+        : '未配置PROFILE_TOKEN,只能按采样率剖析';
+
+    profileTraces.innerHTML = '';
+    traces.forEach(trace => {
+        const row = document.createElement('tr');
+        const spans = trace.spans
+            .filter(span => span.depth === 0)
+            .map(span => `${span.name} ${span.durationMs}ms`)
+            .join(' → ');
+        [trace.time, `${trace.method} ${trace.path}`, trace.status, `${trace.durationMs} ms`, spans].forEach(value => {
+            const cell = document.createElement('td');
+            cell.textContent = value;
+            row.appendChild(cell);
+        });
+
+        const links = document.createElement('td');
+        const formats = trace.profiled ? [['pstats', 'pstats'], ['flamegraph', '火焰图']] : [['flamegraph', '火焰图']];
+        formats.forEach(([format, label]) => {
+            const link = document.createElement('a');
+            link.href = `${API_BASE_URL}/api/admin/profiling/traces/${trace.id}?format=${format}`;
+            link.textContent = label;
+            links.appendChild(link);
+            links.appendChild(document.createTextNode(' '));
+        });
+        row.appendChild(links);
+        profileTraces.appendChild(row);
+    });
+}
+
+// 恢复跟踪未完成的任务
+resumePendingJob();
+
+// 加载站点抓取状态
+requestCrawler('GET');
+
+// 加载知识库同步状态
+loadKbSync('GET');
+
+// 加载对话统计
+loadAnalytics();
+
+// 加载流量控制状态
+loadAdmission();
+
+// 加载请求剖析记录
+loadProfiling('GET');
@@ -4,9 +4,10 @@
  * 功能说明:
  * 1. 处理用户输入和发送消息
  * 2. 调用后端API获取AI回复
- * 3. 管理对话历史(内存存储)
+ * 3. 管理对话历史(内存存储,仅用于调试;上下文由服务端会话保存)
  * 4. 渲染消息到界面
  * 5. 处理错误和加载状态
+ * 6. 流式接收AI回复并增量渲染
  */
 
 // ========================================
@@ -17,6 +18,9 @@
 // 格式: [{"user": "问题", "bot": "回答"}, ...]
 let chatHistory = [];
 
+// 服务端会话ID - 首轮由后端分配,之后每轮只发送新问题和会话ID
+let sessionId = null;
+
 // DOM元素引用
 let messagesContainer;
 let userInput;
@@ -25,6 +29,7 @@ let sendBtn;
 // API配置
 const API_BASE_URL = '';  // 空字符串表示使用当前域名
 const CHAT_API = '/api/chat';
+const CHAT_STREAM_API = '/api/chat/stream';
 
 // ========================================
 // 页面加载完成后初始化
@@ -83,14 +88,22 @@ async function handleSendMessage() {
     const thinkingMsg = addMessage('AI思考中...', 'bot');
     
     try {
-        // 调用后端API
-        const reply = await callChatAPI(message);
-        
-        // 移除占位消息
-        removeMessage(thinkingMsg);
+        // 调用后端流式API,首个分片到达后即在占位消息中增量渲染
+        const contentDiv = thinkingMsg.querySelector('.message-content');
+        let received = false;
+        const reply = await callChatStreamAPI(message, function(partialText) {
+            received = true;
+            renderBotContent(contentDiv, partialText);
+            scrollToBottom();
+        });
         
-        // 显示AI回复
-        addMessage(reply, 'bot');
+        // 使用完整回复做最终渲染
+        if (received) {
+            renderBotContent(contentDiv, reply);
+        } else {
+            removeMessage(thinkingMsg);
+            addMessage(reply, 'bot');
+        }
         
         // 更新对话历史
         chatHistory.push({
@@ -137,10 +150,15 @@ async function callChatAPI(message) {
             },
             body: JSON.stringify({
                 message: message,
-                history: chatHistory  // 传递完整对话历史
+                sessionId: sessionId  // 历史对话保存在服务端会话中
             })
         });
         
+        // 服务繁忙或请求过于频繁
+        if (response.status === 429) {
+            throw await busyError(response);
+        }
+        
         // 检查HTTP状态码
         if (!response.ok) {
             throw new Error(`HTTP错误! 状态码: ${response.status}`);
@@ -154,6 +172,9 @@ async function callChatAPI(message) {
             throw new Error(data.error || '未知错误');
         }
         
+        if (data.sessionId) {
+            sessionId = data.sessionId;
+        }
         return data.reply;
         
     } catch (error) {
@@ -165,6 +186,145 @@ async function callChatAPI(message) {
     }
 }
 
+// ========================================
+// 429响应转换为错误提示
+// ========================================
+async function busyError(response) {
+    /**
+     * 读取429响应中的错误描述和Retry-After,生成提示用户稍后重试的错误
+     */
+    const data = await response.json().catch(() => ({}));
+    const retryAfter = response.headers.get('Retry-After');
+    const message = data.error || '服务繁忙,请稍后再试';
+    return new Error(retryAfter ? `${message}(约${retryAfter}秒后可重试)` : message);
+}
+
+// ========================================
+// 调用后端流式API
+// ========================================
+async function callChatStreamAPI(message, onDelta) {
+    /**
+     * 调用后端/api/chat/stream接口,以SSE方式逐段接收AI回复
+     * 
+     * 参数:
+     *   message (string): 用户当前问题
+     *   onDelta (function): 每收到一个分片时回调,参数为当前已累计的回复文本
+     * 
+     * 返回:
+     *   string: 完整AI回复内容
+     * 
+     * 说明:
+     *   浏览器不支持ReadableStream时降级为普通/api/chat接口
+     */
+    let response;
+    try {
+        response = await fetch(CHAT_STREAM_API, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                message: message,
+                sessionId: sessionId
+            })
+        });
+    } catch (error) {
+        if (error.name === 'TypeError' && error.message.includes('fetch')) {
+            throw new Error('网络连接失败,请检查服务器是否运行');
+        }
+        throw error;
+    }
+    
+    // 流式接口不可用时降级为普通接口
+    if (response.status === 404 || !response.body || typeof TextDecoder === 'undefined') {
+        return callChatAPI(message);
+    }
+    
+    // 服务繁忙或请求过于频繁
+    if (response.status === 429) {
+        throw await busyError(response);
+    }
+    
+    // 检查HTTP状态码
+    if (!response.ok) {
+        throw new Error(`HTTP错误! 状态码: ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    let buffer = '';
+    let replyText = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        
+        // SSE事件以空行分隔
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            const event = parseSSEEvent(rawEvent);
+            if (!event) {
+                continue;
+            }
+            if (event.type === 'error') {
+                throw new Error(event.data.error || '未知错误');
+            }
+            if (event.type === 'done') {
+                if (event.data.sessionId) {
+                    sessionId = event.data.sessionId;
+                }
+                return event.data.reply !== undefined ? event.data.reply : replyText;
+            }
+            if (event.data.delta) {
+                replyText += event.data.delta;
+                onDelta(replyText);
+            }
+        }
+    }
+    
+    // 连接提前关闭但已收到部分内容
+    if (replyText) {
+        return replyText;
+    }
+    throw new Error('连接已断开,未收到AI回复');
+}
+
+function parseSSEEvent(rawEvent) {
+    /**
+     * 解析单个SSE事件文本
+     * 
+     * 参数:
+     *   rawEvent (string): 事件原始文本(不含结尾空行)
+     * 
+     * 返回:
+     *   object|null: {type: 事件类型, data: 解析后的JSON数据}
+     */
+    let type = 'message';
+    const dataLines = [];
+    rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            type = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+    if (dataLines.length === 0) {
+        return null;
+    }
+    try {
+        return { type: type, data: JSON.parse(dataLines.join('\n')) };
+    } catch (error) {
+        console.error('[SSE] 事件解析失败:', error);
+        return null;
+    }
+}
+
 // ========================================
 // 消息渲染函数
 // ========================================
@@ -199,35 +359,7 @@ function addMessage(text, type) {
     
     // 处理引用标记并渲染
     if (type === 'bot') {
-        try {
-            let processedText = text;
-            
-            // 先处理引用标记，避免被转义
-            processedText = processedText.replace(
-                /<ref>\[(\d+)\]<\/ref>/g,
-                '<sup class="reference" title="点击查看引用来源">[$1]</sup>'
-            );
-            
-            // 使用marked渲染Markdown (兼容判断)
-            if (typeof marked !== 'undefined') {
-                // 兼容marked v11+和v10-的版本
-                if (typeof marked.parse === 'function') {
-                    contentDiv.innerHTML = marked.parse(processedText);
-                } else if (typeof marked === 'function') {
-                    contentDiv.innerHTML = marked(processedText);
-                } else {
-                    throw new Error('marked库加载异常');
-                }
-            } else {
-                // 降级方案：如果marked未加载，使用原有逻辑
-                console.warn('[Markdown] marked库未加载，使用降级渲染');
-                contentDiv.innerHTML = formatReferences(escapeHTML(processedText));
-            }
-        } catch (error) {
-            // 错误处理：如果Markdown渲染失败，使用原有逻辑
-            console.error('[Markdown] 渲染失败:', error);
-            contentDiv.innerHTML = formatReferences(escapeHTML(text));
-        }
+        renderBotContent(contentDiv, text);
     } else {
         contentDiv.textContent = text;
     }
@@ -242,6 +374,49 @@ function addMessage(text, type) {
     return messageDiv;
 }
 
+// ========================================
+// 渲染AI消息内容
+// ========================================
+function renderBotContent(contentDiv, text) {
+    /**
+     * 将AI回复渲染为Markdown并处理引用标记
+     * 流式接收时会以累计文本重复调用
+     * 
+     * 参数:
+     *   contentDiv (HTMLElement): 消息内容容器
+     *   text (string): AI回复文本
+     */
+    try {
+        let processedText = text;
+        
+        // 先处理引用标记，避免被转义
+        processedText = processedText.replace(
+            /<ref>\[(\d+)\]<\/ref>/g,
+            '<sup class="reference" title="点击查看引用来源">[$1]</sup>'
+        );
+        
+        // 使用marked渲染Markdown (兼容判断)
+        if (typeof marked !== 'undefined') {
+            // 兼容marked v11+和v10-的版本
+            if (typeof marked.parse === 'function') {
+                contentDiv.innerHTML = marked.parse(processedText);
+            } else if (typeof marked === 'function') {
+                contentDiv.innerHTML = marked(processedText);
+            } else {
+                throw new Error('marked库加载异常');
+            }
+        } else {
+            // 降级方案：如果marked未加载，使用原有逻辑
+            console.warn('[Markdown] marked库未加载，使用降级渲染');
+            contentDiv.innerHTML = formatReferences(escapeHTML(processedText));
+        }
+    } catch (error) {
+        // 错误处理：如果Markdown渲染失败，使用原有逻辑
+        console.error('[Markdown] 渲染失败:', error);
+        contentDiv.innerHTML = formatReferences(escapeHTML(text));
+    }
+}
+
 // ========================================
 // 移除消息函数
 // ========================================
@@ -344,7 +519,7 @@ function debugHistory() {
      */
     console.log('=== 当前对话历史 ===');
     console.log(JSON.stringify(chatHistory, null, 2));
-    console.log(`总计 ${chatHistory.length} 轮对话`);
+    console.log(`总计 ${chatHistory.length} 轮对话, 会话ID: ${sessionId}`);
 }
 
 // 将调试函数暴露到全局作用域
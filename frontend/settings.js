@@ -1,8 +1,21 @@
 /**
  * 系统设置页面 - JavaScript逻辑
- * 功能: 日志清理策略管理
+ * 功能: 日志清理策略管理、日志轮转与归档、日志检索
  */
 
+// 日志检索每页条数
+const SEARCH_PAGE_SIZE = 20;
+
+// 日志检索记录类型显示文字
+const SEARCH_TYPE_TEXT = {
+    chat: '对话',
+    error: '错误',
+    doc: '文档生成'
+};
+
+// 当前检索条件与下一页游标
+let searchState = { params: null, nextCursor: null };
+
 // 页面加载完成后初始化
 document.addEventListener('DOMContentLoaded', function() {
     console.log('[设置页面] 页面加载完成');
@@ -40,6 +53,17 @@ function bindEvents() {
     // 保存按钮点击事件
     const saveBtn = document.getElementById('saveBtn');
     saveBtn.addEventListener('click', saveSettings);
+    
+    // 日志检索
+    document.getElementById('searchBtn').addEventListener('click', () => searchLogs(false));
+    document.getElementById('loadMoreBtn').addEventListener('click', () => searchLogs(true));
+    document.getElementById('exportNdjsonBtn').addEventListener('click', () => exportLogs('ndjson'));
+    document.getElementById('exportCsvBtn').addEventListener('click', () => exportLogs('csv'));
+    document.getElementById('searchKeyword').addEventListener('keydown', (event) => {
+        if (event.key === 'Enter') {
+            searchLogs(false);
+        }
+    });
 }
 
 /**
@@ -83,6 +107,17 @@ async function loadCurrentSettings() {
                 document.getElementById('cleanupTime').value = data.cleanupTime;
             }
             
+            // 轮转与归档设置(隐藏当前环境不支持的压缩格式)
+            const compression = document.getElementById('compression');
+            Array.from(compression.options).forEach(option => {
+                option.disabled = option.value !== 'none' && !(data.availableCodecs || []).includes(option.value);
+            });
+            document.getElementById('rotateMaxMB').value = data.rotateMaxMB;
+            document.getElementById('rotateInterval').value = data.rotateInterval;
+            compression.value = data.compression;
+            document.getElementById('retainDays').value = data.retainDays;
+            document.getElementById('retainMaxMB').value = data.retainMaxMB;
+            
             console.log('[设置页面] 当前策略:', data.strategy);
         }
     } catch (error) {
@@ -117,7 +152,16 @@ async function saveSettings() {
         // 获取清理时间
         const cleanupTime = document.getElementById('cleanupTime').value;
         
-        console.log('[设置页面] 保存设置:', { strategy, cleanupTime });
+        // 获取轮转与归档设置
+        const rotation = {
+            rotateMaxMB: Number(document.getElementById('rotateMaxMB').value),
+            rotateInterval: document.getElementById('rotateInterval').value,
+            compression: document.getElementById('compression').value,
+            retainDays: Number(document.getElementById('retainDays').value),
+            retainMaxMB: Number(document.getElementById('retainMaxMB').value)
+        };
+        
+        console.log('[设置页面] 保存设置:', { strategy, cleanupTime, ...rotation });
         
         // 发送请求
         const response = await fetch('/api/settings/log-cleanup', {
@@ -127,7 +171,8 @@ async function saveSettings() {
             },
             body: JSON.stringify({
                 strategy: strategy,
-                cleanupTime: cleanupTime
+                cleanupTime: cleanupTime,
+                ...rotation
             })
         });
         
@@ -179,6 +224,8 @@ async function loadLogStatus() {
             document.getElementById('logCount').textContent = data.logCount || '0';
             document.getElementById('logSize').textContent = formatFileSize(data.logSize || 0);
             document.getElementById('lastUpdate').textContent = data.lastUpdate || '-';
+            document.getElementById('segmentCount').textContent = `${data.segmentCount || 0} / ${data.archivedSegments || 0}`;
+            document.getElementById('rawSize').textContent = formatFileSize(data.rawSize || 0);
             
             console.log('[设置页面] 日志状态:', data);
         }
@@ -199,3 +246,125 @@ function formatFileSize(bytes) {
     
     return Math.round(bytes / Math.pow(k, i) * 100) / 100 + ' ' + sizes[i];
 }
+
+/**
+ * 检索日志
+ * @param {boolean} loadMore - 是否加载下一页(沿用当前检索条件)
+ */
+async function searchLogs(loadMore) {
+    const searchBtn = document.getElementById('searchBtn');
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    const results = document.getElementById('searchResults');
+    const meta = document.getElementById('searchMeta');
+    
+    if (!loadMore) {
+        searchState = {
+            params: {
+                q: document.getElementById('searchKeyword').value.trim(),
+                type: document.getElementById('searchType').value,
+                start: document.getElementById('searchStart').value,
+                end: document.getElementById('searchEnd').value
+            },
+            nextCursor: null
+        };
+        results.innerHTML = '';
+    }
+    
+    const query = new URLSearchParams({ limit: SEARCH_PAGE_SIZE });
+    Object.entries(searchState.params).forEach(([key, value]) => {
+        if (value) query.set(key, value);
+    });
+    if (loadMore && searchState.nextCursor) {
+        query.set('cursor', searchState.nextCursor);
+    }
+    
+    try {
+        searchBtn.disabled = true;
+        loadMoreBtn.disabled = true;
+        
+        const response = await fetch(`/api/logs/search?${query.toString()}`);
+        const data = await response.json();
+        
+        if (!data.success) {
+            throw new Error(data.error || '检索失败');
+        }
+        
+        data.items.forEach(item => results.appendChild(renderSearchItem(item)));
+        searchState.nextCursor = data.nextCursor;
+        
+        const shown = results.children.length;
+        meta.textContent = shown
+            ? `已显示 ${shown} 条记录 (本次查询 ${data.tookMs} ms)`
+            : '没有找到匹配的记录';
+        document.getElementById('loadMoreGroup').style.display = data.nextCursor ? 'block' : 'none';
+    } catch (error) {
+        console.error('[设置页面] 日志检索失败:', error);
+        meta.textContent = `检索失败: ${error.message}`;
+    } finally {
+        searchBtn.disabled = false;
+        loadMoreBtn.disabled = false;
+    }
+}
+
+/**
+ * 按当前检索条件导出日志(浏览器直接下载流式响应)
+ * @param {string} format - ndjson/csv
+ */
+function exportLogs(format) {
+    const query = new URLSearchParams({ format });
+    const filters = {
+        q: document.getElementById('searchKeyword').value.trim(),
+        type: document.getElementById('searchType').value,
+        start: document.getElementById('searchStart').value,
+        end: document.getElementById('searchEnd').value
+    };
+    Object.entries(filters).forEach(([key, value]) => {
+        if (value) query.set(key, value);
+    });
+    window.location.href = `/api/logs/export?${query.toString()}`;
+}
+
+/**
+ * 渲染单条检索结果
+ * @param {Object} item - 日志记录
+ * @returns {HTMLElement} 结果元素
+ */
+function renderSearchItem(item) {
+    const div = document.createElement('div');
+    div.className = 'search-item';
+    
+    const header = document.createElement('div');
+    header.className = 'search-item-header';
+    const typeSpan = document.createElement('span');
+    typeSpan.className = `search-item-type ${item.type}`;
+    typeSpan.textContent = SEARCH_TYPE_TEXT[item.type] || item.type;
+    const timeSpan = document.createElement('span');
+    timeSpan.textContent = `#${item.seq}  ${item.time || '-'}`;
+    header.appendChild(typeSpan);
+    header.appendChild(timeSpan);
+    
+    const body = document.createElement('div');
+    body.className = 'search-item-body';
+    if (item.type === 'doc') {
+        appendLabeledLine(body, '文档', item.file);
+    } else {
+        if (item.user) appendLabeledLine(body, '用户', item.user);
+        appendLabeledLine(body, 'AI', item.bot);
+    }
+    
+    div.appendChild(header);
+    div.appendChild(body);
+    return div;
+}
+
+/**
+ * 追加"标签: 内容"行(使用textContent,避免日志内容被当作HTML解析)
+ */
+function appendLabeledLine(container, label, text) {
+    const line = document.createElement('div');
+    const strong = document.createElement('strong');
+    strong.textContent = `${label}: `;
+    line.appendChild(strong);
+    line.appendChild(document.createTextNode(text || ''));
+    container.appendChild(line);
+}
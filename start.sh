@@ -70,5 +70,10 @@ echo "🚀 启动服务..."
 echo "============================================"
 echo ""
 
-# 启动Flask应用
-python3 app.py
+# 启动应用
+# ./start.sh prod 使用生产环境服务器(gunicorn),否则使用Flask开发服务器
+if [ "$1" == "prod" ]; then
+    python3 serve.py
+else
+    python3 app.py
+fi